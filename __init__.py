@@ -2,6 +2,7 @@ from .app import Influxable
 from .api import InfluxDBApi
 from .models import Measurement
 from .manager import Manager
+from .rollups import Rollup
 
 
 __all__ = [
@@ -10,4 +11,5 @@ __all__ = [
     'Measurement',
     'exceptions',
     'Manager',
+    'Rollup',
 ]
@@ -1,4 +1,14 @@
+import json
+
+from influxdb.line_protocol import make_lines
+
+from . import instrumentation, metrics
 from .client import write_points
+from .instrumentation import QueryPhase
+from .signals import points_written
+from .watchdog import track_query
+
+DEFAULT_CHUNK_SIZE = 10000
 
 
 class InfluxDBApi:
@@ -41,8 +51,103 @@ class InfluxDBApi:
             'chunked': chunked,
             'pretty': pretty,
         }
-        res = request.request(method, url, params=params)
-        return res.json()
+        instrumentation.set_query(query)
+        with track_query(request, query), \
+                instrumentation.phase(QueryPhase.HTTP):
+            res = request.request(method, url, params=params)
+        with instrumentation.phase(QueryPhase.DECODE) as profile:
+            json_res = res.json()
+        if profile is not None:
+            profile.bytes_received += len(res.content)
+            profile.row_count += InfluxDBApi._count_rows(json_res)
+        return json_res
+
+    @staticmethod
+    def stream_query(
+        request,
+        query,
+        method='get',
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        epoch='ns',
+    ):
+        """
+        Yields the JSON documents of a chunked query as they are received,
+        each of them holding at most `chunk_size` values per serie.
+        """
+        url = '/query'
+        params = {
+            'db': request.database_name,
+            'q': query,
+            'epoch': epoch,
+            'chunked': 'true',
+            'chunk_size': chunk_size,
+        }
+        instrumentation.set_query(query)
+        # the query runs until its last chunk is read
+        with track_query(request, query):
+            with instrumentation.phase(QueryPhase.HTTP):
+                res = request.request(method, url, params=params, stream=True)
+            try:
+                for line in res.iter_lines(chunk_size=64 * 1024):
+                    if not line:
+                        continue
+                    with instrumentation.phase(QueryPhase.DECODE) as profile:
+                        json_res = json.loads(line)
+                    if profile is not None:
+                        profile.bytes_received += len(line)
+                        profile.row_count += InfluxDBApi._count_rows(json_res)
+                    yield json_res
+            finally:
+                res.close()
+
+    @staticmethod
+    def stream_raw_query(
+        request,
+        query,
+        method='get',
+        accept='application/csv',
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        epoch='ns',
+    ):
+        """
+        Yields the body of a chunked query, as bytes, in the format asked
+        with the `Accept` header.
+        """
+        url = '/query'
+        params = {
+            'db': request.database_name,
+            'q': query,
+            'epoch': epoch,
+            'chunked': 'true',
+            'chunk_size': chunk_size,
+        }
+        headers = {'Accept': accept}
+        instrumentation.set_query(query)
+        with track_query(request, query):
+            with instrumentation.phase(QueryPhase.HTTP):
+                res = request.request(
+                    method,
+                    url,
+                    params=params,
+                    headers=headers,
+                    stream=True,
+                )
+            profile = instrumentation.get_current_profile()
+            try:
+                for data in res.iter_content(chunk_size=64 * 1024):
+                    if profile is not None:
+                        profile.bytes_received += len(data)
+                    yield data
+            finally:
+                res.close()
+
+    @staticmethod
+    def _count_rows(json_res):
+        return sum(
+            len(serie.get('values') or [])
+            for result in json_res.get('results', [])
+            for serie in result.get('series', [])
+        )
 
     # @staticmethod
     # def write_points(
@@ -62,7 +167,31 @@ class InfluxDBApi:
     #     request.post(url, params=params, data=points)
     #     return True
 
+    @staticmethod
+    def write_lines(request, lines, precision='ns'):
+        url = '/write'
+        if isinstance(lines, list):
+            lines = '\n'.join(lines)
+        params = {
+            'db': request.database_name,
+            'precision': precision,
+        }
+        request.post(url, params=params, data=lines.encode('utf-8'))
+        metrics.record_points_written(lines)
+        points_written.send(
+            sender=InfluxDBApi,
+            database=request.database_name,
+            points=lines,
+        )
+        return True
+
     @staticmethod
     def write_points(request, point):
+        if request.is_cluster:
+            # writes are replicated by the cluster write queues
+            lines = point
+            if not isinstance(point, str):
+                lines = make_lines({'points': [point]}, precision='ms')
+            return InfluxDBApi.write_lines(request, lines, precision='ms')
         write_points([point], time_precision='ms')
         return True
@@ -1,12 +1,34 @@
+import threading
+
+from . import exceptions, settings
 from .api import InfluxDBApi
 from .connection import Connection
-from .helpers.decorators import Singleton
 
 
-@Singleton
+DEFAULT_INFLUXDB_ALIAS = 'default'
+
+CONNECTION_OPTION_NAMES = {
+    'URL': 'base_url',
+    'URLS': 'base_urls',
+    'USER': 'user',
+    'PASSWORD': 'password',
+    'DATABASE': 'database_name',
+    'TIMEOUT': 'timeout',
+    'POOL_SIZE': 'pool_size',
+    'RETENTION_POLICY': 'retention_policy',
+}
+
+
 class Influxable:
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, alias=DEFAULT_INFLUXDB_ALIAS, **kwargs):
+        self.alias = alias
         self.connection = Connection(*args, **kwargs)
+        # the first instance built for an alias becomes its shared instance
+        influxables.register(alias, self)
+
+    @staticmethod
+    def get_instance(using=None):
+        return influxables[using or DEFAULT_INFLUXDB_ALIAS]
 
     def create_connection(self, *args, **kwargs):
         return Connection.create_connection(*args, **kwargs)
@@ -15,10 +37,26 @@ class Influxable:
         request = self.connection.request
         return InfluxDBApi.ping(request, *args, **kwargs)
 
+    def get_debug_vars(self, *args, **kwargs):
+        request = self.connection.request
+        return InfluxDBApi.get_debug_vars(request, *args, **kwargs)
+
+    def get_debug_requests(self, *args, **kwargs):
+        request = self.connection.request
+        return InfluxDBApi.get_debug_requests(request, *args, **kwargs)
+
     def execute_query(self, *args, **kwargs):
         request = self.connection.request
         return InfluxDBApi.execute_query(request, *args, **kwargs)
 
+    def stream_query(self, *args, **kwargs):
+        request = self.connection.request
+        return InfluxDBApi.stream_query(request, *args, **kwargs)
+
+    def stream_raw_query(self, *args, **kwargs):
+        request = self.connection.request
+        return InfluxDBApi.stream_raw_query(request, *args, **kwargs)
+
     def write_points(self, *args, **kwargs):
         request = self.connection.request
         return InfluxDBApi.write_points(request, *args, **kwargs)
@@ -42,3 +80,76 @@ class Influxable:
     @property
     def policy_name(self):
         return self.connection.policy_name
+
+
+class InfluxableHandler:
+    """
+    Thread-safe registry of one ``Influxable`` per alias of the
+    ``INFLUXDB_DATABASES`` setting, built on first use. The `default` alias
+    falls back to the ``INFLUXDB_URL`` / ``INFLUXDB_DATABASE`` settings.
+    """
+
+    def __init__(self, databases=None):
+        self._databases = databases
+        self._instances = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def databases(self):
+        if self._databases is None:
+            databases = dict(settings.INFLUXDB_DATABASES)
+            databases.setdefault(DEFAULT_INFLUXDB_ALIAS, {})
+            self._databases = databases
+        return self._databases
+
+    def __getitem__(self, alias):
+        instance = self._instances.get(alias)
+        if instance is not None:
+            return instance
+
+        if alias not in self.databases:
+            raise exceptions.InfluxDBConnectionDoesNotExist(alias)
+        with self._get_lock(alias):
+            instance = self._instances.get(alias)
+            if instance is None:
+                kwargs = self.get_connection_kwargs(alias)
+                instance = Influxable(alias=alias, **kwargs)
+        return instance
+
+    def __contains__(self, alias):
+        return alias in self._instances
+
+    def __iter__(self):
+        return iter(self.databases)
+
+    def all(self):
+        return [self[alias] for alias in self]
+
+    def register(self, alias, instance):
+        with self._lock:
+            self._instances.setdefault(alias, instance)
+
+    def get_connection_kwargs(self, alias):
+        options = self.databases[alias]
+        kwargs = {}
+        for option_name, kwarg_name in CONNECTION_OPTION_NAMES.items():
+            if option_name in options:
+                kwargs[kwarg_name] = options[option_name]
+        return kwargs
+
+    def get_database_name(self, alias=None):
+        options = self.databases.get(alias or DEFAULT_INFLUXDB_ALIAS, {})
+        return options.get('DATABASE', settings.INFLUXDB_DATABASE)
+
+    def get_retention_policy(self, alias=None):
+        """Retention policy read by the queries on `alias`, without connecting."""
+        options = self.databases.get(alias or DEFAULT_INFLUXDB_ALIAS, {})
+        return options.get('RETENTION_POLICY', settings.INFLUXDB_RETENTION_POLICY)
+
+    def _get_lock(self, alias):
+        with self._lock:
+            return self._locks.setdefault(alias, threading.Lock())
+
+
+influxables = InfluxableHandler()
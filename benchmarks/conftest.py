@@ -0,0 +1,67 @@
+import importlib
+import importlib.util
+import os
+import sys
+import types
+
+import django
+import pytest
+from django.conf import settings
+
+from stub_server import StubInfluxDBServer
+
+PACKAGE_NAME = 'django_cloudapp_common.influx'
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_package():
+    # a standalone checkout is loaded under the name the package imports
+    # itself with
+    try:
+        return importlib.import_module(PACKAGE_NAME)
+    except ImportError:
+        pass
+    parent_name = PACKAGE_NAME.rsplit('.', 1)[0]
+    parent = types.ModuleType(parent_name)
+    parent.__path__ = []
+    sys.modules[parent_name] = parent
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME,
+        os.path.join(PACKAGE_ROOT, '__init__.py'),
+        submodule_search_locations=[PACKAGE_ROOT],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def pytest_configure(config):
+    server = StubInfluxDBServer()
+    server.start()
+    config.stub_server = server
+    settings.configure(
+        INFLUXDB_URL=server.url,
+        INFLUXDB_USER='',
+        INFLUXDB_PASSWORD='',
+        INFLUXDB_DATABASE='benchmarks',
+        INFLUXDB_HOST=server.host,
+        INFLUXDB_PORT=server.port,
+        INFLUXDB_TIMEOUT=60,
+        INFLUXDB_USE_THREADING=False,
+    )
+    django.setup()
+    _import_package()
+
+
+def pytest_unconfigure(config):
+    server = getattr(config, 'stub_server', None)
+    if server is not None:
+        server.stop()
+
+
+@pytest.fixture
+def stub_server(request):
+    server = request.config.stub_server
+    server.reset()
+    return server
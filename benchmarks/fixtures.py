@@ -0,0 +1,55 @@
+import functools
+import json
+import os
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ROW_INTERVAL_NS = 10 * 1000 * 1000 * 1000
+
+
+@functools.lru_cache(maxsize=None)
+def load_recorded_response(name='cpu'):
+    with open(os.path.join(FIXTURES_DIR, '{}.json'.format(name))) as fixture:
+        return json.load(fixture)
+
+
+def make_query_response(nb_rows, name='cpu'):
+    """
+    Scales the recorded response to `nb_rows` rows by repeating its values
+    with shifted timestamps.
+    """
+    recorded = load_recorded_response(name)
+    serie = recorded['results'][0]['series'][0]
+    recorded_values = serie['values']
+    nb_recorded = len(recorded_values)
+    span = nb_recorded * ROW_INTERVAL_NS
+    values = []
+    for i in range(nb_rows):
+        row = list(recorded_values[i % nb_recorded])
+        row[0] += (i // nb_recorded) * span
+        values.append(row)
+    return {
+        'results': [{
+            'statement_id': 0,
+            'series': [{
+                'name': serie['name'],
+                'columns': list(serie['columns']),
+                'values': values,
+            }],
+        }],
+    }
+
+
+@functools.lru_cache(maxsize=4)
+def dump_query_response(nb_rows, name='cpu'):
+    return json.dumps(make_query_response(nb_rows, name)).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=4)
+def dump_csv_query_response(nb_rows, name='cpu'):
+    """Same rows as `dump_query_response` in the InfluxDB CSV format."""
+    serie = make_query_response(nb_rows, name)['results'][0]['series'][0]
+    lines = [','.join(['name', 'tags'] + serie['columns'])]
+    for row in serie['values']:
+        values = ['' if v is None else str(v) for v in row]
+        lines.append(','.join([serie['name'], ''] + values))
+    return '\n'.join(lines).encode('utf-8')
@@ -0,0 +1,33 @@
+from django_cloudapp_common.influx.fields import (
+    FloatField,
+    IntegerField,
+    TagField,
+    TimestampField,
+)
+from django_cloudapp_common.influx.models import Measurement
+
+
+class Cpu(Measurement):
+    class Meta:
+        db_table = 'cpu'
+
+    time = TimestampField(precision='ns')
+    host = TagField()
+    region = TagField()
+    usage_user = FloatField()
+    usage_system = FloatField()
+    count = IntegerField()
+
+
+def make_cpu_points(nb_points):
+    return [
+        Cpu(
+            time=1700000000 + i,
+            host='server{:02d}'.format(i % 50),
+            region='us-west' if i % 2 else 'eu-central',
+            usage_user=10 + (i % 90) * 0.5,
+            usage_system=2 + (i % 40) * 0.25,
+            count=i,
+        )
+        for i in range(nb_points)
+    ]
@@ -0,0 +1,96 @@
+"""Minimal InfluxDB HTTP stand-in for the benchmarks."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+EMPTY_QUERY_RESPONSE = b'{"results":[{"statement_id":0}]}'
+
+
+class StubInfluxDBServer:
+    """
+    Answers ``/ping``, replays a recorded JSON body on ``/query`` and
+    counts the lines posted on ``/write``.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.query_response = EMPTY_QUERY_RESPONSE
+        self.query_content_type = 'application/json'
+        self.written_lines = 0
+        self.written_bytes = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._get_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.query_response = EMPTY_QUERY_RESPONSE
+            self.query_content_type = 'application/json'
+            self.written_lines = 0
+            self.written_bytes = 0
+
+    def set_query_response(self, body, content_type='application/json'):
+        self.query_response = body
+        self.query_content_type = content_type
+
+    def _get_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._handle()
+
+            def do_POST(self):
+                self._handle()
+
+            def _handle(self):
+                path = urlparse(self.path).path
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                if path == '/query':
+                    self._send(
+                        200,
+                        server.query_response,
+                        server.query_content_type,
+                    )
+                elif path == '/write':
+                    with server._lock:
+                        server.written_lines += body.count(b'\n') + 1
+                        server.written_bytes += len(body)
+                    self._send(204)
+                elif path == '/ping':
+                    self._send(204)
+                else:
+                    self._send(404)
+
+            def _send(self, status, body=b'', content_type='application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+        return Handler
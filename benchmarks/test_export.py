@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from django_cloudapp_common.influx import export
+from django_cloudapp_common.influx.db import Query
+from django_cloudapp_common.influx.response import InfluxDBResponse
+
+from fixtures import dump_csv_query_response, dump_query_response, make_query_response
+from models import Cpu
+
+NB_ROWS = 100000
+
+
+@pytest.fixture(scope='module')
+def response():
+    return InfluxDBResponse(make_query_response(NB_ROWS))
+
+
+def _consume(pieces):
+    return sum(len(piece) for piece in pieces)
+
+
+def _record_throughput(benchmark, nb_rows):
+    if benchmark.stats:
+        mean = benchmark.stats.stats.mean
+        benchmark.extra_info['rows_per_second'] = int(nb_rows / mean)
+
+
+def test_export_objects_as_json_lines(benchmark, response):
+    # what the export views did : objects, then dicts, then json.dumps
+    query = Query(model=Cpu)
+
+    def export_objects():
+        objects = query.query_to_objects(response)
+        fields = objects[0]._fields
+        return _consume(
+            json.dumps({f: getattr(obj, f) for f in fields}) + '\n'
+            for obj in objects
+        )
+
+    benchmark.pedantic(export_objects, rounds=3)
+    _record_throughput(benchmark, NB_ROWS)
+
+
+@pytest.mark.parametrize('format', ['jsonl', 'csv', 'arrow'])
+def test_export_response(benchmark, response, format):
+    if format == 'arrow':
+        pytest.importorskip('pyarrow')
+    _, export_func = export.EXPORT_FORMATS[format]
+    size = benchmark.pedantic(lambda: _consume(export_func([response])), rounds=3)
+    assert size
+    _record_throughput(benchmark, NB_ROWS)
+
+
+@pytest.mark.parametrize('format, native', [
+    ('jsonl', False),
+    ('csv', False),
+    ('csv', True),
+])
+def test_export_query_from_stub_server(benchmark, stub_server, format, native):
+    if native:
+        stub_server.set_query_response(
+            dump_csv_query_response(NB_ROWS),
+            content_type='application/csv',
+        )
+    else:
+        stub_server.set_query_response(dump_query_response(NB_ROWS))
+    query = Query(model=Cpu)
+
+    def export_query():
+        return _consume(export.export_query(query, format, native=native))
+
+    assert benchmark.pedantic(export_query, rounds=3)
+    _record_throughput(benchmark, NB_ROWS)
+
+
+def test_query_to_arrow_from_stub_server(benchmark, stub_server):
+    pytest.importorskip('pyarrow')
+    stub_server.set_query_response(dump_query_response(NB_ROWS))
+    query = Query(model=Cpu)
+    table = benchmark.pedantic(query.to_arrow, rounds=3)
+    assert table.num_rows == NB_ROWS
+    _record_throughput(benchmark, NB_ROWS)
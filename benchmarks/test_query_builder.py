@@ -0,0 +1,32 @@
+from django_cloudapp_common.influx.db import Field, Query
+from django_cloudapp_common.influx.db.function import aggregations
+
+from models import Cpu
+
+
+def test_prepare_simple_query(benchmark):
+    query = Query(model=Cpu).limit(100)
+    benchmark(query._prepare_query)
+
+
+def test_prepare_filtered_query(benchmark):
+    query = Query(model=Cpu) \
+        .select('usage_user', 'usage_system', aggregations.Mean('count')) \
+        .filter(Field('time') > 1700000000000000000, host='server01') \
+        .search_query(region='us') \
+        .limit(100) \
+        .offset(20)
+    benchmark(query._prepare_query)
+
+
+def test_prepare_wide_disjunction_query(benchmark):
+    criteria = Field('host') == 'server00'
+    for i in range(1, 200):
+        criteria = criteria | (Field('host') == 'server{:02d}'.format(i))
+    query = Query(model=Cpu).filter(criteria)
+    benchmark(query._prepare_query)
+
+
+def test_clone_query(benchmark):
+    query = Query(model=Cpu).filter(host='server01', region='us-west')
+    benchmark(query._clone)
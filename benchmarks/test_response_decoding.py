@@ -0,0 +1,42 @@
+import pytest
+
+from django_cloudapp_common.influx.db import Query
+from django_cloudapp_common.influx.response import InfluxDBResponse
+from django_cloudapp_common.influx import serializers
+
+from fixtures import dump_query_response, make_query_response
+from models import Cpu
+
+ROW_COUNTS = [
+    1000,
+    100000,
+    pytest.param(1000000, marks=pytest.mark.slow),
+]
+
+
+@pytest.fixture(scope='module', params=ROW_COUNTS)
+def response(request):
+    return InfluxDBResponse(make_query_response(request.param))
+
+
+def test_query_to_objects(benchmark, response):
+    query = Query(model=Cpu)
+    benchmark.pedantic(query.query_to_objects, args=(response,), rounds=3)
+
+
+@pytest.mark.parametrize('serializer_class', [
+    serializers.FormattedSerieSerializer,
+    serializers.FlatFormattedSerieSerializer,
+    serializers.FlatSimpleResultSerializer,
+])
+def test_serializer_convert(benchmark, response, serializer_class):
+    serializer = serializer_class(response)
+    benchmark.pedantic(serializer.convert, rounds=3)
+
+
+@pytest.mark.parametrize('nb_rows', [1000, 100000])
+def test_fetch_all_from_stub_server(benchmark, stub_server, nb_rows):
+    stub_server.set_query_response(dump_query_response(nb_rows))
+    query = Query(model=Cpu)
+    result = benchmark.pedantic(query._fetch_all, rounds=3)
+    assert len(result) == nb_rows
@@ -0,0 +1,39 @@
+from influxdb.line_protocol import make_lines
+
+from django_cloudapp_common.influx.api import InfluxDBApi
+from django_cloudapp_common.influx.app import Influxable
+
+from models import make_cpu_points
+
+NB_POINTS = 10000
+
+
+def test_get_point_data(benchmark):
+    points = make_cpu_points(NB_POINTS)
+
+    def get_points_data():
+        return [p.get_point_data() for p in points]
+
+    benchmark.pedantic(get_points_data, rounds=3)
+
+
+def test_encode_line_protocol(benchmark):
+    points_data = [p.get_point_data() for p in make_cpu_points(NB_POINTS)]
+    benchmark.pedantic(
+        make_lines,
+        args=({'points': points_data},),
+        kwargs={'precision': 'ns'},
+        rounds=3,
+    )
+
+
+def test_write_lines_to_stub_server(benchmark, stub_server):
+    points_data = [p.get_point_data() for p in make_cpu_points(NB_POINTS)]
+    lines = make_lines({'points': points_data}, precision='ns')
+    request = Influxable.get_instance().connection.request
+    benchmark.pedantic(
+        InfluxDBApi.write_lines,
+        args=(request, lines),
+        rounds=3,
+    )
+    assert stub_server.written_lines >= NB_POINTS
@@ -0,0 +1,324 @@
+"""
+Series cardinality analysis of a database.
+
+The series of each measurement and the values of each of its tag keys are
+counted with ``InfluxDBAdmin``, concurrently on a bounded pool of threads.
+A tag is explosive when it has too many values, or when nearly every series
+has its own value, thresholds are read from the ``INFLUXDB_CARDINALITY``
+setting::
+
+    INFLUXDB_CARDINALITY = {
+        'MAX_WORKERS': 4,
+        'EXACT': False,
+        'TAG_VALUES_THRESHOLD': 100000,
+        'UNIQUE_RATIO': 0.5,
+        'MIN_SERIES': 1000,
+        'SERIES_THRESHOLD': 1000000,
+    }
+
+    report = CardinalityAnalyzer(using='default').analyze()
+    print(report.format())
+"""
+import logging
+import math
+
+from . import settings
+from .fields import TagField
+from .helpers.concurrency import run_concurrently
+
+
+logger = logging.getLogger(__name__)
+
+CARDINALITY_DEFAULT_OPTIONS = {
+    'MAX_WORKERS': 4,
+    'EXACT': False,
+    # values of a tag from which it is explosive
+    'TAG_VALUES_THRESHOLD': 100000,
+    # values per series of a tag from which it is explosive ...
+    'UNIQUE_RATIO': 0.5,
+    # ... once the measurement has this many series
+    'MIN_SERIES': 1000,
+    # series of a measurement from which it is reported
+    'SERIES_THRESHOLD': 1000000,
+}
+
+
+def get_measurement_models(using=None):
+    """``Measurement`` subclasses by measurement name."""
+    from .models import Measurement
+    models = {}
+    subclasses = list(Measurement.__subclasses__())
+    while subclasses:
+        model = subclasses.pop()
+        subclasses.extend(model.__subclasses__())
+        model_using = getattr(model.Meta, 'using', None)
+        if using is not None and model_using not in (None, using):
+            continue
+        measurement = model.Meta.db_table or model.__name__.lower()
+        models.setdefault(measurement, model)
+    return models
+
+
+def get_count(result):
+    """Sums the counts of a cardinality result, one per measurement."""
+    if isinstance(result, (int, float)):
+        return int(result)
+    count = 0
+    for serie in result or []:
+        for rows in serie.values():
+            for row in rows:
+                values = [v for v in row.values() if isinstance(v, (int, float))]
+                count += int(values[0]) if values else 0
+    return count
+
+
+class TagCardinality:
+    def __init__(self, key, values, series, contribution=0, is_declared=False):
+        self.key = key
+        self.values = values
+        self.series = series
+        # share of the series cardinality of the measurement due to the tag
+        self.contribution = contribution
+        # declared as a ``TagField`` on the model of the measurement
+        self.is_declared = is_declared
+        self.is_explosive = False
+
+    def __repr__(self):
+        return '<TagCardinality {} {}>'.format(self.key, self.values)
+
+    @property
+    def unique_ratio(self):
+        return self.values / self.series if self.series else 0
+
+    def as_dict(self):
+        return {
+            'key': self.key,
+            'values': self.values,
+            'contribution': self.contribution,
+            'unique_ratio': self.unique_ratio,
+            'is_declared': self.is_declared,
+            'is_explosive': self.is_explosive,
+        }
+
+
+class MeasurementCardinality:
+    def __init__(self, measurement, series, tags=None, model=None):
+        self.measurement = measurement
+        self.series = series
+        self.tags = tags or []
+        self.model = model
+
+    def __repr__(self):
+        return '<MeasurementCardinality {} {}>'.format(self.measurement, self.series)
+
+    @property
+    def explosive_tags(self):
+        return [tag for tag in self.tags if tag.is_explosive]
+
+    def as_dict(self):
+        return {
+            'measurement': self.measurement,
+            'series': self.series,
+            'model': self.model.__name__ if self.model else None,
+            'tags': [tag.as_dict() for tag in self.tags],
+        }
+
+
+class CardinalityReport:
+    def __init__(self, database, measurements, recommendations=None, errors=None):
+        self.database = database
+        self.measurements = sorted(
+            measurements,
+            key=lambda m: m.series,
+            reverse=True,
+        )
+        self.recommendations = recommendations or []
+        # `(measurement, exception)` of the measurements which failed
+        self.errors = errors or []
+
+    def __repr__(self):
+        return '<CardinalityReport {} {}>'.format(self.database, self.total_series)
+
+    @property
+    def total_series(self):
+        return sum(m.series for m in self.measurements)
+
+    @property
+    def explosive_tags(self):
+        return [
+            (m.measurement, tag)
+            for m in self.measurements
+            for tag in m.explosive_tags
+        ]
+
+    def as_dict(self):
+        return {
+            'database': self.database,
+            'total_series': self.total_series,
+            'measurements': [m.as_dict() for m in self.measurements],
+            'recommendations': list(self.recommendations),
+            'errors': [
+                {'measurement': measurement, 'error': repr(error)}
+                for measurement, error in self.errors
+            ],
+        }
+
+    def format(self):
+        lines = ['{}: {} series'.format(self.database, self.total_series)]
+        for m in self.measurements:
+            lines.append('  {}: {} series'.format(m.measurement, m.series))
+            for tag in sorted(m.tags, key=lambda t: t.values, reverse=True):
+                lines.append('    {}{}: {} values, {:.0%} of the cardinality'.format(
+                    tag.key,
+                    ' (explosive)' if tag.is_explosive else '',
+                    tag.values,
+                    tag.contribution,
+                ))
+        for measurement, error in self.errors:
+            lines.append('  {}: {!r}'.format(measurement, error))
+        if self.recommendations:
+            lines.append('Recommendations:')
+            lines.extend('  - {}'.format(r) for r in self.recommendations)
+        return '\n'.join(lines)
+
+
+class CardinalityAnalyzer:
+    def __init__(self, using=None, models=None, options=None):
+        from .db.admin import InfluxDBAdmin
+        self.using = using
+        self.admin = InfluxDBAdmin.using(using)
+        self.options = {
+            **CARDINALITY_DEFAULT_OPTIONS,
+            **settings.INFLUXDB_CARDINALITY,
+            **(options or {}),
+        }
+        if models is None:
+            self.models = get_measurement_models(using)
+        else:
+            self.models = {
+                model.Meta.db_table or model.__name__.lower(): model
+                for model in models
+            }
+
+    def analyze(self, measurements=None, on_progress=None):
+        """
+        Returns the ``CardinalityReport`` of `measurements`, of every
+        measurement of the database by default. `on_progress(done, total,
+        result)` is called as each query completes.
+        """
+        if measurements is None:
+            measurements = self.admin.show_measurements()
+        max_workers = self.options['MAX_WORKERS']
+
+        results = run_concurrently(
+            self._count_series,
+            measurements,
+            max_workers,
+            on_progress,
+        )
+        errors = [(r.item, r.error) for r in results if not r.ok]
+        counted = [r.value for r in results if r.ok]
+
+        tag_items = [
+            (measurement, key)
+            for measurement, _, tag_keys in counted
+            for key in tag_keys
+        ]
+        tag_results = run_concurrently(
+            self._count_tag_values,
+            tag_items,
+            max_workers,
+            on_progress,
+        )
+        tag_values = {}
+        for result in tag_results:
+            if result.ok:
+                tag_values[result.item] = result.value
+            else:
+                errors.append(('{}.{}'.format(*result.item), result.error))
+
+        analyzed = [
+            self._analyze_measurement(measurement, series, tag_keys, tag_values)
+            for measurement, series, tag_keys in counted
+        ]
+        for measurement, error in errors:
+            logger.warning('Error while counting the series of %s: %r', measurement, error)
+        return CardinalityReport(
+            self.admin._get_database_name(),
+            analyzed,
+            self.get_recommendations(analyzed),
+            errors,
+        )
+
+    def _count_series(self, measurement):
+        exact = self.options['EXACT']
+        series = get_count(self.admin.show_series_cardinality(exact, [measurement]))
+        tag_keys = [
+            row['tagKey']
+            for serie in self.admin.show_tag_keys([measurement])
+            for rows in serie.values()
+            for row in rows
+        ]
+        return measurement, series, tag_keys
+
+    def _count_tag_values(self, item):
+        measurement, key = item
+        exact = self.options['EXACT']
+        result = self.admin.show_tag_values_cardinality(key, exact, [measurement])
+        return get_count(result)
+
+    def _analyze_measurement(self, measurement, series, tag_keys, tag_values):
+        model = self.models.get(measurement)
+        declared_tags = set()
+        if model is not None:
+            declared_tags = {
+                f.field_name
+                for f in model._get_fields()
+                if isinstance(f, TagField)
+            }
+        tags = [
+            TagCardinality(
+                key,
+                tag_values[(measurement, key)],
+                series,
+                is_declared=key in declared_tags,
+            )
+            for key in tag_keys
+            if (measurement, key) in tag_values
+        ]
+        # the series cardinality is bounded by the product of the values of
+        # the tags, a tag contributes its share of the logarithm
+        total = sum(math.log(tag.values) for tag in tags if tag.values > 1)
+        for tag in tags:
+            if total and tag.values > 1:
+                tag.contribution = math.log(tag.values) / total
+            tag.is_explosive = self.is_explosive(tag)
+        return MeasurementCardinality(measurement, series, tags, model)
+
+    def is_explosive(self, tag):
+        if tag.values >= self.options['TAG_VALUES_THRESHOLD']:
+            return True
+        return tag.series >= self.options['MIN_SERIES'] and \
+            tag.unique_ratio >= self.options['UNIQUE_RATIO']
+
+    def get_recommendations(self, measurements):
+        recommendations = []
+        for m in measurements:
+            for tag in m.explosive_tags:
+                if tag.is_declared:
+                    msg = '{}: tag `{}` has {} values for {} series, ' \
+                          'declare it as a field of {} instead of a TagField'
+                    recommendations.append(msg.format(
+                        m.measurement, tag.key, tag.values, m.series, m.model.__name__,
+                    ))
+                else:
+                    msg = '{}: tag `{}` has {} values for {} series, ' \
+                          'its writers should store it as a field'
+                    recommendations.append(msg.format(
+                        m.measurement, tag.key, tag.values, m.series,
+                    ))
+            if m.series >= self.options['SERIES_THRESHOLD']:
+                msg = '{}: {} series, shorten its retention policy or ' \
+                      'split it into several measurements'
+                recommendations.append(msg.format(m.measurement, m.series))
+        return recommendations
@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+
+from . import settings
+from .exceptions import InfluxDBCircuitOpenError
+from .signals import circuit_breaker_state_changed
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+DEFAULT_OPTIONS = {
+    'ENABLED': True,
+    'FAILURE_THRESHOLD': 5,
+    'RECOVERY_TIMEOUT': 30,
+    'LATENCY_THRESHOLD': None,
+    'HALF_OPEN_MAX_CALLS': 1,
+}
+
+
+class CircuitBreaker:
+    """
+    Fails fast once `failure_threshold` consecutive calls have failed (or
+    have been slower than `latency_threshold` seconds). After
+    `recovery_timeout` seconds the circuit goes half-open and lets up to
+    `half_open_max_calls` probe calls through : a successful probe closes
+    the circuit, a failed one opens it again.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_threshold=5,
+        recovery_timeout=30,
+        latency_threshold=None,
+        half_open_max_calls=1,
+        enabled=True,
+        failure_exceptions=(Exception,),
+        result_is_failure=None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.latency_threshold = latency_threshold
+        self.half_open_max_calls = half_open_max_calls
+        self.enabled = enabled
+        self.failure_exceptions = failure_exceptions
+        self.result_is_failure = result_is_failure
+
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._failure_count = 0
+        self._opened_at = None
+        self._half_open_calls = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            transition = self._refresh_state()
+        self._notify(transition)
+        return self._state
+
+    @property
+    def failure_count(self):
+        return self._failure_count
+
+    def call(self, func, *args, **kwargs):
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        self.before_call()
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except self.failure_exceptions:
+            self.record_failure()
+            raise
+        except Exception:
+            # the server answered, the error belongs to the caller
+            self.record_success()
+            raise
+
+        latency = time.monotonic() - start
+        if self.result_is_failure and self.result_is_failure(result):
+            self.record_failure()
+        elif self.latency_threshold is not None and \
+                latency > self.latency_threshold:
+            logger.warning(
+                'Slow call on circuit `%s` (%.3fs)', self.name, latency,
+            )
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    def before_call(self):
+        with self._lock:
+            transition = self._refresh_state()
+            state = self._state
+            if state == CircuitState.HALF_OPEN:
+                if self._half_open_calls < self.half_open_max_calls:
+                    self._half_open_calls += 1
+                    state = None
+            elif state == CircuitState.CLOSED:
+                state = None
+            retry_after = self._get_retry_after()
+        self._notify(transition)
+        if state is not None:
+            raise InfluxDBCircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self._failure_count = 0
+            transition = None
+            if self._state != CircuitState.CLOSED:
+                transition = self._set_state(CircuitState.CLOSED)
+        self._notify(transition)
+
+    def record_failure(self):
+        with self._lock:
+            self._failure_count += 1
+            transition = None
+            if self._state == CircuitState.HALF_OPEN or \
+               (self._state == CircuitState.CLOSED and
+                    self._failure_count >= self.failure_threshold):
+                transition = self._set_state(CircuitState.OPEN)
+        self._notify(transition)
+
+    def reset(self):
+        with self._lock:
+            self._failure_count = 0
+            transition = None
+            if self._state != CircuitState.CLOSED:
+                transition = self._set_state(CircuitState.CLOSED)
+        self._notify(transition)
+
+    def _refresh_state(self):
+        if self._state == CircuitState.OPEN and self._get_retry_after() <= 0:
+            return self._set_state(CircuitState.HALF_OPEN)
+        return None
+
+    def _get_retry_after(self):
+        if self._opened_at is None:
+            return 0
+        elapsed = time.monotonic() - self._opened_at
+        return max(self.recovery_timeout - elapsed, 0)
+
+    def _set_state(self, new_state):
+        old_state = self._state
+        self._state = new_state
+        self._half_open_calls = 0
+        if new_state == CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+        elif new_state == CircuitState.CLOSED:
+            self._opened_at = None
+        return (old_state, new_state)
+
+    def _notify(self, transition):
+        # signals are sent outside of the lock
+        if transition is None:
+            return
+        old_state, new_state = transition
+        logger.warning(
+            'Circuit `%s` changed from %s to %s',
+            self.name,
+            old_state,
+            new_state,
+        )
+        circuit_breaker_state_changed.send(
+            sender=self.__class__,
+            name=self.name,
+            old_state=old_state,
+            new_state=new_state,
+        )
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker_options():
+    options = dict(DEFAULT_OPTIONS)
+    options.update(settings.INFLUXDB_CIRCUIT_BREAKER or {})
+    return {
+        'enabled': options['ENABLED'],
+        'failure_threshold': options['FAILURE_THRESHOLD'],
+        'recovery_timeout': options['RECOVERY_TIMEOUT'],
+        'latency_threshold': options['LATENCY_THRESHOLD'],
+        'half_open_max_calls': options['HALF_OPEN_MAX_CALLS'],
+    }
+
+
+def get_circuit_breaker(name, **kwargs):
+    """
+    Returns the circuit breaker shared by every caller using `name`,
+    creating it from the `INFLUXDB_CIRCUIT_BREAKER` setting on first use.
+    """
+    with _circuit_breakers_lock:
+        circuit_breaker = _circuit_breakers.get(name)
+        if circuit_breaker is None:
+            options = get_circuit_breaker_options()
+            options.update(kwargs)
+            circuit_breaker = CircuitBreaker(name, **options)
+            _circuit_breakers[name] = circuit_breaker
+        return circuit_breaker
+
+
+def get_circuit_breakers():
+    with _circuit_breakers_lock:
+        return dict(_circuit_breakers)
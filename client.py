@@ -1,13 +1,50 @@
 """Utilities for working with influxdb."""
 import logging
+import os
 from django.conf import settings
-from threading import Thread
+from threading import Lock, Thread
 
+import requests
 from influxdb import InfluxDBClient
+from influxdb.exceptions import InfluxDBServerError
+from influxdb.line_protocol import make_lines
+
+from . import metrics
+from .circuit_breaker import CircuitState, get_circuit_breaker
+from .exceptions import InfluxDBCircuitOpenError, InfluxDBSpoolLockedError
+from .metrics import MetricName
+from .signals import points_written
+from .spool import SpoolReplayer, WriteSpool
 
 
 logger = logging.getLogger(__name__)
 
+SPOOL_DEFAULT_OPTIONS = {
+    'DIRECTORY': None,
+    'SEGMENT_MAX_BYTES': 16 * 1024 * 1024,
+    'MAX_BYTES': 1024 * 1024 * 1024,
+    'FSYNC_EVERY': 100,
+    'REPLAY_RATE': 5000,
+    'REPLAY_BATCH_SIZE': 5000,
+    'REPLAY_INTERVAL': 5,
+    # processes sharing `DIRECTORY`, each one spools into its own
+    # subdirectory
+    'MAX_PROCESSES': 16,
+}
+
+# errors after which a write may succeed later, the points are spooled;
+# the server rejected the others (type conflicts, invalid line protocol)
+RETRYABLE_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    InfluxDBServerError,
+    InfluxDBCircuitOpenError,
+)
+
+_spool = None
+_spool_unavailable = False
+_spool_lock = Lock()
+
 
 def get_client():
     """Returns an ``InfluxDBClient`` instance."""
@@ -43,6 +80,8 @@ def write_points(data, force_disable_threading=False, **kwargs):
     if getattr(settings, 'INFLUXDB_DISABLED', False):
         return
 
+    # starts replaying points spooled by a previous process
+    get_spool()
     client = get_client()
     use_threading = getattr(settings, 'INFLUXDB_USE_THREADING', False)
     if force_disable_threading:
@@ -54,15 +93,170 @@ def write_points(data, force_disable_threading=False, **kwargs):
         process_points(client, data, kwargs)
 
 
+def get_write_circuit_breaker():
+    """Returns the circuit breaker guarding writes to ``INFLUXDB_HOST``."""
+    name = 'write:{}:{}'.format(settings.INFLUXDB_HOST, settings.INFLUXDB_PORT)
+    return get_circuit_breaker(
+        name,
+        failure_exceptions=(
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            InfluxDBServerError,
+        ),
+    )
+
+
 def process_points(client, data, kwargs):  # pragma: no cover
-    """Method to be called via threading module."""
+    """
+    Method to be called via threading module.
+
+    Writes are short-circuited with ``InfluxDBCircuitOpenError`` while the
+    write circuit breaker is open.
+
+    """
     try:
-        client.write_points(data, **kwargs)
-    except Exception:
-        if getattr(settings, 'INFLUXDB_FAIL_SILENTLY', True):
-            logger.exception('Error while writing data points')
-        else:
+        circuit_breaker = get_write_circuit_breaker()
+        circuit_breaker.call(client.write_points, data, **kwargs)
+        metrics.record_points_written(data)
+        points_written.send(
+            sender=InfluxDBClient,
+            database=kwargs.get('database') or settings.INFLUXDB_DATABASE,
+            points=data,
+        )
+    except Exception as err:
+        if not getattr(settings, 'INFLUXDB_FAIL_SILENTLY', True):
+            # the caller handles the error, spooling would write twice
             raise
+        logger.exception('Error while writing data points')
+        if not is_retryable_error(err):
+            return
+        try:
+            spooled = spool_points(data, **kwargs)
+            if spooled:
+                metrics.increment(MetricName.POINTS_SPOOLED, spooled)
+        except Exception:
+            logger.exception('Error while spooling data points')
+
+
+def is_retryable_error(err):
+    """Returns whether a failed write may succeed when replayed."""
+    return isinstance(err, RETRYABLE_EXCEPTIONS)
+
+
+def get_spool():
+    """
+    Returns the ``WriteSpool`` configured by ``INFLUXDB_SPOOL``, or ``None``
+    when no spool directory is set. The replay worker is started along with
+    the spool.
+
+    Each process locks the first free ``<DIRECTORY>/<n>`` subdirectory, up
+    to ``MAX_PROCESSES``, so the workers sharing the directory never write
+    the same segments. A process started later takes over the subdirectory
+    of a process which exited and replays its points. Nothing is spooled by
+    the processes finding every subdirectory locked.
+
+    """
+    global _spool, _spool_unavailable
+    options = dict(SPOOL_DEFAULT_OPTIONS)
+    options.update(getattr(settings, 'INFLUXDB_SPOOL', {}))
+    if not options['DIRECTORY']:
+        return None
+
+    with _spool_lock:
+        if _spool is None and not _spool_unavailable:
+            _spool = _open_spool(options)
+            if _spool is None:
+                _spool_unavailable = True
+                logger.error(
+                    'The %s spools of %s are used by other processes, points '
+                    'are not spooled',
+                    options['MAX_PROCESSES'],
+                    options['DIRECTORY'],
+                )
+                return None
+            replayer = SpoolReplayer(
+                _spool,
+                replay_points,
+                health_check=is_write_healthy,
+                is_retryable=is_retryable_error,
+                rate=options['REPLAY_RATE'],
+                batch_size=options['REPLAY_BATCH_SIZE'],
+                interval=options['REPLAY_INTERVAL'],
+            )
+            replayer.start()
+    return _spool
+
+
+def _open_spool(options):
+    for slot in range(options['MAX_PROCESSES']):
+        try:
+            return WriteSpool(
+                os.path.join(options['DIRECTORY'], str(slot)),
+                segment_max_bytes=options['SEGMENT_MAX_BYTES'],
+                max_bytes=options['MAX_BYTES'],
+                fsync_every=options['FSYNC_EVERY'],
+            )
+        except InfluxDBSpoolLockedError:
+            continue
+    return None
+
+
+def spool_points(data, **kwargs):
+    """
+    Stores points as line protocol in the spool so that they are written
+    later by the replay worker. Returns the number of spooled lines, ``0``
+    when no spool is set or it is full.
+
+    """
+    spool = get_spool()
+    if spool is None:
+        return 0
+
+    precision = kwargs.get('time_precision')
+    if kwargs.get('protocol') == 'line':
+        if isinstance(data, str):
+            data = [data]
+        lines = [
+            line
+            for item in data
+            for line in item.splitlines()
+            if line.strip()
+        ]
+    else:
+        points = {'points': data, 'tags': kwargs.get('tags')}
+        lines = make_lines(points, precision).splitlines()
+    is_spooled = spool.append(
+        lines,
+        precision=precision,
+        database=kwargs.get('database'),
+        retention_policy=kwargs.get('retention_policy'),
+    )
+    return len(lines) if is_spooled else 0
+
+
+def replay_points(lines, precision=None, database=None, retention_policy=None):
+    """Writes a batch of spooled line protocol."""
+    client = get_client()
+    circuit_breaker = get_write_circuit_breaker()
+    circuit_breaker.call(
+        client.write_points,
+        lines,
+        time_precision=precision,
+        database=database,
+        retention_policy=retention_policy,
+        protocol='line',
+    )
+
+
+def is_write_healthy():
+    """Returns whether spooled points can be replayed."""
+    if get_write_circuit_breaker().state == CircuitState.OPEN:
+        return False
+    try:
+        get_client().ping()
+    except Exception:
+        return False
+    return True
 
 
 def drop_measurement(measurement):
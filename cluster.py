@@ -0,0 +1,334 @@
+import collections
+import itertools
+import logging
+import re
+import threading
+import time
+
+import requests
+
+from . import exceptions
+from .api import InfluxDBApi
+from .circuit_breaker import CircuitState
+from .request import InfluxDBRequest
+
+
+logger = logging.getLogger(__name__)
+
+READ_STATEMENTS = ('SELECT', 'SHOW', 'EXPLAIN')
+# `SELECT ... INTO` writes the points it selects
+INTO_REGEX = re.compile(r'\bINTO\b', re.IGNORECASE)
+
+DEFAULT_OPTIONS = {
+    'PING_INTERVAL': 10,
+    'UNHEALTHY_THRESHOLD': 2,
+    'MAX_QUEUE_BATCHES': 1000,
+    'MAX_BATCH_LINES': 5000,
+}
+
+
+def is_retryable_error(err):
+    """
+    Whether a request failing with `err` may succeed on another node or
+    later: connection errors, an open circuit, timeouts and 5xx.
+    """
+    if isinstance(err, (exceptions.InfluxDBConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(err, 'response', None)
+    return isinstance(err, requests.exceptions.HTTPError) and \
+        response is not None and response.status_code >= 500
+
+
+class InfluxDBNode:
+    """
+    One InfluxDB server of a cluster, with its own session and write queue.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        database_name,
+        auth,
+        timeout=None,
+        pool_size=None,
+        max_queue_batches=1000,
+        max_batch_lines=5000,
+    ):
+        self.request = InfluxDBRequest(
+            base_url,
+            database_name,
+            auth=auth,
+            timeout=timeout,
+            pool_size=pool_size,
+        )
+        self.max_batch_lines = max_batch_lines
+        self.healthy = True
+        self.failure_count = 0
+        self.outstanding = 0
+
+        self._lock = threading.Lock()
+        self._write_queue = collections.deque(maxlen=max_queue_batches)
+        self._write_condition = threading.Condition(self._lock)
+        self._writer = threading.Thread(
+            target=self._write_forever,
+            name='influxdb-writer-{}'.format(base_url),
+            daemon=True,
+        )
+        self._writer.start()
+
+    @property
+    def base_url(self):
+        return self.request.base_url
+
+    @property
+    def is_available(self):
+        circuit_state = self.request.circuit_breaker.state
+        return self.healthy and circuit_state != CircuitState.OPEN
+
+    @property
+    def queue_size(self):
+        with self._lock:
+            return len(self._write_queue)
+
+    def request_with_tracking(self, method, url, **kwargs):
+        with self._lock:
+            self.outstanding += 1
+        try:
+            return self.request.request(method, url, **kwargs)
+        finally:
+            with self._lock:
+                self.outstanding -= 1
+
+    def enqueue_write(self, params, data):
+        with self._write_condition:
+            if len(self._write_queue) == self._write_queue.maxlen:
+                logger.error(
+                    'Write queue of %s is full, dropping the oldest batch',
+                    self.base_url,
+                )
+            self._write_queue.append((params, data))
+            self._write_condition.notify()
+
+    def mark_success(self):
+        with self._lock:
+            self.failure_count = 0
+            was_healthy, self.healthy = self.healthy, True
+        if not was_healthy:
+            logger.warning('InfluxDB node %s is back', self.base_url)
+            with self._write_condition:
+                self._write_condition.notify()
+
+    def mark_failure(self, unhealthy_threshold):
+        with self._lock:
+            self.failure_count += 1
+            was_healthy = self.healthy
+            if self.failure_count >= unhealthy_threshold:
+                self.healthy = False
+        if was_healthy and not self.healthy:
+            logger.warning('Evicting unhealthy InfluxDB node %s', self.base_url)
+
+    def _next_write_batch(self):
+        # batches sharing the same params are coalesced in one request
+        with self._write_condition:
+            while not self._write_queue or not self.healthy:
+                self._write_condition.wait()
+            params, data = self._write_queue.popleft()
+            lines = [data]
+            nb_lines = data.count('\n') + 1
+            while self._write_queue and nb_lines < self.max_batch_lines:
+                next_params, next_data = self._write_queue[0]
+                if next_params != params:
+                    break
+                self._write_queue.popleft()
+                lines.append(next_data)
+                nb_lines += next_data.count('\n') + 1
+            return params, lines
+
+    def _requeue_write_batch(self, params, lines):
+        with self._write_condition:
+            for data in reversed(lines):
+                if len(self._write_queue) == self._write_queue.maxlen:
+                    break
+                self._write_queue.appendleft((params, data))
+
+    def _write_forever(self):
+        while True:
+            params, lines = self._next_write_batch()
+            data = '\n'.join(line.rstrip('\n') for line in lines)
+            try:
+                self.request.post('/write', params=params, data=data)
+            except Exception as err:
+                if not is_retryable_error(err):
+                    # rejected by the server, writing it again would fail
+                    logger.exception('Error while writing to %s', self.base_url)
+                    continue
+                # kept until the health check brings the node back
+                logger.warning('Write to %s to retry: %r', self.base_url, err)
+                self._requeue_write_batch(params, lines)
+                self.mark_failure(unhealthy_threshold=1)
+
+
+class InfluxDBClusterRequest:
+    """
+    Same interface as ``InfluxDBRequest`` for several InfluxDB nodes.
+
+    Writes (``/write`` and non-read statements) are replicated to every
+    node, ``/write`` through per-node queues; reads go to the available node
+    with the least outstanding requests. Nodes failing ``/ping`` are
+    evicted until they answer again.
+
+    """
+    is_cluster = True
+
+    def __init__(
+        self,
+        base_urls,
+        database_name,
+        auth,
+        timeout=None,
+        pool_size=None,
+        options=None,
+    ):
+        _options = dict(DEFAULT_OPTIONS)
+        _options.update(options or {})
+        self.database_name = database_name
+        self.auth = auth
+        self.ping_interval = _options['PING_INTERVAL']
+        self.unhealthy_threshold = _options['UNHEALTHY_THRESHOLD']
+        self.nodes = [
+            InfluxDBNode(
+                base_url,
+                database_name,
+                auth,
+                timeout=timeout,
+                pool_size=pool_size,
+                max_queue_batches=_options['MAX_QUEUE_BATCHES'],
+                max_batch_lines=_options['MAX_BATCH_LINES'],
+            )
+            for base_url in base_urls
+        ]
+        self._round_robin = itertools.count()
+        self._monitor = threading.Thread(
+            target=self._monitor_forever,
+            name='influxdb-cluster-monitor',
+            daemon=True,
+        )
+        self._monitor.start()
+
+    @property
+    def base_url(self):
+        return self._get_read_nodes()[0].base_url
+
+    @property
+    def healthy_nodes(self):
+        return [n for n in self.nodes if n.is_available]
+
+    def request(self, method, url, **kwargs):
+        if url == '/write':
+            return self._write(**kwargs)
+        if url == '/query' and not self._is_read_query(kwargs):
+            return self._broadcast(method, url, **kwargs)
+        return self._read(method, url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('head', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('post', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('put', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('patch', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('delete', url, **kwargs)
+
+    def ping_nodes(self):
+        for node in self.nodes:
+            try:
+                InfluxDBApi.ping(node.request)
+            except Exception:
+                node.mark_failure(self.unhealthy_threshold)
+            else:
+                node.mark_success()
+
+    def _read(self, method, url, **kwargs):
+        last_error = None
+        for node in self._get_read_nodes():
+            try:
+                return node.request_with_tracking(method, url, **kwargs)
+            except Exception as err:
+                if not is_retryable_error(err):
+                    raise
+                # reads are retried on the next node
+                logger.warning('Read from %s failed: %r', node.base_url, err)
+                node.mark_failure(self.unhealthy_threshold)
+                last_error = err
+        raise last_error
+
+    def _broadcast(self, method, url, **kwargs):
+        response = None
+        last_error = None
+        nodes = self._get_available_nodes()
+        missed_nodes = [n for n in self.nodes if n not in nodes]
+        for node in nodes:
+            try:
+                node_response = node.request_with_tracking(method, url, **kwargs)
+            except Exception as err:
+                if not is_retryable_error(err):
+                    raise
+                logger.error('Statement not applied on %s : %s', node.base_url, err)
+                node.mark_failure(self.unhealthy_threshold)
+                missed_nodes.append(node)
+                last_error = err
+            else:
+                response = response or node_response
+        if missed_nodes:
+            # unlike `/write`, statements are not queued for the nodes
+            # coming back, they have to be applied on them again
+            logger.error(
+                'Statement to apply again on %s : %s',
+                ', '.join(n.base_url for n in missed_nodes),
+                (kwargs.get('params') or {}).get('q'),
+            )
+        if response is None:
+            raise last_error
+        return response
+
+    def _write(self, params=None, data='', **kwargs):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        for node in self.nodes:
+            node.enqueue_write(params or {}, data)
+        return None
+
+    def _get_available_nodes(self):
+        # every node is tried when none of them is known to be healthy
+        return self.healthy_nodes or list(self.nodes)
+
+    def _get_read_nodes(self):
+        nodes = self._get_available_nodes()
+        shift = next(self._round_robin) % len(nodes)
+        nodes = nodes[shift:] + nodes[:shift]
+        return sorted(nodes, key=lambda n: n.outstanding)
+
+    def _monitor_forever(self):
+        while True:
+            time.sleep(self.ping_interval)
+            self.ping_nodes()
+
+    @staticmethod
+    def _is_read_query(kwargs):
+        params = kwargs.get('params') or {}
+        statements = str(params.get('q', '')).split(';')
+        return all(
+            statement.lstrip().upper().startswith(READ_STATEMENTS) and
+            not INTO_REGEX.search(statement)
+            for statement in statements
+            if statement.strip()
+        )
@@ -1,5 +1,6 @@
 from . import settings
 from .api import InfluxDBApi
+from .cluster import InfluxDBClusterRequest
 from .request import InfluxDBRequest
 
 
@@ -12,13 +13,33 @@ class Connection:
             'database_name',
             settings.INFLUXDB_DATABASE,
         )
+        self.timeout = kwargs.get('timeout', settings.INFLUXDB_TIMEOUT)
+        self.pool_size = kwargs.get('pool_size', None)
+        self.retention_policy = kwargs.get(
+            'retention_policy',
+            settings.INFLUXDB_RETENTION_POLICY,
+        )
+        self.base_urls = kwargs.get('base_urls', settings.INFLUXDB_URLS) or \
+            [self.base_url]
 
         self.auth = (self.user, self.password)
-        self.request = InfluxDBRequest(
-            self.base_url,
-            self.database_name,
-            auth=self.auth,
-        )
+        if len(self.base_urls) > 1:
+            self.request = InfluxDBClusterRequest(
+                self.base_urls,
+                self.database_name,
+                auth=self.auth,
+                timeout=self.timeout,
+                pool_size=self.pool_size,
+                options=settings.INFLUXDB_CLUSTER,
+            )
+        else:
+            self.request = InfluxDBRequest(
+                self.base_urls[0],
+                self.database_name,
+                auth=self.auth,
+                timeout=self.timeout,
+                pool_size=self.pool_size,
+            )
         self.stream = False
         self.check_if_connection_reached()
 
@@ -32,7 +53,7 @@ class Connection:
 
     @property
     def policy_name(self):
-        return 'autogen'
+        return self.retention_policy or 'autogen'
 
     @property
     def full_database_name(self):
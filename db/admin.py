@@ -1,6 +1,10 @@
-from .. import Influxable, exceptions, serializers
+import datetime
+
+from .. import Influxable, exceptions, rollups, serializers
 from .criteria import Criteria
 from .query import RawQuery
+from ..helpers.concurrency import DEFAULT_MAX_WORKERS, run_concurrently
+from ..helpers.utils import datetime_to_nanoseconds, parse_time_nanoseconds
 from ..response import InfluxDBResponse
 
 
@@ -12,13 +16,23 @@ class Privileges:
 
 PRIVILEGE_VALUES = ['ALL', 'READ', 'WRITE']
 
+DEFAULT_BATCH_SIZE = 100
+
+# the statements are sent in the query string of the request
+MAX_BATCH_LENGTH = 8000
+
+# error of the statements following a failed one in a request
+NOT_EXECUTED_ERROR = 'not executed'
+
 
 class GenericDBAdminCommand:
-    @staticmethod
-    def _add_database_name_to_options(options):
-        database_name = GenericDBAdminCommand._get_database_name()
-        full_database_name = GenericDBAdminCommand._get_full_database_name()
-        database_name = GenericDBAdminCommand._format_with_double_quote(
+    _db = None
+
+    @classmethod
+    def _add_database_name_to_options(cls, options):
+        database_name = cls._get_database_name()
+        full_database_name = cls._get_full_database_name()
+        database_name = cls._format_with_double_quote(
             database_name
         )
         options.update({
@@ -27,22 +41,27 @@ class GenericDBAdminCommand:
         })
         return options
 
-    @staticmethod
-    def _execute_query(query, options={}):
-        options = GenericDBAdminCommand._add_database_name_to_options(options)
-        prepared_query = query.format(**options)
-        response = RawQuery(prepared_query).execute()
+    @classmethod
+    def _prepare_query(cls, query, options={}):
+        options = cls._add_database_name_to_options(dict(options))
+        return query.format(**options).strip()
+
+    @classmethod
+    def _execute_query(cls, query, options={}):
+        prepared_query = cls._prepare_query(query, options)
+        response = RawQuery(prepared_query, using=cls._db).execute()
         influx_response = InfluxDBResponse(response)
         influx_response.raise_if_error()
         return influx_response
 
-    @staticmethod
+    @classmethod
     def _execute_query_with_parser(
+        cls,
         query,
         parser=serializers.FlatFormattedSerieSerializer,
         options={},
     ):
-        influx_response = GenericDBAdminCommand._execute_query(query, options)
+        influx_response = cls._execute_query(query, options)
         formatted_result = parser(influx_response).convert()
         return formatted_result
 
@@ -57,9 +76,9 @@ class GenericDBAdminCommand:
             raise exceptions.InfluxDBInvalidChoiceError(msg)
         return privilege
 
-    @staticmethod
-    def _get_formatted_user_name(user_name):
-        return GenericDBAdminCommand._format_with_double_quote(user_name)
+    @classmethod
+    def _get_formatted_user_name(cls, user_name):
+        return cls._format_with_double_quote(user_name)
 
     @staticmethod
     def _generate_from_clause(measurements):
@@ -131,21 +150,21 @@ class GenericDBAdminCommand:
     def _generate_shard_duration_clause(sh_duration=None):
         return 'SHARD DURATION {}'.format(sh_duration) if sh_duration else ''
 
-    @staticmethod
-    def _get_database_name():
-        instance = GenericDBAdminCommand._get_influxable_instance()
+    @classmethod
+    def _get_database_name(cls):
+        instance = cls._get_influxable_instance()
         database_name = instance.database_name
         return database_name
 
-    @staticmethod
-    def _get_full_database_name():
-        instance = GenericDBAdminCommand._get_influxable_instance()
+    @classmethod
+    def _get_full_database_name(cls):
+        instance = cls._get_influxable_instance()
         full_database_name = instance.full_database_name
         return full_database_name
 
-    @staticmethod
-    def _get_influxable_instance():
-        instance = Influxable.get_instance()
+    @classmethod
+    def _get_influxable_instance(cls):
+        instance = Influxable.get_instance(cls._db)
         return instance
 
     @staticmethod
@@ -158,8 +177,9 @@ class GenericDBAdminCommand:
 
 
 class AlterAdminCommand:
-    @staticmethod
+    @classmethod
     def alter_retention_policy(
+        cls,
         policy_name,
         duration=None,
         replication=None,
@@ -172,20 +192,20 @@ class AlterAdminCommand:
                   ' or `is_default` must be not null'
             raise exceptions.InfluxDBError(msg)
 
-        policy_name = GenericDBAdminCommand._format_with_double_quote(
+        policy_name = cls._format_with_double_quote(
             policy_name,
         )
 
-        default_clause = GenericDBAdminCommand._generate_default_clause(
+        default_clause = cls._generate_default_clause(
             is_default
         )
-        duration_clause = GenericDBAdminCommand._generate_duration_clause(
+        duration_clause = cls._generate_duration_clause(
             duration
         )
-        replication_clause = GenericDBAdminCommand._generate_replication_clause(
+        replication_clause = cls._generate_replication_clause(
             replication
         )
-        shard_duration_clause = GenericDBAdminCommand._generate_shard_duration_clause(
+        shard_duration_clause = cls._generate_shard_duration_clause(
             shard_duration
         )
 
@@ -201,24 +221,323 @@ class AlterAdminCommand:
                 ' {replication_clause}' +\
                 ' {shard_duration_clause}' +\
                 ' {default_clause}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
+        return True
+
+
+class BatchAdminCommand:
+    @classmethod
+    def execute_many(
+        cls,
+        statements,
+        parser=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        max_workers=DEFAULT_MAX_WORKERS,
+        on_progress=None,
+    ):
+        """
+        Executes `statements` joined with `;` by requests of `batch_size`
+        statements, the requests on at most `max_workers` threads, and
+        returns the result of each statement, converted by `parser` when
+        given. InfluxDB stops a request at its first failed statement, the
+        statements it didn't execute, or those of a request which failed
+        as a whole, are then executed one by one. `on_progress(done, total,
+        result)` is called with the counts of statements as each request
+        completes. Raises ``InfluxDBBatchError`` once every request ran if
+        statements failed.
+        """
+        statements = list(statements)
+        batches = cls._get_batches(statements, batch_size)
+        responses = [None] * len(statements)
+        errors = [None] * len(statements)
+        done = 0
+
+        def report_progress(count, result):
+            nonlocal done
+            done += count
+            if on_progress is not None and count:
+                on_progress(done, len(statements), result)
+
+        batch_results = run_concurrently(
+            cls._execute_batch,
+            batches,
+            max_workers,
+            lambda _, __, result: report_progress(
+                len(result.item) - len(cls._get_positions_to_retry(result)),
+                result,
+            ),
+        )
+        retried_indexes = []
+        offset = 0
+        for batch_result in batch_results:
+            positions_to_retry = cls._get_positions_to_retry(batch_result)
+            for position in range(len(batch_result.item)):
+                index = offset + position
+                if position in positions_to_retry:
+                    retried_indexes.append(index)
+                    continue
+                response = batch_result.value[position]
+                if response.error:
+                    errors[index] = response.error
+                else:
+                    responses[index] = response
+            offset += len(batch_result.item)
+
+        retry_results = run_concurrently(
+            cls._execute_batch,
+            [[statements[index]] for index in retried_indexes],
+            max_workers,
+            lambda _, __, result: report_progress(1, result),
+        )
+        for index, retry_result in zip(retried_indexes, retry_results):
+            if not retry_result.ok:
+                errors[index] = str(retry_result.error)
+            elif retry_result.value[0].error:
+                errors[index] = retry_result.value[0].error
+            else:
+                responses[index] = retry_result.value[0]
+
+        failed_statements = [
+            (statement, error)
+            for statement, error in zip(statements, errors)
+            if error is not None
+        ]
+        if failed_statements:
+            raise exceptions.InfluxDBBatchError(failed_statements, len(statements))
+        if parser is not None:
+            return [parser(response).convert() for response in responses]
+        return responses
+
+    @staticmethod
+    def _get_positions_to_retry(batch_result):
+        """
+        Positions in its batch of the statements to execute again: those
+        not executed after a failed statement, every statement when the
+        request failed.
+        """
+        if not batch_result.ok:
+            return set(range(len(batch_result.item)))
+        return {
+            position
+            for position, response in enumerate(batch_result.value)
+            if response.error == NOT_EXECUTED_ERROR
+        }
+
+    @classmethod
+    def _execute_batch(cls, batch):
+        response = RawQuery(';'.join(batch), using=cls._db).execute()
+        influx_response = InfluxDBResponse(response)
+        results = influx_response.results
+        if len(results) != len(batch):
+            influx_response.raise_if_error()
+            msg = '{} results for {} statements'.format(len(results), len(batch))
+            raise exceptions.InfluxDBInvalidResponseError(msg)
+        return results
+
+    @staticmethod
+    def _get_batches(statements, batch_size=DEFAULT_BATCH_SIZE):
+        batches = []
+        batch = []
+        length = 0
+        for statement in statements:
+            if batch and (
+                len(batch) >= batch_size or
+                length + len(statement) + 1 > MAX_BATCH_LENGTH
+            ):
+                batches.append(batch)
+                batch = []
+                length = 0
+            batch.append(statement)
+            length += len(statement) + 1
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @classmethod
+    def drop_series_many(cls, targets, **batch_options):
+        """
+        Drops the series of each `(measurements, criteria)` target, the
+        measurements of targets with the same criteria in one statement.
+        See ``execute_many`` for `batch_options`.
+        """
+        measurements_by_where_clause = {}
+        statements = []
+        for measurements, criteria in targets:
+            where_clause = cls._generate_where_clause(criteria)
+            if not measurements and not where_clause:
+                msg = '`measurements` or `criteria` must be not null'
+                raise exceptions.InfluxDBError(msg)
+            if not measurements:
+                statements.append(cls._prepare_query(
+                    'DROP SERIES {where_clause}',
+                    {'where_clause': where_clause},
+                ))
+                continue
+            grouped_measurements = measurements_by_where_clause.setdefault(
+                where_clause,
+                {},
+            )
+            grouped_measurements.update(dict.fromkeys(measurements))
+        for where_clause, measurements in measurements_by_where_clause.items():
+            from_clause = cls._generate_from_clause(list(measurements))
+            statements.append(cls._prepare_query(
+                'DROP SERIES {from_clause} {where_clause}',
+                {'from_clause': from_clause, 'where_clause': where_clause},
+            ))
+        cls.execute_many(statements, **batch_options)
         return True
 
+    @classmethod
+    def delete_many(cls, targets, **batch_options):
+        """
+        Deletes the points of each `(measurements, criteria)` target. See
+        ``execute_many`` for `batch_options`.
+        """
+        statements = []
+        for measurements, criteria in targets:
+            from_clause = cls._generate_from_clause(measurements)
+            where_clause = cls._generate_where_clause(criteria)
+            if not from_clause and not where_clause:
+                msg = '`measurements` or `criteria` must be not null'
+                raise exceptions.InfluxDBError(msg)
+            statements.append(cls._prepare_query(
+                'DELETE {from_clause} {where_clause}',
+                {'from_clause': from_clause, 'where_clause': where_clause},
+            ))
+        cls.execute_many(statements, **batch_options)
+        return True
+
+    @classmethod
+    def drop_measurements(cls, measurement_names, **batch_options):
+        statements = [
+            cls._prepare_query(
+                'DROP MEASUREMENT {measurement_name}',
+                {'measurement_name': cls._format_with_double_quote(name)},
+            )
+            for name in dict.fromkeys(measurement_names)
+        ]
+        cls.execute_many(statements, **batch_options)
+        return True
+
+    @classmethod
+    def show_tag_values_many(cls, keys, measurements=[], **batch_options):
+        """Returns the result of ``show_tag_values`` for each tag key."""
+        from_clause = cls._generate_from_clause(measurements)
+        keys = list(dict.fromkeys(keys))
+        statements = [
+            cls._prepare_query(
+                'SHOW TAG VALUES {from_clause} WITH {key_clause}',
+                {
+                    'from_clause': from_clause,
+                    'key_clause': 'KEY = "{}"'.format(key),
+                },
+            )
+            for key in keys
+        ]
+        parser = serializers.FormattedSerieSerializer
+        results = cls.execute_many(statements, parser, **batch_options)
+        return dict(zip(keys, results))
+
+    @classmethod
+    def show_tag_keys_many(cls, measurements, **batch_options):
+        """Returns the result of ``show_tag_keys`` for each measurement."""
+        measurements = list(dict.fromkeys(measurements))
+        statements = [
+            cls._prepare_query(
+                'SHOW TAG KEYS {from_clause}',
+                {'from_clause': cls._generate_from_clause([measurement])},
+            )
+            for measurement in measurements
+        ]
+        parser = serializers.FormattedSerieSerializer
+        results = cls.execute_many(statements, parser, **batch_options)
+        return dict(zip(measurements, results))
+
 
 class CreateAdminCommand:
-    @staticmethod
-    def create_continuous_query():
-        raise NotImplementedError
+    @classmethod
+    def create_continuous_query(
+        cls,
+        query_name,
+        select_query,
+        resample_every=None,
+        resample_for=None,
+    ):
+        if ' INTO ' not in ' {} '.format(select_query).upper():
+            msg = '`select_query` must have an INTO clause'
+            raise exceptions.InfluxDBError(msg)
 
-    @staticmethod
+        query_name = cls._format_with_double_quote(
+            query_name,
+        )
+        resample_clause = ''
+        if resample_every or resample_for:
+            resample_clause = 'RESAMPLE'
+            if resample_every:
+                resample_clause += ' EVERY {}'.format(resample_every)
+            if resample_for:
+                resample_clause += ' FOR {}'.format(resample_for)
+
+        options = {
+            'query_name': query_name,
+            'resample_clause': resample_clause,
+            'select_query': select_query,
+        }
+        query = 'CREATE CONTINUOUS QUERY {query_name} ON {database_name}' +\
+                ' {resample_clause}' +\
+                ' BEGIN {select_query} END'
+        cls._execute_query(query, options)
+        return True
+
+    @classmethod
+    def create_rollups(
+        cls,
+        model,
+        create_policies=False,
+        resample_for=None,
+        backfill_start=None,
+    ):
+        """
+        Creates the continuous queries of the rollups declared on `model`,
+        and their retention policies with `create_policies`. With
+        `backfill_start`, the intervals from `backfill_start` to now are
+        aggregated at once, the rollups can then be declared with it as
+        `start`.
+        """
+        backfill_end = None
+        if backfill_start is not None:
+            backfill_start = parse_time_nanoseconds(backfill_start)
+            backfill_end = datetime_to_nanoseconds(
+                datetime.datetime.now(datetime.timezone.utc),
+            )
+        for rollup in rollups.get_rollups(model):
+            if create_policies and rollup.policy and rollup.duration:
+                cls.create_retention_policy(
+                    rollup.policy,
+                    duration=rollup.duration,
+                    replication=1,
+                )
+            cls.create_continuous_query(
+                rollup.get_name(model),
+                rollup.get_select_query(model),
+                resample_for=resample_for,
+            )
+            if backfill_start is not None:
+                cls._execute_query(
+                    rollup.get_select_query(model, backfill_start, backfill_end),
+                )
+        return True
+
+    @classmethod
     def create_database(
+        cls,
         new_database_name,
         duration=None,
         replication=None,
         shard_duration=None,
         policy_name=None,
     ):
-        new_database_name = GenericDBAdminCommand._format_with_double_quote(
+        new_database_name = cls._format_with_double_quote(
             new_database_name,
         )
         options = {'new_database_name': new_database_name}
@@ -229,13 +548,13 @@ class CreateAdminCommand:
             if policy_name:
                 policy_clause = 'NAME "{}"'.format(policy_name)
 
-            duration_clause = GenericDBAdminCommand._generate_duration_clause(
+            duration_clause = cls._generate_duration_clause(
                 duration
             )
-            replication_clause = GenericDBAdminCommand._generate_replication_clause(
+            replication_clause = cls._generate_replication_clause(
                 replication
             )
-            shard_duration_clause = GenericDBAdminCommand._generate_shard_duration_clause(
+            shard_duration_clause = cls._generate_shard_duration_clause(
                 shard_duration
             )
 
@@ -251,11 +570,12 @@ class CreateAdminCommand:
                 'shard_duration_clause': shard_duration_clause,
             })
         query = 'CREATE DATABASE {new_database_name}' + with_clause
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
+    @classmethod
     def create_retention_policy(
+        cls,
         policy_name,
         duration=None,
         replication=None,
@@ -272,20 +592,20 @@ class CreateAdminCommand:
             msg = '`duration` or `replication` must be not null'
             raise exceptions.InfluxDBError(msg)
 
-        policy_name = GenericDBAdminCommand._format_with_double_quote(
+        policy_name = cls._format_with_double_quote(
             policy_name,
         )
 
-        default_clause = GenericDBAdminCommand._generate_default_clause(
+        default_clause = cls._generate_default_clause(
             is_default
         )
-        duration_clause = GenericDBAdminCommand._generate_duration_clause(
+        duration_clause = cls._generate_duration_clause(
             duration
         )
-        replication_clause = GenericDBAdminCommand._generate_replication_clause(
+        replication_clause = cls._generate_replication_clause(
             replication
         )
-        shard_duration_clause = GenericDBAdminCommand._generate_shard_duration_clause(
+        shard_duration_clause = cls._generate_shard_duration_clause(
             shard_duration
         )
 
@@ -301,12 +621,12 @@ class CreateAdminCommand:
                 ' {replication_clause}' +\
                 ' {shard_duration_clause}' +\
                 ' {default_clause}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def create_subscription(subscription_name, hosts, any=False):
-        subscription_name = GenericDBAdminCommand._format_with_double_quote(
+    @classmethod
+    def create_subscription(cls, subscription_name, hosts, any=False):
+        subscription_name = cls._format_with_double_quote(
             subscription_name,
         )
         destination_type = 'ANY' if any else 'ALL'
@@ -319,13 +639,13 @@ class CreateAdminCommand:
         query = 'CREATE SUBSCRIPTION {subscription_name}' +\
                 ' ON {full_database_name}' +\
                 ' DESTINATIONS {destination_type} {hosts}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def create_user(user_name, password, with_privileges=False):
-        user_name = GenericDBAdminCommand._get_formatted_user_name(user_name)
-        password = GenericDBAdminCommand._format_with_simple_quote(
+    @classmethod
+    def create_user(cls, user_name, password, with_privileges=False):
+        user_name = cls._get_formatted_user_name(user_name)
+        password = cls._format_with_simple_quote(
             password,
         )
         privilege_clause = 'WITH ALL PRIVILEGES' if with_privileges else ''
@@ -336,15 +656,15 @@ class CreateAdminCommand:
         }
         query = 'CREATE USER {user_name} WITH PASSWORD {password}' +\
                 ' {privilege_clause}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
 
 class DeleteAdminCommand:
-    @staticmethod
-    def delete(measurements=[], criteria=[]):
-        from_clause = GenericDBAdminCommand._generate_from_clause(measurements)
-        where_clause = GenericDBAdminCommand._generate_where_clause(criteria)
+    @classmethod
+    def delete(cls, measurements=[], criteria=[]):
+        from_clause = cls._generate_from_clause(measurements)
+        where_clause = cls._generate_where_clause(criteria)
 
         if not from_clause and not where_clause:
             msg = '`measurements` or `criteria` must be not null'
@@ -355,55 +675,55 @@ class DeleteAdminCommand:
             'where_clause': where_clause,
         }
         query = 'DELETE {from_clause} {where_clause}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
 
 class DropAdminCommand:
-    @staticmethod
-    def drop_continuous_query(query_name):
-        query_name = GenericDBAdminCommand._format_with_double_quote(
+    @classmethod
+    def drop_continuous_query(cls, query_name):
+        query_name = cls._format_with_double_quote(
             query_name,
         )
         options = {'query_name': query_name}
         query = 'DROP CONTINUOUS QUERY {query_name} ON {database_name}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def drop_database(database_name_to_delete):
-        _database_name = GenericDBAdminCommand._format_with_double_quote(
+    @classmethod
+    def drop_database(cls, database_name_to_delete):
+        _database_name = cls._format_with_double_quote(
             database_name_to_delete,
         )
         options = {'_database_name': _database_name}
         query = 'DROP DATABASE {_database_name}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def drop_measurement(measurement_name):
-        measurement_name = GenericDBAdminCommand._format_with_double_quote(
+    @classmethod
+    def drop_measurement(cls, measurement_name):
+        measurement_name = cls._format_with_double_quote(
             measurement_name,
         )
         options = {'measurement_name': measurement_name}
         query = 'DROP MEASUREMENT {measurement_name}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def drop_retention_policy(policy_name):
-        policy_name = GenericDBAdminCommand._format_with_double_quote(
+    @classmethod
+    def drop_retention_policy(cls, policy_name):
+        policy_name = cls._format_with_double_quote(
             policy_name,
         )
         options = {'policy_name': policy_name}
         query = 'DROP RETENTION POLICY {policy_name} ON {database_name}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def drop_series(measurements=[], criteria=[]):
-        from_clause = GenericDBAdminCommand._generate_from_clause(measurements)
-        where_clause = GenericDBAdminCommand._generate_where_clause(criteria)
+    @classmethod
+    def drop_series(cls, measurements=[], criteria=[]):
+        from_clause = cls._generate_from_clause(measurements)
+        where_clause = cls._generate_where_clause(criteria)
 
         if not from_clause and not where_clause:
             msg = '`measurements` or `criteria` must be not null'
@@ -414,38 +734,38 @@ class DropAdminCommand:
             'where_clause': where_clause,
         }
         query = 'DROP SERIES {from_clause} {where_clause}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def drop_shard(shard_id):
+    @classmethod
+    def drop_shard(cls, shard_id):
         options = {'shard_id': shard_id}
         query = 'DROP SHARD {shard_id}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def drop_subscription(subscription_name):
-        subscription_name = GenericDBAdminCommand._format_with_double_quote(
+    @classmethod
+    def drop_subscription(cls, subscription_name):
+        subscription_name = cls._format_with_double_quote(
             subscription_name,
         )
         options = {'subscription_name': subscription_name}
         query = 'DROP SUBSCRIPTION {subscription_name} ON {full_database_name}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
-    @staticmethod
-    def drop_user(user_name):
-        user_name = GenericDBAdminCommand._get_formatted_user_name(user_name)
+    @classmethod
+    def drop_user(cls, user_name):
+        user_name = cls._get_formatted_user_name(user_name)
         options = {'user_name': user_name}
         query = 'DROP USER {user_name}'
-        InfluxDBAdmin._execute_query(query, options)
+        cls._execute_query(query, options)
         return True
 
 
 class ExplainAdminCommand:
-    @staticmethod
-    def explain(query, analyze=False):
+    @classmethod
+    def explain(cls, query, analyze=False):
         analyze = 'ANALYZE' if analyze else ''
         options = {
             'analyze': analyze,
@@ -453,152 +773,160 @@ class ExplainAdminCommand:
         }
         query = 'EXPLAIN {analyze} {query}'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
 
 class GrantAdminCommand:
-    @staticmethod
-    def grant(privilege, user_name):
-        privilege = GenericDBAdminCommand._get_formatted_privilege(privilege)
-        user_name = GenericDBAdminCommand._get_formatted_user_name(user_name)
+    @classmethod
+    def grant(cls, privilege, user_name):
+        privilege = cls._get_formatted_privilege(privilege)
+        user_name = cls._get_formatted_user_name(user_name)
         options = {
             'privilege': privilege,
             'user_name': user_name,
         }
         query = 'GRANT {privilege} ON {database_name} TO {user_name}'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
 
 class KillAdminCommand:
-    @staticmethod
-    def kill(query_id):
+    @classmethod
+    def kill(cls, query_id):
         options = {'query_id': query_id}
         query = 'KILL QUERY {query_id}'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
 
 class RevokeAdminCommand:
-    @staticmethod
-    def revoke(privilege, user_name):
-        privilege = GenericDBAdminCommand._get_formatted_privilege(privilege)
-        user_name = GenericDBAdminCommand._get_formatted_user_name(user_name)
+    @classmethod
+    def revoke(cls, privilege, user_name):
+        privilege = cls._get_formatted_privilege(privilege)
+        user_name = cls._get_formatted_user_name(user_name)
         options = {
             'privilege': privilege,
             'user_name': user_name,
         }
         query = 'REVOKE {privilege} ON {database_name} FROM {user_name}'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
 
 class ShowAdminCommand:
-    @staticmethod
-    def show_field_key_cardinality(exact=False):
+    @classmethod
+    def show_field_key_cardinality(cls, exact=False):
         exact = 'EXACT' if exact else ''
         options = {'exact': exact}
         query = 'SHOW FIELD KEY {exact} CARDINALITY'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_measurement_cardinality(exact=False):
+    @classmethod
+    def show_measurement_cardinality(cls, exact=False):
         exact = 'EXACT' if exact else ''
         options = {'exact': exact}
         query = 'SHOW MEASUREMENT {exact} CARDINALITY'
         parser = serializers.FlatSingleValueSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_series_cardinality(exact=False):
-        exact = 'EXACT' if exact else ''
-        options = {'exact': exact}
-        query = 'SHOW SERIES {exact} CARDINALITY'
+    @classmethod
+    def show_series_cardinality(cls, exact=False, measurements=[]):
+        from_clause = cls._generate_from_clause(measurements)
         parser = serializers.FlatSingleValueSerializer
-        if exact:
+        if exact or from_clause:
+            # the cardinality is counted for each measurement
             parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        exact = 'EXACT' if exact else ''
+        options = {
+            'exact': exact,
+            'from_clause': from_clause,
+        }
+        query = 'SHOW SERIES {exact} CARDINALITY {from_clause}'
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_tag_key_cardinality(exact=False):
+    @classmethod
+    def show_tag_key_cardinality(cls, exact=False):
         exact = 'EXACT' if exact else ''
         options = {'exact': exact}
         query = 'SHOW TAG KEY {exact} CARDINALITY'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_tag_values_cardinality(key, exact=False):
+    @classmethod
+    def show_tag_values_cardinality(cls, key, exact=False, measurements=[]):
         key_clause = 'KEY = "{key}"'.format(key=key)
+        from_clause = cls._generate_from_clause(measurements)
         exact = 'EXACT' if exact else ''
         options = {
             'exact': exact,
+            'from_clause': from_clause,
             'key_clause': key_clause,
         }
-        query = 'SHOW TAG VALUES {exact} CARDINALITY WITH {key_clause}'
+        query = 'SHOW TAG VALUES {exact} CARDINALITY {from_clause}' +\
+                ' WITH {key_clause}'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_continuous_queries():
+    @classmethod
+    def show_continuous_queries(cls):
         query = 'SHOW CONTINUOUS QUERIES'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
-    @staticmethod
-    def show_diagnostics():
+    @classmethod
+    def show_diagnostics(cls):
         query = 'SHOW DIAGNOSTICS'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
-    @staticmethod
-    def show_field_keys(measurements=[]):
-        from_clause = GenericDBAdminCommand._generate_from_clause(measurements)
+    @classmethod
+    def show_field_keys(cls, measurements=[]):
+        from_clause = cls._generate_from_clause(measurements)
         options = {'from_clause': from_clause}
         query = 'SHOW FIELD KEYS {from_clause}'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_grants(user_name):
+    @classmethod
+    def show_grants(cls, user_name):
         options = {'user_name': user_name}
         query = 'SHOW GRANTS FOR {user_name}'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_databases():
+    @classmethod
+    def show_databases(cls):
         query = 'SHOW DATABASES'
         parser = serializers.FlatSimpleResultSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
-    @staticmethod
-    def show_measurements(criteria=[]):
-        where_clause = GenericDBAdminCommand._generate_where_clause(criteria)
+    @classmethod
+    def show_measurements(cls, criteria=[]):
+        where_clause = cls._generate_where_clause(criteria)
         options = {'where_clause': where_clause}
         query = 'SHOW MEASUREMENTS {where_clause}'
         parser = serializers.FlatSimpleResultSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_queries():
+    @classmethod
+    def show_queries(cls):
         query = 'SHOW QUERIES'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
-    @staticmethod
-    def show_retention_policies():
+    @classmethod
+    def show_retention_policies(cls):
         query = 'SHOW RETENTION POLICIES'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
-
-    @staticmethod
-    def show_series(measurements=[], criteria=[], limit=None, offset=None):
-        from_clause = GenericDBAdminCommand._generate_from_clause(measurements)
-        where_clause = GenericDBAdminCommand._generate_where_clause(criteria)
-        limit_clause = GenericDBAdminCommand._generate_limit_clause(limit)
-        offset_clause = GenericDBAdminCommand._generate_offset_clause(offset)
+        return cls._execute_query_with_parser(query, parser)
+
+    @classmethod
+    def show_series(cls, measurements=[], criteria=[], limit=None, offset=None):
+        from_clause = cls._generate_from_clause(measurements)
+        where_clause = cls._generate_where_clause(criteria)
+        limit_clause = cls._generate_limit_clause(limit)
+        offset_clause = cls._generate_offset_clause(offset)
         options = {
             'from_clause': from_clause,
             'where_clause': where_clause,
@@ -611,62 +939,63 @@ class ShowAdminCommand:
                 ' {limit_clause}' +\
                 ' {offset_clause}'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_stats():
+    @classmethod
+    def show_stats(cls):
         query = 'SHOW STATS'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
-    @staticmethod
-    def show_shards():
+    @classmethod
+    def show_shards(cls):
         query = 'SHOW SHARDS'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
-    @staticmethod
-    def show_shard_groups():
+    @classmethod
+    def show_shard_groups(cls):
         query = 'SHOW SHARD GROUPS'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
-    @staticmethod
-    def show_subscriptions():
+    @classmethod
+    def show_subscriptions(cls):
         query = 'SHOW SUBSCRIPTIONS'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
-    @staticmethod
-    def show_tag_keys(measurements=[]):
-        from_clause = GenericDBAdminCommand._generate_from_clause(measurements)
+    @classmethod
+    def show_tag_keys(cls, measurements=[]):
+        from_clause = cls._generate_from_clause(measurements)
         options = {'from_clause': from_clause}
         query = 'SHOW TAG KEYS {from_clause}'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_tag_values(key, measurements=[]):
+    @classmethod
+    def show_tag_values(cls, key, measurements=[]):
         key_clause = 'KEY = "{key}"'.format(key=key)
-        from_clause = GenericDBAdminCommand._generate_from_clause(measurements)
+        from_clause = cls._generate_from_clause(measurements)
         options = {
             'key_clause': key_clause,
             'from_clause': from_clause,
         }
         query = 'SHOW TAG VALUES {from_clause} WITH {key_clause}'
         parser = serializers.FormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser, options)
+        return cls._execute_query_with_parser(query, parser, options)
 
-    @staticmethod
-    def show_users():
+    @classmethod
+    def show_users(cls):
         query = 'SHOW USERS'
         parser = serializers.FlatFormattedSerieSerializer
-        return InfluxDBAdmin._execute_query_with_parser(query, parser)
+        return cls._execute_query_with_parser(query, parser)
 
 
 class InfluxDBAdmin(
     GenericDBAdminCommand,
     AlterAdminCommand,
+    BatchAdminCommand,
     CreateAdminCommand,
     DeleteAdminCommand,
     DropAdminCommand,
@@ -676,4 +1005,13 @@ class InfluxDBAdmin(
     RevokeAdminCommand,
     ShowAdminCommand,
 ):
-    pass
+    _admins_by_alias = {}
+
+    @classmethod
+    def using(cls, alias):
+        """Returns an admin class running its commands on `alias`."""
+        admin = cls._admins_by_alias.get(alias)
+        if admin is None:
+            admin = type(cls.__name__, (cls,), {'_db': alias})
+            admin = cls._admins_by_alias.setdefault(alias, admin)
+        return admin
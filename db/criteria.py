@@ -1,5 +1,9 @@
+import datetime
 from enum import Enum
 
+from .. import exceptions
+from ..helpers.utils import nanoseconds_to_datetime, parse_time_nanoseconds
+
 
 class WhereOperatorEnum(Enum):
     LT = 'lt'
@@ -30,8 +34,10 @@ INVERTED_OPERATORS = {
 
 
 class Field:
-    def __init__(self, field_name):
+    def __init__(self, field_name, key_type=None):
         self.field_name = field_name
+        # `tag` or `field`, rendered as a `::tag` / `::field` cast
+        self.key_type = key_type
 
     def __lt__(self, value):
         return Criteria(self, value, WhereOperatorEnum.LT)
@@ -51,6 +57,20 @@ class Field:
     def __gt__(self, value):
         return Criteria(self, value, WhereOperatorEnum.GT)
 
+    def in_(self, values):
+        """Matches any of `values`, duplicates are dropped."""
+        values = list(dict.fromkeys(values))
+        if not values:
+            raise exceptions.InfluxDBFieldValueError('values must not be empty')
+        return DisjunctionCriteria(*[self == v for v in values])
+
+    def not_in(self, values):
+        return ~self.in_(values)
+
+    def between(self, lower, upper):
+        """Matches the values from `lower` to `upper`, both included."""
+        return ConjunctionCriteria(self >= lower, self <= upper)
+
     def __str__(self):
         return self.field_name
 
@@ -69,6 +89,9 @@ class Criteria:
             inverted_operator,
         )
 
+    def __and__(self, criteria):
+        return ConjunctionCriteria(self, criteria)
+
     def __or__(self, criteria):
         return DisjunctionCriteria(self, criteria)
 
@@ -76,6 +99,12 @@ class Criteria:
         left_operand = '"{}"'.format(self.left_operand)
         operator = EVALUATED_OPERATORS[self.operator]
         right_operand = self.right_operand
+        key_type = getattr(self.left_operand, 'key_type', None)
+        if key_type:
+            left_operand = '{}::{}'.format(left_operand, key_type)
+        if key_type == 'tag' and not isinstance(right_operand, str):
+            # tag values are strings
+            right_operand = str(right_operand)
         if isinstance(right_operand, str):
             right_operand = '\'{}\''.format(self.right_operand)
         return '{} {} {}'.format(left_operand, operator, right_operand)
@@ -88,15 +117,154 @@ class Criteria:
         )
 
 
-class DisjunctionCriteria:
-    def __init__(self, left_criteria, right_criteria):
-        self.left_criteria = left_criteria
-        self.right_criteria = right_criteria
+class BooleanCriteria:
+    """
+    Flat n-ary `AND` / `OR` of criteria. Nested expressions of the same kind
+    are merged, so long `a | b | c ...` chains stay one level deep and are
+    rendered in linear time without duplicated predicates.
+    """
+    operator = None
+
+    def __init__(self, *criteria):
+        self.criteria = []
+        for c in criteria:
+            if type(c) is type(self):
+                self.criteria.extend(c.criteria)
+            else:
+                self.criteria.append(c)
+
+    def __and__(self, criteria):
+        return ConjunctionCriteria(self, criteria)
 
     def __or__(self, criteria):
         return DisjunctionCriteria(self, criteria)
 
     def evaluate(self):
-        left_criteria = '({}'.format(self.left_criteria.evaluate())
-        right_criteria = '{})'.format(self.right_criteria.evaluate())
-        return ' OR '.join([left_criteria, right_criteria])
+        predicates = list(dict.fromkeys(c.evaluate() for c in self.criteria))
+        if len(predicates) == 1:
+            return predicates[0]
+        separator = ' {} '.format(self.operator)
+        return '({})'.format(separator.join(predicates))
+
+    def __str__(self):
+        return '{}: {}'.format(self.operator, ', '.join(str(c) for c in self.criteria))
+
+
+class ConjunctionCriteria(BooleanCriteria):
+    operator = 'AND'
+
+    def __invert__(self):
+        # InfluxQL has no NOT, negations are pushed down to the comparisons
+        return DisjunctionCriteria(*[~c for c in self.criteria])
+
+
+class DisjunctionCriteria(BooleanCriteria):
+    operator = 'OR'
+
+    def __invert__(self):
+        return ConjunctionCriteria(*[~c for c in self.criteria])
+
+
+class TimeRange:
+    """
+    Half-open `[start, end)` time interval in nanoseconds since the epoch,
+    a `None` bound is unbounded.
+    """
+
+    def __init__(self, start=None, end=None):
+        self.start = start
+        self.end = end
+
+    def __eq__(self, other):
+        if not isinstance(other, TimeRange):
+            return NotImplemented
+        return (self.start, self.end) == (other.start, other.end)
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __repr__(self):
+        return '<TimeRange [{}, {})>'.format(self.start, self.end)
+
+    def __contains__(self, timestamp):
+        if self.start is not None and timestamp < self.start:
+            return False
+        return self.end is None or timestamp < self.end
+
+    @property
+    def start_datetime(self):
+        return nanoseconds_to_datetime(self.start) if self.start is not None else None
+
+    @property
+    def end_datetime(self):
+        return nanoseconds_to_datetime(self.end) if self.end is not None else None
+
+    @property
+    def is_bounded(self):
+        return self.start is not None and self.end is not None
+
+    @property
+    def is_empty(self):
+        return self.is_bounded and self.start >= self.end
+
+    @property
+    def duration(self):
+        """Length in nanoseconds, `None` when unbounded."""
+        return max(self.end - self.start, 0) if self.is_bounded else None
+
+    def intersection(self, other):
+        starts = [s for s in (self.start, other.start) if s is not None]
+        ends = [e for e in (self.end, other.end) if e is not None]
+        return TimeRange(max(starts, default=None), min(ends, default=None))
+
+    def union(self, other):
+        """Smallest range holding both ranges."""
+        start = end = None
+        if self.start is not None and other.start is not None:
+            start = min(self.start, other.start)
+        if self.end is not None and other.end is not None:
+            end = max(self.end, other.end)
+        return TimeRange(start, end)
+
+
+def _get_criteria_time_range(criteria, now):
+    if isinstance(criteria, ConjunctionCriteria):
+        return get_time_range(criteria.criteria, now)
+    if isinstance(criteria, DisjunctionCriteria):
+        ranges = [_get_criteria_time_range(c, now) for c in criteria.criteria]
+        ranges = [r for r in ranges if not r.is_empty] or ranges
+        time_range = ranges[0]
+        for r in ranges[1:]:
+            time_range = time_range.union(r)
+        return time_range
+    if not isinstance(criteria, Criteria) or str(criteria.left_operand) != 'time':
+        return TimeRange()
+    try:
+        value = parse_time_nanoseconds(criteria.right_operand, now)
+    except ValueError:
+        return TimeRange()
+    operator = criteria.operator
+    if operator == WhereOperatorEnum.GT:
+        return TimeRange(start=value + 1)
+    if operator == WhereOperatorEnum.GTE:
+        return TimeRange(start=value)
+    if operator == WhereOperatorEnum.LT:
+        return TimeRange(end=value)
+    if operator == WhereOperatorEnum.LTE:
+        return TimeRange(end=value + 1)
+    if operator == WhereOperatorEnum.EQ:
+        return TimeRange(value, value + 1)
+    return TimeRange()
+
+
+def get_time_range(criteria, now=None):
+    """
+    Effective ``TimeRange`` of criteria combined with `AND`: bounds given
+    as nanoseconds, datetimes, date strings or `now() - 1h` expressions are
+    intersected, `OR`ed ones are merged.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    time_range = TimeRange()
+    for c in criteria:
+        time_range = time_range.intersection(_get_criteria_time_range(c, now))
+    return time_range
@@ -0,0 +1,201 @@
+"""
+Plans the WHERE clause of a ``Query`` knowing which keys are tags.
+
+- time predicates come first, `now() - 1h` is not quoted and datetimes are
+  written as RFC3339 strings
+- tag predicates are exact string matches, which are answered by the
+  series index, a number compared to a tag is compared as a string
+- `OR`ed equalities on a tag become an anchored regex alternation when it
+  is cheaper: when the tag has few values compared to the alternatives,
+  or when there are many alternatives and the tag values are unknown
+- the search keys of ``search_query`` are substring regexes, those of
+  ``search_exact`` exact matches, answered by the series index for tags
+"""
+import datetime
+import re
+
+from .criteria import (
+    BooleanCriteria, ConjunctionCriteria, Criteria, DisjunctionCriteria, Field,
+    WhereOperatorEnum,
+)
+from ..fields import TagField
+from ..helpers.utils import NOW_REGEX
+
+# alternatives from which a regex replaces equalities on an unknown tag
+REGEX_MIN_VALUES = 10
+
+# a regex is matched against every value of the tag, it's preferred while
+# the tag has less than this many values per alternative
+REGEX_COST_RATIO = 4
+
+
+def get_tag_keys(model):
+    if model is None:
+        return set()
+    return {
+        f.field_name
+        for f in model._get_fields()
+        if isinstance(f, TagField)
+    }
+
+
+def escape_regex(value):
+    return re.escape(str(value)).replace('/', '\\/')
+
+
+def format_time_value(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return '\'{}Z\''.format(value.isoformat())
+    if isinstance(value, str) and NOW_REGEX.match(value.strip()):
+        return value.strip()
+    if isinstance(value, str):
+        return '\'{}\''.format(value)
+    return str(value)
+
+
+class WherePlanner:
+    def __init__(self, tag_keys=(), tag_values=None):
+        self.tag_keys = set(tag_keys)
+        # known values of the tags, when loaded by the schema cache
+        self.tag_values = tag_values or {}
+
+    def is_tag(self, field):
+        key_type = getattr(field, 'key_type', None)
+        if key_type is not None:
+            return key_type == 'tag'
+        return str(field) in self.tag_keys
+
+    def plan(self, criteria, search_keys=(), exact_search_keys=()):
+        """Returns the predicates of the WHERE clause, time bounds first."""
+        time_predicates = []
+        tag_predicates = []
+        other_predicates = []
+        for c in self._get_conjuncts(criteria):
+            if isinstance(c, Criteria) and str(c.left_operand) == 'time':
+                time_predicates.append(self.render_time(c))
+            elif self._is_on_tags(c):
+                tag_predicates.append(self.render(c))
+            else:
+                other_predicates.append(self.render(c))
+        search_predicate = self.render_search_keys(search_keys, exact_search_keys)
+        if search_predicate:
+            other_predicates.append(search_predicate)
+        predicates = time_predicates + tag_predicates + other_predicates
+        return list(dict.fromkeys(predicates))
+
+    def render(self, criteria):
+        if isinstance(criteria, DisjunctionCriteria):
+            return self.render_disjunction(criteria)
+        if isinstance(criteria, ConjunctionCriteria):
+            predicates = self.plan(criteria.criteria)
+            if len(predicates) == 1:
+                return predicates[0]
+            return '({})'.format(' AND '.join(predicates))
+        if not isinstance(criteria, Criteria):
+            return criteria.evaluate()
+        if str(criteria.left_operand) == 'time':
+            return self.render_time(criteria)
+        if self.is_tag(criteria.left_operand) and \
+           not isinstance(criteria.right_operand, str):
+            criteria = Criteria(
+                criteria.left_operand,
+                str(criteria.right_operand),
+                criteria.operator,
+            )
+        return criteria.evaluate()
+
+    @staticmethod
+    def render_time(criteria):
+        left_operand, operator, _ = criteria.evaluate().split(' ', 2)
+        right_operand = format_time_value(criteria.right_operand)
+        return '{} {} {}'.format(left_operand, operator, right_operand)
+
+    def render_disjunction(self, criteria):
+        leaves = criteria.criteria
+        values_by_tag = {}
+        for leaf in leaves:
+            if self._is_tag_equality(leaf):
+                key = str(leaf.left_operand)
+                values_by_tag.setdefault(key, []).append(leaf)
+        regex_tags = {
+            key for key, tag_leaves in values_by_tag.items()
+            if self._is_regex_cheaper(key, tag_leaves)
+        }
+
+        predicates = {}
+        for leaf in leaves:
+            if self._is_tag_equality(leaf) and str(leaf.left_operand) in regex_tags:
+                key = str(leaf.left_operand)
+                if ('regex', key) not in predicates:
+                    predicates[('regex', key)] = self.render_tag_regex(values_by_tag[key])
+                continue
+            predicate = self.render(leaf)
+            predicates.setdefault(predicate, predicate)
+        predicates = list(predicates.values())
+        if len(predicates) == 1:
+            return predicates[0]
+        return '({})'.format(' OR '.join(predicates))
+
+    @staticmethod
+    def render_tag_regex(leaves):
+        values = dict.fromkeys(escape_regex(leaf.right_operand) for leaf in leaves)
+        left_operand = leaves[0].evaluate().split(' ', 1)[0]
+        return '{} =~ /^(?:{})$/'.format(left_operand, '|'.join(values))
+
+    def render_search_keys(self, search_keys, exact_search_keys=()):
+        """The search keys ORed, the strings are searched as substrings."""
+        predicates = []
+        for search_key in search_keys:
+            for field, value in search_key.items():
+                quoted_field = '"{}"'.format(field)
+                if field in self.tag_keys and not isinstance(value, (str, bool)):
+                    # a number compared to a tag is compared as a string
+                    predicates.append('{} = \'{}\''.format(quoted_field, value))
+                    continue
+                if type(value) == bool:
+                    value = '1' if value == True else '0'
+                elif type(value) == str:
+                    value = "~/{}/".format(value)
+                predicates.append(quoted_field + '=' + str(value))
+        for search_key in exact_search_keys:
+            for field, value in search_key.items():
+                predicates.append(self.render(Criteria(Field(field), value, WhereOperatorEnum.EQ)))
+        if not predicates:
+            return ''
+        return '(' + ' OR '.join(predicates) + ')'
+
+    def _is_tag_equality(self, criteria):
+        return isinstance(criteria, Criteria) and \
+            criteria.operator == WhereOperatorEnum.EQ and \
+            self.is_tag(criteria.left_operand)
+
+    def _is_regex_cheaper(self, key, leaves):
+        if len(leaves) < 2:
+            return False
+        tag_values = self.tag_values.get(key)
+        if tag_values:
+            return len(tag_values) <= len(leaves) * REGEX_COST_RATIO
+        return len(leaves) >= REGEX_MIN_VALUES
+
+    def _is_on_tags(self, criteria):
+        return all(
+            isinstance(leaf, Criteria) and self.is_tag(leaf.left_operand)
+            for leaf in self._get_leaves(criteria)
+        )
+
+    def _get_leaves(self, criteria):
+        if isinstance(criteria, BooleanCriteria):
+            for c in criteria.criteria:
+                yield from self._get_leaves(c)
+        else:
+            yield criteria
+
+    def _get_conjuncts(self, criteria):
+        # nested AND are flattened so their time bounds come first too
+        for c in criteria:
+            if isinstance(c, ConjunctionCriteria):
+                yield from self._get_conjuncts(c.criteria)
+            else:
+                yield c
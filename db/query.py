@@ -1,20 +1,60 @@
 import copy
+import datetime
+import logging
 from collections import namedtuple
 from copy import deepcopy
 from functools import lru_cache
 
-from .criteria import Field
-from .function import aggregations
+from . import planner
+from .criteria import Field, get_time_range
+from .function import aggregations, selectors
+from .. import export, metrics, rollups
+from ..schema import schema_cache
+from ..slowlog import slow_query_log  # noqa: F401, enabled by the settings
+from ..api import DEFAULT_CHUNK_SIZE
+from ..fields import IntegerField, TagField, TimestampField
+from ..helpers.utils import format_duration
+from ..instrumentation import QueryPhase, phase, profiled
+from ..metrics import MetricName
 from ..response import InfluxDBResponse
 from ..serializers import BaseSerializer
 from .. import exceptions
-from ..app import Influxable
+from ..app import Influxable, influxables
+
+
+logger = logging.getLogger(__name__)
+
+FILL_OPTIONS = ('null', 'none', 'previous', 'linear')
+
+DOWNSAMPLE_AGGREGATORS = {
+    'mean': aggregations.Mean,
+    'max': selectors.Max,
+    'min': selectors.Min,
+    'last': selectors.Last,
+}
+
+# round intervals, the smallest one yielding few enough buckets is chosen
+DOWNSAMPLE_INTERVALS = [
+    datetime.timedelta(seconds=seconds)
+    for seconds in (
+        1, 5, 10, 15, 30,
+        60, 2 * 60, 5 * 60, 10 * 60, 15 * 60, 30 * 60,
+        3600, 2 * 3600, 3 * 3600, 6 * 3600, 12 * 3600,
+        86400, 2 * 86400, 7 * 86400,
+    )
+]
 
 
 class RawQuery:
-    def __init__(self, str_query):
+    def __init__(self, str_query, using=None):
         self.str_query = str_query
+        self._db = using
+
+    @property
+    def db(self):
+        return self._db
 
+    @profiled
     def execute(self):
         return self.raw_response
 
@@ -23,37 +63,100 @@ class RawQuery:
         return self._resolve()
 
     def _resolve(self, *args, **kwargs):
-        instance = Influxable.get_instance()
-        return instance.execute_query(query=self.str_query, method='post')
+        instance = Influxable.get_instance(self.db)
+        labels = self._get_metrics_labels()
+        metrics.increment(MetricName.QUERIES, **labels)
+        with metrics.timer(MetricName.QUERY_DURATION, **labels):
+            return instance.execute_query(query=self.str_query, method='post')
+
+    def stream(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yields an ``InfluxDBResponse`` per chunk of the query result."""
+        instance = Influxable.get_instance(self.db)
+        str_query = self._get_str_query()
+        metrics.increment(MetricName.QUERIES, **self._get_metrics_labels())
+        chunks = instance.stream_query(
+            query=str_query,
+            method='post',
+            chunk_size=chunk_size,
+        )
+        for chunk in chunks:
+            response = InfluxDBResponse(chunk)
+            response.raise_if_error()
+            yield response
+
+    def stream_raw(self, accept='application/csv', chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yields the response body as formatted by InfluxDB, as bytes."""
+        instance = Influxable.get_instance(self.db)
+        str_query = self._get_str_query()
+        metrics.increment(MetricName.QUERIES, **self._get_metrics_labels())
+        return instance.stream_raw_query(
+            query=str_query,
+            method='post',
+            accept=accept,
+            chunk_size=chunk_size,
+        )
+
+    def _get_str_query(self):
+        return self.str_query
+
+    def _get_metrics_labels(self):
+        return {
+            'measurement': self._get_metrics_measurement(),
+            'operation': metrics.get_statement_type(self.str_query),
+        }
+
+    def _get_metrics_measurement(self):
+        return ''
 
 
 class Query(RawQuery):
 
-    def __init__(self, model=None):
+    def __init__(self, model=None, using=None):
         self.model = model
-        self.initial_query = '{select_clause} {from_clause} {where_clause} {order_clause} {limit_offset}'
+        self._db = using
+        self.initial_query = '{select_clause} {from_clause} {where_clause} {group_by_clause} {order_clause} {limit_offset}'
         self.initial_delete = 'delete from {measurement} where time={time}'
         self.from_clause = 'FROM {measurements}'
         self.select_clause = 'SELECT {fields}'
         self.order_by_clause = 'ORDER BY {order_by}'
         self.where_clause = ' WHERE {criteria}'
+        self.group_by_clause = 'GROUP BY {dimensions}'
+        self.fill_clause = ' fill({fill})'
         self.selected_fields = []
         self.selected_criteria = []
         self.search_keys = []
+        self.exact_search_keys = []
         self.order_by = '-time'
         self.is_distinct = False
         self.limit_value = None
         self.slimit_value = None
         self.offset_value = None
         self.soffset_value = None
+        self.group_by_tags = []
+        self.group_by_interval = None
+        self.group_by_offset = None
+        self.fill_value = None
+        self.retention_policy = None
+        self.from_measurement = None
+        self.rollups_enabled = True
+        self.subquery = None
         self._result_cache = None
 
+    @property
+    def db(self):
+        if self._db is None and self.model:
+            return getattr(self.model.Meta, 'using', None)
+        return self._db
+
     @property
     def selected_measurement(self):
         if self.model:
             return self.model.Meta.db_table or self.__name__.lower()
         return 'default'
 
+    def _get_metrics_measurement(self):
+        return self.selected_measurement
+
     def select(self, *fields):
         query = self._clone()
         for f in fields:
@@ -65,9 +168,30 @@ class Query(RawQuery):
         query = self._clone()
         query.selected_criteria.extend(list(criteria))
         for field, value in kwargs.items():
-            query.selected_criteria.append(Field(field) == value)
+            query.selected_criteria.append(query._get_typed_field(field) == value)
         return query
 
+    def _get_typed_field(self, field_name):
+        # the keys declared on the model are typed from their field, so
+        # that the query doesn't depend on the state of the cache. The
+        # cached schema tells the type of the others, it is loaded in the
+        # background when missing
+        key_type = None
+        if self.model and field_name != 'time':
+            declared_fields = {f.field_name: f for f in self.model._get_fields()}
+            field = declared_fields.get(field_name)
+            if isinstance(field, TagField):
+                key_type = 'tag'
+            elif field is not None and not isinstance(field, TimestampField):
+                key_type = 'field'
+            elif field is None:
+                key_type = schema_cache.get_key_type(
+                    self.selected_measurement,
+                    field_name,
+                    using=self.db,
+                )
+        return Field(field_name, key_type=key_type)
+
     def search_query(self, *criteria, **kwargs):
         query = self._clone()
         query.selected_criteria.extend(list(criteria))
@@ -75,6 +199,53 @@ class Query(RawQuery):
             query.search_keys.append({field: value})
         return query
 
+    def search_exact(self, *criteria, **kwargs):
+        """
+        Same as ``search_query`` but the values are matched exactly instead
+        of as substrings, which the series index answers for tags.
+        """
+        query = self._clone()
+        query.selected_criteria.extend(list(criteria))
+        for field, value in kwargs.items():
+            query.exact_search_keys.append({field: value})
+        return query
+
+    def using(self, alias):
+        query = self._clone()
+        query._db = alias
+        return query
+
+    def using_policy(self, policy_name):
+        """Reads the data of the `policy_name` retention policy."""
+        query = self._clone()
+        query.retention_policy = policy_name
+        return query
+
+    def from_subquery(self, subquery):
+        """
+        Reads the rows of `subquery`, another ``Query``, instead of the
+        measurement, e.g. the max of the per host means::
+
+            means = Cpu.objects.mean('usage_user').group_by('host')
+            Cpu.objects.from_subquery(means).select(selectors.Max('mean'))
+
+        """
+        if not isinstance(subquery, Query):
+            msg = 'subquery must be type of Query'
+            raise exceptions.InfluxDBInvalidTypeError(msg)
+        query = self._clone()
+        query.subquery = subquery._clone()
+        return query
+
+    def use_rollups(self, enabled=True):
+        """
+        Enables or disables serving the query from the rollups declared on
+        the model, see ``rollups.route``.
+        """
+        query = self._clone()
+        query.rollups_enabled = enabled
+        return query
+
     def where(self, *criteria, **kwargs):
         query = self._clone()
         query.selected_criteria = list(criteria)
@@ -108,6 +279,113 @@ class Query(RawQuery):
         query.soffset_value = value
         return query
 
+    def group_by(self, *tags):
+        """Groups the result by tags, `'*'` groups by every tag."""
+        query = self._clone()
+        for tag in tags:
+            if tag not in query.group_by_tags:
+                query.group_by_tags.append(tag)
+        return query
+
+    def group_by_time(self, interval, offset=None):
+        """
+        Groups the result in `interval` buckets, shifted by `offset`. Both
+        are InfluxQL durations (`'5m'`), ``timedelta`` or seconds.
+        """
+        query = self._clone()
+        try:
+            query.group_by_interval = format_duration(interval)
+            if offset is not None:
+                query.group_by_offset = format_duration(offset)
+        except (TypeError, ValueError) as err:
+            raise exceptions.InfluxDBInvalidTypeError(str(err))
+        return query
+
+    def fill(self, value):
+        """
+        Fills the empty `GROUP BY time()` buckets with `value`, a number or
+        one of `null`, `none`, `previous` and `linear`.
+        """
+        query = self._clone()
+        if isinstance(value, str):
+            if value not in FILL_OPTIONS:
+                msg = 'fill must be a number or one of {}'.format(FILL_OPTIONS)
+                raise exceptions.InfluxDBInvalidChoiceError(msg)
+        elif value is None:
+            value = 'null'
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            msg = 'fill must be a number or one of {}'.format(FILL_OPTIONS)
+            raise exceptions.InfluxDBInvalidTypeError(msg)
+        query.fill_value = value
+        return query
+
+    def downsample(self, max_points, aggregator='mean', now=None):
+        """
+        Aggregates the selected fields in `GROUP BY time()` buckets so each
+        serie has at most `max_points` points. The interval is picked from
+        the time criteria, which needs a lower bound; the upper bound is now
+        when missing. `aggregator` is one of `mean`, `max`, `min` and `last`.
+        """
+        if aggregator not in DOWNSAMPLE_AGGREGATORS:
+            msg = 'aggregator must be one of {}'.format(sorted(DOWNSAMPLE_AGGREGATORS))
+            raise exceptions.InfluxDBInvalidChoiceError(msg)
+        if not isinstance(max_points, int) or max_points < 2:
+            msg = 'max_points must be an integer greater than 1'
+            raise exceptions.InfluxDBInvalidTypeError(msg)
+
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        time_range = self.get_time_range(now)
+        start, end = time_range.start_datetime, time_range.end_datetime
+        if start is None:
+            msg = 'downsample needs a lower time bound in the criteria'
+            raise exceptions.InfluxDBError(msg)
+        interval = self._get_downsample_interval(start, end or now, max_points)
+
+        query = self._clone()
+        function = DOWNSAMPLE_AGGREGATORS[aggregator]
+        fields = query.selected_fields or query._get_downsample_fields()
+        query.selected_fields = [
+            # fields keep their name, already aggregated ones are left as is
+            f if '(' in f else '{} AS {}'.format(function(f).evaluate(), f)
+            for f in fields
+        ] or [function('*').evaluate()]
+        return query.group_by_time(interval)
+
+    def _get_downsample_fields(self):
+        if self.model is None:
+            return []
+        return [
+            '"{}"'.format(f.field_name)
+            for f in self.model._get_fields()
+            if isinstance(f, IntegerField)
+        ]
+
+    @staticmethod
+    def _get_downsample_interval(start, end, max_points):
+        # buckets are aligned on the epoch, the range may overlap one more
+        span = (end - start) / (max_points - 1)
+        for interval in DOWNSAMPLE_INTERVALS:
+            if interval >= span:
+                return interval
+        week = datetime.timedelta(weeks=1)
+        return week * -(-span // week)
+
+    @property
+    def time_range(self):
+        """Effective ``TimeRange`` of the criteria, see ``get_time_range``."""
+        return self.get_time_range()
+
+    def get_time_range(self, now=None):
+        """
+        `[start, end)` interval, in nanoseconds, selected by the time
+        criteria and those of the subquery, `now()` expressions being
+        relative to `now`.
+        """
+        time_range = get_time_range(self.selected_criteria, now)
+        if self.subquery is not None:
+            time_range = time_range.intersection(self.subquery.get_time_range(now))
+        return time_range
+
     def distinct(self):
         query = self._clone()
         if len(query.selected_fields) == 1:
@@ -154,14 +432,19 @@ class Query(RawQuery):
         return query
 
     def _clone(self):
-        query = self.__class__(model=self.model)
+        query = self.__class__(model=self.model, using=self._db)
         copy_attrs = (
-            "order_by", "selected_fields", "selected_criteria", "search_keys", "is_distinct",
-            "limit_value", "slimit_value", "offset_value", "soffset_value"
+            "order_by", "selected_fields", "selected_criteria", "search_keys",
+            "exact_search_keys", "is_distinct",
+            "limit_value", "slimit_value", "offset_value", "soffset_value",
+            "group_by_tags", "group_by_interval", "group_by_offset", "fill_value",
+            "retention_policy", "from_measurement", "rollups_enabled",
         )
         for attr in copy_attrs:
             v = copy.deepcopy(getattr(self, attr))
             setattr(query, attr, v)
+        # queries are never modified once built, the subquery is shared
+        query.subquery = self.subquery
         return query
 
     def clear_cache(self):
@@ -202,36 +485,76 @@ class Query(RawQuery):
 
         return self.select_clause.format(fields=_clause)
 
+    def _prepare_from_clause(self):
+        if self.subquery is not None:
+            subquery = self.subquery._prepare_query().strip()
+            return self.from_clause.format(measurements='({})'.format(subquery))
+        measurement = self.from_measurement or self.selected_measurement
+        policy = self.retention_policy
+        if policy is None and self.model:
+            policy = getattr(self.model.Meta, 'retention_policy', None)
+        if policy is None:
+            policy = influxables.get_retention_policy(self.db)
+        if policy:
+            measurement = '"{}"."{}"'.format(policy, measurement)
+        return self.from_clause.format(measurements=measurement)
+
+    def _get_routed_query(self):
+        if self.subquery is not None:
+            return None
+        rollup, selected_fields = rollups.route(self)
+        if rollup is None:
+            return None
+        query = self._clone()
+        query.rollups_enabled = False
+        query.selected_fields = selected_fields
+        query.from_measurement = rollup.get_measurement(self.model)
+        if rollup.policy:
+            query.retention_policy = rollup.policy
+        return query
+
     def _prepare_where_clause(self):
 
-        if not self.selected_criteria and not self.search_keys:
+        if not self.selected_criteria and not self.search_keys and \
+           not self.exact_search_keys:
             return ''
 
-        where_clause = ''
-        if len(self.selected_criteria):
-            criteria = [c.evaluate() for c in self.selected_criteria]
-            where_clause = ' AND '.join(criteria)
-
-        format_list = []
-        if len(self.search_keys):
-            for dict in self.search_keys:
-                for field, value in dict.items():
-                    if type(value) == bool:
-                        value = '1' if value == True else '0'
-                    elif type(value) == str:
-                        value = "~/{}/".format(value)
-                    field = '"{}"'.format(field)
-                    format_list.append(str(field) + '=' + str(value))
-            if len(self.selected_criteria):
-                where_clause += ' AND '
+        planner = self._get_where_planner()
+        criteria = planner.plan(
+            self.selected_criteria,
+            self.search_keys,
+            self.exact_search_keys,
+        )
+        _clause = ' AND '.join(criteria)
+        return self.where_clause.format(criteria=_clause)
+
+    def _get_where_planner(self):
+        tag_keys = planner.get_tag_keys(self.model)
+        tag_values = {}
+        schema = None
+        if self.model:
+            schema = schema_cache.get_cached(self.selected_measurement, using=self.db)
+        if schema is not None:
+            tag_keys |= schema.tag_keys
+            tag_values = schema.tag_values
+        return planner.WherePlanner(tag_keys, tag_values)
+
+    def _prepare_group_by_clause(self):
+        dimensions = []
+        if self.group_by_interval is not None:
+            if self.group_by_offset is not None:
+                dimensions.append('time({}, {})'.format(self.group_by_interval, self.group_by_offset))
             else:
-                where_clause = ''
-            or_str = ' OR '.join(format_list)
-            or_str = '(' + or_str + ')'
-            where_clause += or_str
+                dimensions.append('time({})'.format(self.group_by_interval))
+        for tag in self.group_by_tags:
+            dimensions.append(tag if tag == '*' else '"{}"'.format(tag))
 
-        _clause = where_clause
-        return self.where_clause.format(criteria=_clause)
+        if not dimensions:
+            return ''
+        _clause = self.group_by_clause.format(dimensions=', '.join(dimensions))
+        if self.fill_value is not None:
+            _clause += self.fill_clause.format(fill=self.fill_value)
+        return _clause
 
     def _prepare_limit_offset(self):
         _clause = ''
@@ -251,20 +574,28 @@ class Query(RawQuery):
         return _clause
 
     def _prepare_query(self):
-        select_clause = self._prepare_select_clause()
-        from_clause = self.from_clause.format(measurements=self.selected_measurement)
-        where_clause = self._prepare_where_clause()
-        order_clause = self.order_by_clause.format(order_by=self.format_oder())
-        limit_offset_clause = self._prepare_limit_offset()
-        prepared_query = self.initial_query.format(
-            select_clause=select_clause,
-            from_clause=from_clause,
-            where_clause=where_clause,
-            order_clause=order_clause,
-            limit_offset=limit_offset_clause,
-        )
-
-        print('prepared_query', prepared_query)
+        if self.rollups_enabled:
+            routed_query = self._get_routed_query()
+            if routed_query is not None:
+                return routed_query._prepare_query()
+
+        with phase(QueryPhase.BUILD):
+            select_clause = self._prepare_select_clause()
+            from_clause = self._prepare_from_clause()
+            where_clause = self._prepare_where_clause()
+            group_by_clause = self._prepare_group_by_clause()
+            order_clause = self.order_by_clause.format(order_by=self.format_oder())
+            limit_offset_clause = self._prepare_limit_offset()
+            prepared_query = self.initial_query.format(
+                select_clause=select_clause,
+                from_clause=from_clause,
+                where_clause=where_clause,
+                group_by_clause=group_by_clause,
+                order_clause=order_clause,
+                limit_offset=limit_offset_clause,
+            )
+
+        logger.debug('prepared_query %s', prepared_query)
         return prepared_query
 
     def __iter__(self):
@@ -272,6 +603,55 @@ class Query(RawQuery):
             self._fetch_all()
         return iter(self._result_cache)
 
+    def iterator(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Yields the objects without caching them, the result is fetched in
+        chunks of `chunk_size` rows.
+        """
+        if self._result_cache is not None:
+            yield from self._result_cache
+            return
+        for response in self.stream(chunk_size):
+            yield from self.query_to_objects(response)
+
+    def _get_str_query(self):
+        self.str_query = self._prepare_query()
+        return self.str_query
+
+    def to_arrow(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Returns the result as a ``pyarrow.Table`` built column by column from
+        the streamed chunks. The columns declared on the model are typed
+        from their field, tags are dictionary encoded. The other columns
+        have the type of their first non null value, integers widened to
+        floats as for ``export_arrow_ipc``.
+        """
+        pa = export.import_pyarrow()
+        schema = export.get_arrow_schema(self.model)
+        with phase(QueryPhase.OBJECTS):
+            batches = [
+                export.serie_to_record_batch(serie, schema)
+                for response in self.stream(chunk_size)
+                for serie in response.series
+            ]
+            if not batches:
+                return schema.empty_table()
+            # the series don't share their inferred types, e.g. a float
+            # column written as 5 in one serie and 5.5 in another
+            table_schema = export.get_stream_schema(batches, schema)
+            return pa.Table.from_batches(
+                [export.conform_record_batch(b, table_schema) for b in batches],
+                schema=table_schema,
+            )
+
+    def to_pandas(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Returns the result as a ``pandas.DataFrame``, numeric columns
+        without nulls are handed over from Arrow without a copy.
+        """
+        table = self.to_arrow(chunk_size)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
     def __len__(self):
         if self._result_cache is None:
             self._fetch_all()
@@ -288,7 +668,7 @@ class Query(RawQuery):
     def create(self, **kwargs):
         obj = self.model(**kwargs)
         point_data = obj.get_point_data()
-        return BulkInsertQuery(point_data).execute()
+        return BulkInsertQuery(point_data, using=self.db).execute()
 
     def bulk_create(self, objs):
         assert isinstance(objs, list), \
@@ -303,7 +683,7 @@ class Query(RawQuery):
 
             str_points += prep_value
             str_points += '\n'
-        return BulkInsertQuery(str_points).execute()
+        return BulkInsertQuery(str_points, using=self.db).execute()
 
     def bulk_save(self, points):
         if not isinstance(points, list):
@@ -317,7 +697,7 @@ class Query(RawQuery):
             prep_value = point.get_prep_value()
             str_points += prep_value
             str_points += '\n'
-        return BulkInsertQuery(str_points).execute()
+        return BulkInsertQuery(str_points, using=self.db).execute()
 
     def delete(self, *args, **kwargs):
         # 1, 获取查询结果
@@ -335,7 +715,7 @@ class Query(RawQuery):
                 else:
                     delete_objects.append(obj)
 
-        instance = Influxable.get_instance()
+        instance = Influxable.get_instance(self.db)
         # 2, 删除查询结果
         times = [getattr(obj, 'time') for obj in delete_objects]
         for time in times:
@@ -343,12 +723,14 @@ class Query(RawQuery):
             instance.delete_points(query_str)
         return True
 
+    @profiled
     def _fetch_all(self):
         query_result = InfluxDBResponse(self.execute())
         measurement_objs = self.query_to_objects(query_result)
         self._result_cache = measurement_objs
         return measurement_objs
 
+    @profiled
     def execute(self):
         prepared_query = self._prepare_query()
         self.str_query = prepared_query
@@ -357,14 +739,20 @@ class Query(RawQuery):
     def query_to_objects(self, query_result):
         objects = []
 
-        columns = query_result.columns
-        raws = query_result.raws
-        for raw in raws:
-            obj = self.raw_to_object(columns, raw)
-            objects.append(obj)
+        with phase(QueryPhase.OBJECTS):
+            # grouped results have a serie per tag set, its tags are
+            # added to the objects
+            for serie in query_result.series:
+                tags = serie.tags
+                columns = list(tags) + serie.columns
+                tag_values = list(tags.values())
+                for raw in serie.values or []:
+                    obj = self.raw_to_object(columns, tag_values + raw)
+                    objects.append(obj)
 
         return objects
 
+    @profiled
     def _get_count(self):
         query_result = InfluxDBResponse(self.execute())
         raws = deepcopy(query_result.raws)
@@ -379,6 +767,7 @@ class Query(RawQuery):
         number = max(count_raw) if count_raw else 0
         return number
 
+    @profiled
     def _get_sum(self):
         query_result = InfluxDBResponse(self.execute())
         raws = deepcopy(query_result.raws)
@@ -402,8 +791,10 @@ class Query(RawQuery):
         return obj
 
     def format(self, result, parser_class=BaseSerializer, **kwargs):
-        return parser_class(result, **kwargs).convert()
+        with phase(QueryPhase.SERIALIZE):
+            return parser_class(result, **kwargs).convert()
 
+    @profiled
     def evaluate(self, parser_class=BaseSerializer, **kwargs):
         result = InfluxDBResponse(self.execute())
         self.query_to_objects(result)
@@ -415,7 +806,7 @@ class Query(RawQuery):
 class BulkInsertQuery(RawQuery):
 
     def execute(self):
-        instance = Influxable.get_instance()
+        instance = Influxable.get_instance(self.db)
         return instance.write_points(self.str_query)
 
     # @lru_cache(maxsize=None)
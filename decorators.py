@@ -1,18 +1,37 @@
 import json
 import requests
-from . import exceptions
+from . import exceptions, metrics
+from .metrics import MetricName
+
+
+def record_errors(func):
+    def func_wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as err:
+            # nested decorated calls must not count the same error twice
+            if not getattr(err, 'is_recorded', False):
+                error = err.__class__.__name__
+                metrics.increment(MetricName.ERRORS, error=error)
+                err.is_recorded = True
+            raise
+    return func_wrapper
 
 
 def raise_if_error(func):
     def func_wrapper(*args, **kwargs):
+        # the error may come from a nested decorated call
+        json_res = {}
         try:
             request = args[0]
             params = kwargs.get('params', {})
             res = func(*args, **kwargs)
-            try:
-                json_res = res.json()
-            except json.decoder.JSONDecodeError:
-                json_res = {}
+            # only error bodies are read here, streamed responses stay lazy
+            if not res.ok:
+                try:
+                    json_res = res.json()
+                except json.decoder.JSONDecodeError:
+                    pass
             res.raise_for_status()
 
         except requests.exceptions.MissingSchema as err:
@@ -37,10 +56,11 @@ def raise_if_error(func):
                 points = kwargs['data']
                 raise exceptions.InfluxDBInvalidTimestampError(points)
 
-            if res.status_code == 400:
+            status_code = err.response.status_code if err.response is not None else None
+            if status_code == 400:
                 raise exceptions.InfluxDBBadRequestError(params)
-            if res.status_code == 401:
+            if status_code == 401:
                 raise exceptions.InfluxDBUnauthorizedError(err)
             raise err
         return res
-    return func_wrapper
+    return record_errors(func_wrapper)
@@ -0,0 +1,399 @@
+"""
+Collector of the InfluxDB server statistics.
+
+The statistics are sampled from ``/debug/vars``, or ``SHOW STATS`` when it
+can't be read, every ``INTERVAL`` seconds. The rates between two samples
+(queries, writes and points per second, mean durations) and the gauges
+(cache and heap sizes) are reported next to the same rates measured by the
+client, to tell which share of the load comes from this process and how
+much time is spent outside of the server. Each node of an
+``INFLUXDB_URLS`` cluster is sampled on its own, the report has the rates
+of each node under `nodes` and their sums under `server`, a replicated
+write being counted once per node::
+
+    INFLUXDB_DIAGNOSTICS = {
+        'INTERVAL': 60,
+        'MAX_SAMPLES': 60,
+    }
+
+    collector = DiagnosticsCollector(using='default')
+    collector.start()
+    ...
+    collector.get_report()
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from . import settings
+from .api import InfluxDBApi
+from .app import Influxable
+from .response import InfluxDBResponse
+from .serializers import FormattedSerieSerializer
+from .signals import points_written, query_finished
+
+
+logger = logging.getLogger(__name__)
+
+DIAGNOSTICS_DEFAULT_OPTIONS = {
+    'INTERVAL': 60,
+    'MAX_SAMPLES': 60,
+}
+
+# rate name: (module, counter)
+SERVER_RATES = {
+    'queries_per_second': ('httpd', 'queryReq'),
+    'writes_per_second': ('httpd', 'writeReq'),
+    'points_per_second': ('httpd', 'pointsWrittenOK'),
+}
+
+# duration name: (module, counter of nanoseconds, counter of requests)
+SERVER_DURATIONS = {
+    'query_duration_seconds': ('httpd', 'queryReqDurationNs', 'queryReq'),
+    'write_duration_seconds': ('httpd', 'writeReqDurationNs', 'writeReq'),
+}
+
+# gauge name: (module, value)
+SERVER_GAUGES = {
+    'cache_bytes': ('tsm1_cache', 'memBytes'),
+    'heap_bytes': ('runtime', 'HeapAlloc'),
+    'goroutines': ('runtime', 'NumGoroutine'),
+}
+
+# duration name: rate weighting it when the nodes are summed
+SERVER_DURATION_WEIGHTS = {
+    'query_duration_seconds': 'queries_per_second',
+    'write_duration_seconds': 'writes_per_second',
+}
+
+CLIENT_RATES = {
+    'queries_per_second': 'queries',
+    'writes_per_second': 'writes',
+    'points_per_second': 'points',
+}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_debug_vars(debug_vars):
+    """`{module: {name: value}}` of ``/debug/vars``, summed over the tags."""
+    stats = {}
+    for key, var in debug_vars.items():
+        if key == 'memstats':
+            stats['memstats'] = {k: v for k, v in var.items() if _is_number(v)}
+            continue
+        if not isinstance(var, dict) or 'values' not in var:
+            continue
+        module = stats.setdefault(var.get('name', key), {})
+        for name, value in var['values'].items():
+            if _is_number(value):
+                module[name] = module.get(name, 0) + value
+    return stats
+
+
+def parse_stats(series):
+    """Same as ``parse_debug_vars`` for the result of ``show_stats``."""
+    stats = {}
+    for serie in series:
+        for name, rows in serie.items():
+            module = stats.setdefault(name, {})
+            for row in rows:
+                for key, value in row.items():
+                    if _is_number(value):
+                        module[key] = module.get(key, 0) + value
+    return stats
+
+
+class ClientCounters:
+    """Queries and writes of this process, counted from the signals."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.query_duration = 0
+        self.query_errors = 0
+        self.writes = 0
+        self.points = 0
+
+    def connect(self):
+        query_finished.connect(self._query_finished, dispatch_uid=id(self))
+        points_written.connect(self._points_written, dispatch_uid=id(self))
+
+    def disconnect(self):
+        query_finished.disconnect(self._query_finished, dispatch_uid=id(self))
+        points_written.disconnect(self._points_written, dispatch_uid=id(self))
+
+    def _query_finished(self, sender, profile, **kwargs):
+        with self._lock:
+            self.queries += 1
+            self.query_duration += profile.duration or 0
+            if profile.error is not None:
+                self.query_errors += 1
+
+    def _points_written(self, sender, database, points, **kwargs):
+        if isinstance(points, str):
+            points = [p for p in points.splitlines() if p and not p.startswith('#')]
+        with self._lock:
+            self.writes += 1
+            self.points += len(points)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'queries': self.queries,
+                'query_duration': self.query_duration,
+                'query_errors': self.query_errors,
+                'writes': self.writes,
+                'points': self.points,
+            }
+
+
+class DiagnosticsSample:
+    def __init__(self, stats, client, source, base_url=None):
+        self.taken_at = time.time()
+        self.monotonic = time.monotonic()
+        # `debug_vars` or `show_stats`
+        self.source = source
+        self.stats = stats
+        self.client = client
+        # server the statistics are read from
+        self.base_url = base_url
+
+    def __repr__(self):
+        return '<DiagnosticsSample {} {} {}>'.format(self.base_url, self.source, self.taken_at)
+
+    def get(self, module, name):
+        return self.stats.get(module, {}).get(name)
+
+
+def _get_delta(previous, current):
+    if previous is None or current is None or current < previous:
+        # missing, or reset by a restart of the server
+        return None
+    return current - previous
+
+
+def get_server_rates(previous, current):
+    """Rates and gauges of the server between two samples."""
+    elapsed = current.monotonic - previous.monotonic
+    server = {}
+    for rate_name, (module, name) in SERVER_RATES.items():
+        delta = _get_delta(previous.get(module, name), current.get(module, name))
+        server[rate_name] = delta / elapsed if delta is not None and elapsed else None
+    for duration_name, (module, name, count_name) in SERVER_DURATIONS.items():
+        duration = _get_delta(previous.get(module, name), current.get(module, name))
+        count = _get_delta(previous.get(module, count_name), current.get(module, count_name))
+        server[duration_name] = duration / count / 1e9 if duration is not None and count else None
+    for gauge_name, (module, name) in SERVER_GAUGES.items():
+        server[gauge_name] = current.get(module, name)
+    return server
+
+
+def sum_server_rates(node_rates):
+    """Rates and gauges of a cluster from those of its nodes."""
+    def total(values):
+        values = [v for v in values if v is not None]
+        return sum(values) if values else None
+
+    server = {}
+    for rate_name in SERVER_RATES:
+        server[rate_name] = total(rates[rate_name] for rates in node_rates)
+    for duration_name, rate_name in SERVER_DURATION_WEIGHTS.items():
+        weighted = [
+            (rates[duration_name], rates[rate_name])
+            for rates in node_rates
+            if rates[duration_name] is not None and rates[rate_name]
+        ]
+        weight = sum(w for _, w in weighted)
+        server[duration_name] = sum(d * w for d, w in weighted) / weight if weight else None
+    for gauge_name in SERVER_GAUGES:
+        server[gauge_name] = total(rates[gauge_name] for rates in node_rates)
+    return server
+
+
+def get_rates(previous, current, server=None):
+    """
+    Rates of the server and of the client between two samples, `server`
+    replacing the rates of the server of the samples when given.
+    """
+    elapsed = current.monotonic - previous.monotonic
+    if server is None:
+        server = get_server_rates(previous, current)
+
+    client = {}
+    for rate_name, name in CLIENT_RATES.items():
+        delta = current.client[name] - previous.client[name]
+        client[rate_name] = delta / elapsed if elapsed else None
+    queries = current.client['queries'] - previous.client['queries']
+    query_duration = current.client['query_duration'] - previous.client['query_duration']
+    client['query_duration_seconds'] = query_duration / queries if queries else None
+
+    correlation = {}
+    for rate_name in CLIENT_RATES:
+        server_rate = server[rate_name]
+        share = client[rate_name] / server_rate if server_rate else None
+        correlation[rate_name.replace('_per_second', '_share')] = share
+    correlation['query_overhead_seconds'] = None
+    if client['query_duration_seconds'] is not None and \
+       server['query_duration_seconds'] is not None:
+        # network, queueing and decoding of the client
+        correlation['query_overhead_seconds'] = \
+            client['query_duration_seconds'] - server['query_duration_seconds']
+
+    return {
+        'started_at': previous.taken_at,
+        'ended_at': current.taken_at,
+        'elapsed_seconds': elapsed,
+        'source': current.source,
+        'server': server,
+        'client': client,
+        'correlation': correlation,
+    }
+
+
+class DiagnosticsCollector:
+    def __init__(self, using=None, options=None):
+        self.using = using
+        self.options = {
+            **DIAGNOSTICS_DEFAULT_OPTIONS,
+            **settings.INFLUXDB_DIAGNOSTICS,
+            **(options or {}),
+        }
+        # samples of each server by base URL
+        self.samples = {}
+        self.client_counters = ClientCounters()
+        self._diagnostics = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def get_node_requests(self):
+        """Requests of the servers to sample, each node of a cluster."""
+        request = Influxable.get_instance(self.using).connection.request
+        if not getattr(request, 'is_cluster', False):
+            return [request]
+        return [node.request for node in request.nodes]
+
+    def sample(self):
+        """
+        Takes a sample of the statistics of each server and of the client
+        counters, returns the samples by base URL. Raises the error of the
+        last server when none could be sampled.
+        """
+        client = self.client_counters.as_dict()
+        samples = {}
+        error = None
+        for request in self.get_node_requests():
+            try:
+                stats, source = self._read_stats(request)
+            except Exception as err:
+                logger.warning('Statistics of %s not available: %r', request.base_url, err)
+                error = err
+                continue
+            sample = DiagnosticsSample(stats, client, source, base_url=request.base_url)
+            self.samples.setdefault(
+                request.base_url,
+                deque(maxlen=self.options['MAX_SAMPLES']),
+            ).append(sample)
+            samples[request.base_url] = sample
+        if not samples and error is not None:
+            raise error
+        return samples
+
+    @staticmethod
+    def _read_stats(request):
+        try:
+            stats = parse_debug_vars(InfluxDBApi.get_debug_vars(request))
+            return stats, 'debug_vars'
+        except Exception as err:
+            logger.debug('Statistics of %s read with SHOW STATS: %r', request.base_url, err)
+        response = InfluxDBResponse(InfluxDBApi.execute_query(request, 'SHOW STATS'))
+        response.raise_if_error()
+        series = FormattedSerieSerializer(response).convert()
+        return parse_stats(series), 'show_stats'
+
+    def get_diagnostics(self):
+        """``SHOW DIAGNOSTICS`` by module, read once, `None` if unavailable."""
+        if self._diagnostics is None:
+            try:
+                self._diagnostics = {
+                    name: rows[0] if len(rows) == 1 else rows
+                    for serie in self._get_admin().show_diagnostics()
+                    for name, rows in serie.items()
+                }
+            except Exception as err:
+                logger.debug('Diagnostics not available: %r', err)
+                return None
+        return self._diagnostics
+
+    def get_report(self):
+        """
+        Rates between the two last samples of each server, `None` before
+        two samples.
+        """
+        last_samples = {
+            base_url: (samples[-2], samples[-1])
+            for base_url, samples in self.samples.items()
+            if len(samples) >= 2
+        }
+        if not last_samples:
+            return None
+        node_rates = {
+            base_url: get_server_rates(previous, current)
+            for base_url, (previous, current) in last_samples.items()
+        }
+        previous, current = next(iter(last_samples.values()))
+        report = get_rates(
+            previous,
+            current,
+            server=sum_server_rates(list(node_rates.values())),
+        )
+        report['nodes'] = node_rates
+        report['diagnostics'] = self.get_diagnostics()
+        return report
+
+    def collect(self, interval=None):
+        """Takes two samples `interval` seconds apart, returns the report."""
+        interval = self.options['INTERVAL'] if interval is None else interval
+        self.client_counters.connect()
+        try:
+            if not any(self.samples.values()):
+                self.sample()
+            time.sleep(interval)
+            self.sample()
+        finally:
+            if self._thread is None:
+                self.client_counters.disconnect()
+        return self.get_report()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.client_counters.connect()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._collect_forever,
+            name='influxdb-diagnostics',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.client_counters.disconnect()
+        self._thread = None
+
+    def _collect_forever(self):
+        while True:
+            try:
+                self.sample()
+            except Exception:
+                logger.exception('Error while sampling the InfluxDB statistics')
+            if self._stopped.wait(self.options['INTERVAL']):
+                return
+
+    def _get_admin(self):
+        from .db.admin import InfluxDBAdmin
+        return InfluxDBAdmin.using(self.using)
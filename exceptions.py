@@ -72,3 +72,47 @@ class InfluxDBUnauthorizedError(InfluxDBError):
 
 class InfluxDBFieldValueError(InfluxDBError):
     pass
+
+
+class InfluxDBCircuitOpenError(InfluxDBConnectionError):
+    MESSAGE_PLACEHOLDER = 'Circuit `{name}` is open, retry in {retry_after:.1f}s'
+
+    def __init__(self, name, retry_after):
+        self.name = name
+        self.retry_after = retry_after
+        self.message = self.MESSAGE_PLACEHOLDER.format(
+            name=name,
+            retry_after=retry_after,
+        )
+        super().__init__(self.message)
+
+
+class InfluxDBConnectionDoesNotExist(InfluxDBError):
+    MESSAGE_PLACEHOLDER = 'The connection `{alias}` does not exist'
+
+    def __init__(self, alias):
+        self.message = self.MESSAGE_PLACEHOLDER.format(alias=alias)
+        super().__init__(self.message)
+
+
+class InfluxDBSpoolLockedError(InfluxDBError):
+    MESSAGE_PLACEHOLDER = 'The spool `{directory}` is used by another process'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.message = self.MESSAGE_PLACEHOLDER.format(directory=directory)
+        super().__init__(self.message)
+
+
+class InfluxDBBatchError(InfluxDBError):
+    MESSAGE_PLACEHOLDER = '{count} of {total} statements failed, first : {error}'
+
+    def __init__(self, errors, total):
+        # `(statement, error)` of each failed statement
+        self.errors = errors
+        self.message = self.MESSAGE_PLACEHOLDER.format(
+            count=len(errors),
+            total=total,
+            error=errors[0][1],
+        )
+        super().__init__(self.message)
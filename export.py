@@ -0,0 +1,279 @@
+"""
+Exports query results without building Python row objects.
+
+The columns and values of the response chunks are written straight to
+JSON lines, CSV or Arrow IPC streams::
+
+    def export_cpu(request):
+        query = Cpu.objects.filter(Field('time') > 'now() - 1d')
+        return export_response(query, format='csv', filename='cpu.csv')
+
+``native=True`` asks InfluxDB itself for CSV (``Accept: application/csv``)
+and forwards its output unchanged, the rows then start with the serie
+name and tags. The Arrow format needs ``pyarrow``.
+"""
+import csv
+import io
+import json
+import logging
+
+from django.http import StreamingHttpResponse
+
+from . import exceptions
+from .api import DEFAULT_CHUNK_SIZE
+from .fields import (
+    BooleanField, FloatField, IntegerField, StringField, TagField, TimestampField,
+)
+
+logger = logging.getLogger(__name__)
+
+CSV_CONTENT_TYPE = 'application/csv'
+
+
+def export_json_lines(responses):
+    """Yields the rows of the responses as JSON lines, one string per serie."""
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    for response in responses:
+        for serie in response.series:
+            columns = serie.columns
+            values = serie.values or []
+            tags = serie.tags
+            if tags:
+                lines = [encode({**tags, **dict(zip(columns, v))}) for v in values]
+            else:
+                lines = [encode(dict(zip(columns, v))) for v in values]
+            if lines:
+                yield '\n'.join(lines) + '\n'
+
+
+def export_csv(responses):
+    """
+    Yields the rows of the responses as CSV, one string per serie. A header
+    is written each time the columns change.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = None
+    for response in responses:
+        for serie in response.series:
+            tags = serie.tags
+            columns = list(tags) + serie.columns
+            if columns != header:
+                writer.writerow(columns)
+                header = columns
+            values = serie.values or []
+            if tags:
+                tag_values = list(tags.values())
+                writer.writerows(tag_values + v for v in values)
+            else:
+                writer.writerows(values)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        msg = 'pyarrow is required for the Arrow format'
+        raise exceptions.InfluxDBError(msg)
+    return pyarrow
+
+
+def get_arrow_type(field):
+    pa = import_pyarrow()
+    # FloatField inherits from IntegerField and is checked first
+    if isinstance(field, FloatField):
+        return pa.float64()
+    if isinstance(field, IntegerField):
+        return pa.int64()
+    if isinstance(field, BooleanField):
+        return pa.bool_()
+    if isinstance(field, StringField):
+        return pa.string()
+    if isinstance(field, TagField):
+        return pa.dictionary(pa.int32(), pa.string())
+    if isinstance(field, TimestampField):
+        return pa.timestamp('ns')
+    return None
+
+
+def get_arrow_schema(model=None):
+    """
+    Arrow schema of the declared fields of a ``Measurement``, `time` is
+    always a nanoseconds timestamp.
+    """
+    pa = import_pyarrow()
+    fields = {'time': pa.timestamp('ns')}
+    if model is not None:
+        for field in model._get_fields():
+            arrow_type = get_arrow_type(field)
+            if arrow_type is not None:
+                fields[field.name] = arrow_type
+    return pa.schema(list(fields.items()))
+
+
+def serie_to_record_batch(serie, schema=None):
+    """
+    Builds an Arrow record batch column by column from a serie. Types are
+    taken from `schema` when given and inferred otherwise.
+    """
+    pa = import_pyarrow()
+    values = serie.values or []
+    tags = serie.tags
+    names = list(tags) + serie.columns
+    columns = [[tag_value] * len(values) for tag_value in tags.values()]
+    columns.extend(list(c) for c in zip(*values))
+    if not values:
+        columns.extend([] for _ in serie.columns)
+
+    arrays = []
+    for name, column in zip(names, columns):
+        field_type = None
+        if schema is not None and name in schema.names:
+            field_type = schema.field(name).type
+        if field_type is not None and pa.types.is_dictionary(field_type):
+            array = pa.array(column, type=field_type.value_type)
+            array = array.dictionary_encode()
+        else:
+            array = pa.array(column, type=field_type)
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def get_stream_schema(batches, schema=None):
+    """
+    Schema of an Arrow stream starting with `batches`. The columns of
+    `schema` keep its types, the others take their first non null inferred
+    type. InfluxDB writes the float 5.0 as 5, so the inferred integers are
+    widened to floats.
+    """
+    pa = import_pyarrow()
+    fields = {}
+    for batch in batches:
+        for field in batch.schema:
+            if schema is not None and field.name in schema.names:
+                fields[field.name] = schema.field(field.name).type
+                continue
+            field_type = field.type
+            if pa.types.is_integer(field_type) and field.name != 'time':
+                field_type = pa.float64()
+            if pa.types.is_null(fields.get(field.name, pa.null())):
+                fields[field.name] = field_type
+    return pa.schema(list(fields.items()))
+
+
+def conform_record_batch(batch, schema):
+    """Casts `batch` to `schema`, its missing columns are nulls."""
+    pa = import_pyarrow()
+    arrays = []
+    for field in schema:
+        if field.name in batch.schema.names:
+            array = batch.column(field.name)
+            if array.type != field.type:
+                array = array.cast(field.type)
+        else:
+            array = pa.nulls(batch.num_rows, type=field.type)
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_arrow_ipc(responses, schema=None, max_buffered_rows=DEFAULT_CHUNK_SIZE):
+    """
+    Yields an Arrow IPC stream, as bytes, with one record batch per serie.
+    The first batches are held until every column has a type, see
+    ``get_stream_schema``, or `max_buffered_rows` rows are held, the
+    columns still only having nulls are then strings.
+    """
+    pa = import_pyarrow()
+    sink = io.BytesIO()
+    writer = None
+    stream_schema = None
+    pending_batches = []
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    def without_null_types(schema):
+        return pa.schema([
+            pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+            for f in schema
+        ])
+
+    for response in responses:
+        for serie in response.series:
+            batch = serie_to_record_batch(serie, schema=schema)
+            if writer is None:
+                pending_batches.append(batch)
+                stream_schema = get_stream_schema(pending_batches, schema)
+                has_null_columns = any(pa.types.is_null(f.type) for f in stream_schema)
+                nb_rows = sum(b.num_rows for b in pending_batches)
+                if has_null_columns and nb_rows < max_buffered_rows:
+                    continue
+                stream_schema = without_null_types(stream_schema)
+                writer = pa.ipc.new_stream(sink, stream_schema)
+                batches, pending_batches = pending_batches, []
+            else:
+                batches = [batch]
+            for batch in batches:
+                extra_columns = set(batch.schema.names) - set(stream_schema.names)
+                if extra_columns:
+                    logger.warning(
+                        'Columns missing from the Arrow stream schema: %s',
+                        ', '.join(sorted(extra_columns)),
+                    )
+                writer.write_batch(conform_record_batch(batch, stream_schema))
+            yield drain()
+    if writer is None and pending_batches:
+        stream_schema = without_null_types(stream_schema)
+        writer = pa.ipc.new_stream(sink, stream_schema)
+        for batch in pending_batches:
+            writer.write_batch(conform_record_batch(batch, stream_schema))
+    if writer is not None:
+        writer.close()
+        yield drain()
+
+
+EXPORT_FORMATS = {
+    'jsonl': ('application/x-ndjson', export_json_lines),
+    'csv': ('text/csv', export_csv),
+    'arrow': ('application/vnd.apache.arrow.stream', export_arrow_ipc),
+}
+
+
+def export_query(query, format='jsonl', chunk_size=DEFAULT_CHUNK_SIZE, native=False):
+    """Yields the exported result of a ``RawQuery`` or ``Query``."""
+    if format not in EXPORT_FORMATS:
+        msg = 'format must be one of {}'.format(sorted(EXPORT_FORMATS))
+        raise exceptions.InfluxDBInvalidChoiceError(msg)
+    if native:
+        if format != 'csv':
+            msg = 'only the csv format can be exported natively'
+            raise exceptions.InfluxDBInvalidChoiceError(msg)
+        return query.stream_raw(accept=CSV_CONTENT_TYPE, chunk_size=chunk_size)
+    _, export_func = EXPORT_FORMATS[format]
+    if format == 'arrow':
+        schema = get_arrow_schema(getattr(query, 'model', None))
+        return export_func(query.stream(chunk_size), schema=schema)
+    return export_func(query.stream(chunk_size))
+
+
+def export_response(
+    query,
+    format='jsonl',
+    filename=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    native=False,
+):
+    content_type, _ = EXPORT_FORMATS.get(format, (None, None))
+    response = StreamingHttpResponse(
+        export_query(query, format, chunk_size=chunk_size, native=native),
+        content_type=content_type,
+    )
+    if filename:
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class TaskResult:
+    def __init__(self, item, value=None, error=None):
+        self.item = item
+        self.value = value
+        self.error = error
+
+    def __repr__(self):
+        state = 'error' if self.error is not None else 'ok'
+        return '<TaskResult {!r} {}>'.format(self.item, state)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def run_concurrently(func, items, max_workers=DEFAULT_MAX_WORKERS, on_progress=None):
+    """
+    Calls `func(item)` for each item on at most `max_workers` threads and
+    returns a ``TaskResult`` per item, in the order of `items`. An exception
+    is kept on its result instead of cancelling the other calls.
+    `on_progress(done, total, result)` is called as each call completes.
+    """
+    items = list(items)
+    if not items:
+        return []
+    results = [None] * len(items)
+    max_workers = max(1, min(max_workers, len(items)))
+    with ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix='influxdb-worker',
+    ) as executor:
+        futures = {
+            executor.submit(func, item): index
+            for index, item in enumerate(items)
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                result = TaskResult(items[index], value=future.result())
+            except Exception as err:
+                result = TaskResult(items[index], error=err)
+            results[index] = result
+            if on_progress is not None:
+                on_progress(done, len(items), result)
+    return results
@@ -1,2 +1,131 @@
+import datetime
+import re
+
+import arrow
+
+DURATION_UNITS = (
+    ('w', datetime.timedelta(weeks=1)),
+    ('d', datetime.timedelta(days=1)),
+    ('h', datetime.timedelta(hours=1)),
+    ('m', datetime.timedelta(minutes=1)),
+    ('s', datetime.timedelta(seconds=1)),
+    ('ms', datetime.timedelta(milliseconds=1)),
+    ('u', datetime.timedelta(microseconds=1)),
+)
+
+DURATION_REGEX = re.compile(r'^(\d+(ns|u|µ|ms|s|m|h|d|w))+$')
+DURATION_PART_REGEX = re.compile(r'(\d+)(ns|u|µ|ms|s|m|h|d|w)')
+# durations reported by InfluxDB such as `1m2.5s` or `120ms`
+GO_DURATION_REGEX = re.compile(r'^(?:\d+(?:\.\d*)?(?:ns|us|µs|ms|s|m|h))+$')
+GO_DURATION_PART_REGEX = re.compile(r'(\d+(?:\.\d*)?)(ns|us|µs|ms|s|m|h)')
+GO_DURATION_UNITS = {
+    'h': 3600,
+    'm': 60,
+    's': 1,
+    'ms': 1e-3,
+    'us': 1e-6,
+    'µs': 1e-6,
+    'ns': 1e-9,
+}
+NOW_REGEX = re.compile(r'^now\(\)\s*(?:([+-])\s*(\S+))?$')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
 def inv(x):
     return 1/x if x else 0
+
+
+def format_duration(value):
+    """
+    Formats a duration literal for InfluxQL, `value` is a literal such as
+    `'1h30m'`, a ``timedelta`` or a number of seconds.
+    """
+    if isinstance(value, str):
+        if not DURATION_REGEX.match(value):
+            raise ValueError('invalid duration: {!r}'.format(value))
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = datetime.timedelta(seconds=value)
+    if not isinstance(value, datetime.timedelta):
+        raise TypeError('duration must be a str, a timedelta or a number of seconds')
+    if value <= datetime.timedelta(0):
+        raise ValueError('duration must be positive')
+    for unit, unit_value in DURATION_UNITS:
+        if not value % unit_value:
+            return '{}{}'.format(value // unit_value, unit)
+
+
+def parse_duration(literal):
+    """Parses an InfluxQL duration literal such as `'1h30m'` to a ``timedelta``."""
+    literal = literal.strip()
+    if not DURATION_REGEX.match(literal):
+        raise ValueError('invalid duration: {!r}'.format(literal))
+    units = dict(DURATION_UNITS, ns=datetime.timedelta(0))
+    units['µ'] = units['u']
+    duration = datetime.timedelta(0)
+    for number, unit in DURATION_PART_REGEX.findall(literal):
+        duration += int(number) * units[unit]
+    return duration
+
+
+def parse_go_duration(value):
+    """
+    Parses a duration formatted by InfluxDB, in ``SHOW QUERIES`` for
+    instance, such as `'1m2.5s'` or `'120ms'`, to a ``timedelta``.
+    """
+    value = value.strip()
+    if not GO_DURATION_REGEX.match(value):
+        raise ValueError('invalid duration: {!r}'.format(value))
+    seconds = sum(
+        float(number) * GO_DURATION_UNITS[unit]
+        for number, unit in GO_DURATION_PART_REGEX.findall(value)
+    )
+    return datetime.timedelta(seconds=seconds)
+
+
+def datetime_to_nanoseconds(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10 ** 9 + delta.microseconds * 1000
+
+
+def nanoseconds_to_datetime(nanoseconds):
+    return EPOCH + datetime.timedelta(microseconds=nanoseconds // 1000)
+
+
+def parse_time_nanoseconds(value, now=None):
+    """Same as ``parse_time`` but exact, in nanoseconds since the epoch."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return datetime_to_nanoseconds(parse_time(value, now))
+
+
+def parse_time(value, now=None):
+    """
+    Converts a time criteria value to an aware ``datetime``: a ``datetime``
+    (naive ones are UTC), nanoseconds since the epoch, a date string or a
+    `now() - 1h` expression.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=datetime.timezone.utc)
+        return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        seconds, nanoseconds = divmod(value, 10 ** 9)
+        timestamp = datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+        return timestamp + datetime.timedelta(microseconds=nanoseconds // 1000)
+    if isinstance(value, str):
+        match = NOW_REGEX.match(value.strip())
+        if match:
+            sign, duration = match.groups()
+            if sign is None:
+                return now
+            duration = parse_duration(duration)
+            return now - duration if sign == '-' else now + duration
+        try:
+            return arrow.get(value).datetime
+        except (arrow.parser.ParserError, ValueError):
+            pass
+    raise ValueError('invalid time: {!r}'.format(value))
@@ -0,0 +1,114 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from .signals import query_finished, query_started
+
+
+class QueryPhase:
+    BUILD = 'build'
+    HTTP = 'http'
+    DECODE = 'decode'
+    OBJECTS = 'objects'
+    SERIALIZE = 'serialize'
+
+
+class QueryProfile:
+    def __init__(self, using=None):
+        self.using = using
+        self.query = None
+        self.phases = {}
+        self.bytes_received = 0
+        self.row_count = 0
+        self.error = None
+        self.thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self.duration = None
+        self._start = time.perf_counter()
+
+    def add_phase(self, name, duration):
+        self.phases[name] = self.phases.get(name, 0) + duration
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def as_dict(self):
+        return {
+            'using': self.using,
+            'query': self.query,
+            'phases': dict(self.phases),
+            'bytes_received': self.bytes_received,
+            'row_count': self.row_count,
+            'error': repr(self.error) if self.error else None,
+            'started_at': self.started_at,
+            'duration': self.duration,
+        }
+
+
+_local = threading.local()
+
+
+def is_enabled():
+    return query_started.has_listeners() or query_finished.has_listeners()
+
+
+def get_current_profile():
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def profile_query(using=None):
+    """
+    Opens a profile for the current thread, unless one is already open in
+    which case the nested operation is recorded in the outer profile. The
+    outermost profile is sent with `query_finished` when it is done.
+    """
+    profile = get_current_profile()
+    if profile is not None or not is_enabled():
+        yield profile
+        return
+
+    profile = QueryProfile(using=using)
+    _local.profile = profile
+    try:
+        yield profile
+    except Exception as err:
+        profile.error = err
+        raise
+    finally:
+        _local.profile = None
+        profile.finish()
+        query_finished.send(sender=QueryProfile, profile=profile)
+
+
+@contextmanager
+def phase(name):
+    profile = get_current_profile()
+    if profile is None:
+        yield None
+        return
+
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.add_phase(name, time.perf_counter() - start)
+
+
+def set_query(query):
+    profile = get_current_profile()
+    if profile is not None and profile.query is None:
+        profile.query = query
+        query_started.send(sender=QueryProfile, profile=profile)
+
+
+def profiled(func):
+    """Profiles a query method; the query alias is read from `self.db`."""
+    def func_wrapper(self, *args, **kwargs):
+        if get_current_profile() is None and not is_enabled():
+            return func(self, *args, **kwargs)
+        with profile_query(using=self.db):
+            return func(self, *args, **kwargs)
+    func_wrapper.__name__ = func.__name__
+    func_wrapper.__doc__ = func.__doc__
+    return func_wrapper
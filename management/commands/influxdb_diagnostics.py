@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from ...diagnostics import DiagnosticsCollector
+
+
+class Command(BaseCommand):
+    help = 'Samples the InfluxDB statistics and prints their rates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--using', default=None)
+        parser.add_argument('--interval', type=float, default=10)
+        parser.add_argument('--count', type=int, default=1)
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            dest='as_json',
+            help='prints a JSON document per line',
+        )
+
+    def handle(self, *args, using=None, interval=10, count=1, as_json=False, **options):
+        collector = DiagnosticsCollector(using=using)
+        for _ in range(count):
+            report = collector.collect(interval)
+            if as_json:
+                self.stdout.write(json.dumps(report, default=str))
+            else:
+                self.write_report(report)
+
+    def write_report(self, report):
+        self.stdout.write('{:.1f}s from {}'.format(
+            report['elapsed_seconds'],
+            report['source'],
+        ))
+        sections = [(section, report[section]) for section in ('server', 'client', 'correlation')]
+        if len(report['nodes']) > 1:
+            sections.extend(report['nodes'].items())
+        for section, values in sections:
+            self.stdout.write(section + ':')
+            for name, value in values.items():
+                if value is None:
+                    value = '-'
+                elif isinstance(value, float):
+                    value = '{:.6g}'.format(value)
+                self.stdout.write('  {}: {}'.format(name, value))
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from ...shards import ShardPlanner
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the InfluxDB points of a time range, dropping the shards it '
+        'fully covers. Prints the plan unless --execute is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--using', default=None)
+        parser.add_argument('--start', default=None, help='e.g. 2020-01-01')
+        parser.add_argument('--end', default=None, help='e.g. "now() - 90d"')
+        parser.add_argument(
+            '--measurement',
+            action='append',
+            dest='measurements',
+            help='deletes the points of this measurement only, repeatable',
+        )
+        parser.add_argument('--execute', action='store_true')
+        parser.add_argument('--json', action='store_true', dest='as_json')
+
+    def handle(
+        self,
+        *args,
+        using=None,
+        start=None,
+        end=None,
+        measurements=None,
+        execute=False,
+        as_json=False,
+        **options
+    ):
+        planner = ShardPlanner(using=using)
+        plan = planner.plan(start, end, measurements)
+        if as_json:
+            self.stdout.write(json.dumps(plan.as_dict(), indent=2, default=str))
+        else:
+            self.stdout.write(plan.format())
+        if execute and not plan.is_empty:
+            planner.execute(plan)
@@ -0,0 +1,44 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand
+
+from ...slowlog import slow_query_log
+
+
+class Command(BaseCommand):
+    help = 'Lists the last slow InfluxDB queries, see INFLUXDB_SLOW_QUERY_LOG.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--json', action='store_true', dest='as_json')
+        parser.add_argument('--clear', action='store_true')
+
+    def handle(self, *args, limit=None, as_json=False, clear=False, **options):
+        if clear:
+            slow_query_log.clear()
+            return
+        entries = slow_query_log.get_entries(limit)
+        if as_json:
+            self.stdout.write(json.dumps(entries, indent=2))
+            return
+        if not entries and not slow_query_log.options['CACHE']:
+            self.stderr.write(
+                'The entries of other processes are only listed when '
+                'INFLUXDB_SLOW_QUERY_LOG sets a CACHE'
+            )
+        for entry in entries:
+            started_at = datetime.datetime.fromtimestamp(entry['started_at'])
+            self.stdout.write('{} {:.3f}s {} rows [{}]'.format(
+                started_at.isoformat(sep=' ', timespec='seconds'),
+                entry['duration'],
+                entry['row_count'],
+                entry['using'] or 'default',
+            ))
+            self.stdout.write('  ' + entry['query'])
+            if entry['error']:
+                self.stdout.write('  error: ' + entry['error'])
+            for line in entry['explain'] or []:
+                self.stdout.write('    ' + line)
+            if entry['explain_error']:
+                self.stdout.write('  explain error: ' + entry['explain_error'])
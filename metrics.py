@@ -0,0 +1,294 @@
+"""
+Client side metrics for InfluxDB operations.
+
+The backend is chosen with the ``INFLUXDB_METRICS`` setting::
+
+    INFLUXDB_METRICS = {
+        'BACKEND': 'prometheus',  # or 'statsd', 'memory' or a dotted path
+        'OPTIONS': {},
+    }
+
+Metrics are not recorded when no backend is set.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import settings
+from .signals import circuit_breaker_state_changed
+
+
+class MetricName:
+    REQUESTS = 'requests_total'
+    REQUEST_DURATION = 'request_duration_seconds'
+    QUERIES = 'queries_total'
+    QUERY_DURATION = 'query_duration_seconds'
+    WRITE_BATCHES = 'write_batches_total'
+    POINTS_WRITTEN = 'points_written_total'
+    POINTS_SPOOLED = 'points_spooled_total'
+    ERRORS = 'errors_total'
+    CIRCUIT_BREAKER_TRANSITIONS = 'circuit_breaker_transitions_total'
+    QUERIES_KILLED = 'queries_killed_total'
+
+
+class BaseMetricsBackend:
+    def __init__(self, **options):
+        self.options = options
+
+    def increment(self, name, value=1, labels={}):
+        raise NotImplementedError
+
+    def observe(self, name, value, labels={}):
+        raise NotImplementedError
+
+
+class InMemoryMetricsBackend(BaseMetricsBackend):
+    """Keeps every metric in memory, mostly useful for tests."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def increment(self, name, value=1, labels={}):
+        key = self._get_key(labels)
+        with self._lock:
+            self.counters[name][key] += value
+
+    def observe(self, name, value, labels={}):
+        key = self._get_key(labels)
+        with self._lock:
+            self.observations[name][key].append(value)
+
+    def get_counter(self, name, **labels):
+        with self._lock:
+            if labels:
+                return self.counters[name][self._get_key(labels)]
+            return sum(self.counters[name].values())
+
+    def get_observations(self, name, **labels):
+        with self._lock:
+            if labels:
+                return list(self.observations[name][self._get_key(labels)])
+            return [
+                value
+                for values in self.observations[name].values()
+                for value in values
+            ]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': {
+                    name: {key: value for key, value in values.items()}
+                    for name, values in self.counters.items()
+                },
+                'observations': {
+                    name: {key: list(value) for key, value in values.items()}
+                    for name, values in self.observations.items()
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters = defaultdict(lambda: defaultdict(int))
+            self.observations = defaultdict(lambda: defaultdict(list))
+
+    @staticmethod
+    def _get_key(labels):
+        return tuple(sorted(labels.items()))
+
+
+class PrometheusMetricsBackend(BaseMetricsBackend):
+    """
+    Exposes metrics with ``prometheus_client``. Options : `namespace`
+    (`influxdb_client` by default) and `registry`.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        import prometheus_client
+        self._prometheus_client = prometheus_client
+        self.namespace = options.get('namespace', 'influxdb_client')
+        self.registry = options.get('registry', prometheus_client.REGISTRY)
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, labels={}):
+        counter = self._get_metric(
+            self._prometheus_client.Counter,
+            # prometheus_client adds the `_total` suffix itself
+            name[:-len('_total')] if name.endswith('_total') else name,
+            labels,
+        )
+        counter.inc(value)
+
+    def observe(self, name, value, labels={}):
+        histogram = self._get_metric(
+            self._prometheus_client.Histogram,
+            name,
+            labels,
+        )
+        histogram.observe(value)
+
+    def _get_metric(self, metric_class, name, labels):
+        label_names = tuple(sorted(labels))
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(
+                    name,
+                    name.replace('_', ' '),
+                    label_names,
+                    namespace=self.namespace,
+                    registry=self.registry,
+                )
+                self._metrics[name] = metric
+        if label_names:
+            return metric.labels(**{k: str(v) for k, v in labels.items()})
+        return metric
+
+
+class StatsdMetricsBackend(BaseMetricsBackend):
+    """
+    Sends metrics with the ``statsd`` package. Options : `host`, `port` and
+    `prefix`. Labels are appended to the metric name.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        import statsd
+        self.client = statsd.StatsClient(
+            options.get('host', 'localhost'),
+            options.get('port', 8125),
+            prefix=options.get('prefix', 'influxdb_client'),
+        )
+
+    def increment(self, name, value=1, labels={}):
+        self.client.incr(self._get_name(name, labels), value)
+
+    def observe(self, name, value, labels={}):
+        # statsd timings are in milliseconds
+        self.client.timing(self._get_name(name, labels), value * 1000)
+
+    @staticmethod
+    def _get_name(name, labels):
+        parts = [name]
+        for key, value in sorted(labels.items()):
+            value = str(value).replace('.', '_') or 'none'
+            parts.append('{}_{}'.format(key, value))
+        return '.'.join(parts)
+
+
+BACKEND_ALIASES = {
+    'memory': InMemoryMetricsBackend,
+    'prometheus': PrometheusMetricsBackend,
+    'statsd': StatsdMetricsBackend,
+}
+
+_backend = None
+_backend_loaded = False
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend, _backend_loaded
+    if not _backend_loaded:
+        with _backend_lock:
+            if not _backend_loaded:
+                _backend = _load_backend(settings.INFLUXDB_METRICS)
+                _backend_loaded = True
+    return _backend
+
+
+def set_backend(backend):
+    """Replaces the configured backend, `None` disables the metrics."""
+    global _backend, _backend_loaded
+    with _backend_lock:
+        _backend = backend
+        _backend_loaded = True
+
+
+def _load_backend(config):
+    backend = config.get('BACKEND') if config else None
+    if not backend:
+        return None
+    backend_class = BACKEND_ALIASES.get(backend)
+    if backend_class is None:
+        backend_class = import_string(backend)
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+def increment(name, value=1, **labels):
+    backend = get_backend()
+    if backend is not None:
+        backend.increment(name, value, labels)
+
+
+def observe(name, value, **labels):
+    backend = get_backend()
+    if backend is not None:
+        backend.observe(name, value, labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    if get_backend() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def get_statement_type(query):
+    words = str(query).split(None, 1)
+    return words[0].lower() if words else ''
+
+
+def get_line_measurement(line):
+    # the measurement ends at the first unescaped comma or space
+    escaped = False
+    for i, char in enumerate(line):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in ', ':
+            return line[:i].replace('\\', '')
+    return line
+
+
+def record_points_written(points):
+    """Counts a written batch of point dicts or line protocol strings."""
+    if get_backend() is None:
+        return
+    counts = defaultdict(int)
+    if isinstance(points, str):
+        points = [points]
+    for point in points:
+        if isinstance(point, dict):
+            counts[point.get('measurement', '')] += 1
+            continue
+        # a line protocol string may hold several lines
+        for line in point.splitlines():
+            if line.strip() and not line.startswith('#'):
+                counts[get_line_measurement(line)] += 1
+    increment(MetricName.WRITE_BATCHES)
+    for measurement, count in counts.items():
+        increment(MetricName.POINTS_WRITTEN, count, measurement=measurement)
+
+
+@receiver(circuit_breaker_state_changed)
+def _record_circuit_breaker_transition(sender, name, new_state, **kwargs):
+    increment(
+        MetricName.CIRCUIT_BREAKER_TRANSITIONS,
+        circuit=name,
+        state=new_state,
+    )
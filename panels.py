@@ -0,0 +1,74 @@
+"""
+Django debug toolbar panel listing the InfluxDB queries of a request.
+
+Add ``'django_cloudapp_common.influx.panels.InfluxDBPanel'`` to
+``DEBUG_TOOLBAR_PANELS`` to enable it.
+"""
+import threading
+
+from debug_toolbar.panels import Panel
+from django.utils.html import format_html, format_html_join
+
+from .signals import query_finished
+
+
+class InfluxDBPanel(Panel):
+    title = 'InfluxDB'
+    nav_title = 'InfluxDB'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._profiles = []
+        self._thread_id = None
+
+    @property
+    def nav_subtitle(self):
+        stats = self.get_stats()
+        profiles = stats.get('profiles', [])
+        total_time = sum(p['duration'] or 0 for p in profiles) * 1000
+        return '{} queries in {:.2f}ms'.format(len(profiles), total_time)
+
+    def enable_instrumentation(self):
+        self._thread_id = threading.get_ident()
+        query_finished.connect(self._record_profile)
+
+    def disable_instrumentation(self):
+        query_finished.disconnect(self._record_profile)
+
+    def generate_stats(self, request, response):
+        profiles = [p.as_dict() for p in self._profiles]
+        self.record_stats({'profiles': profiles})
+
+    @property
+    def content(self):
+        profiles = self.get_stats().get('profiles', [])
+        rows = format_html_join(
+            '',
+            '<tr><td>{}</td><td><code>{}</code></td><td>{}</td>'
+            '<td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            (
+                (
+                    p['using'] or 'default',
+                    p['query'],
+                    '{:.2f}'.format((p['duration'] or 0) * 1000),
+                    ', '.join(
+                        '{} {:.2f}ms'.format(name, duration * 1000)
+                        for name, duration in p['phases'].items()
+                    ),
+                    p['row_count'],
+                    p['bytes_received'],
+                    p['error'] or '',
+                )
+                for p in profiles
+            ),
+        )
+        return format_html(
+            '<table><thead><tr><th>Alias</th><th>Query</th>'
+            '<th>Time (ms)</th><th>Phases</th><th>Rows</th><th>Bytes</th>'
+            '<th>Error</th></tr></thead><tbody>{}</tbody></table>',
+            rows,
+        )
+
+    def _record_profile(self, sender, profile, **kwargs):
+        if profile.thread_id == self._thread_id:
+            self._profiles.append(profile)
@@ -1,19 +1,61 @@
 import requests
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from . import metrics
+from .circuit_breaker import get_circuit_breaker
 from .decorators import raise_if_error
+from .metrics import MetricName
+
+
+CIRCUIT_BREAKER_FAILURE_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def _is_server_error(response):
+    return response.status_code >= 500
 
 
 class InfluxDBRequest(requests.Session):
-    def __init__(self, base_url, database_name, auth):
+    is_cluster = False
+
+    def __init__(self, base_url, database_name, auth, timeout=None,
+                 pool_size=None):
         super().__init__()
         self.base_url = base_url
         self.database_name = database_name
         self.auth = auth
+        self.timeout = timeout
+        if pool_size:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+            )
+            self.mount('http://', adapter)
+            self.mount('https://', adapter)
+        self.circuit_breaker = get_circuit_breaker(
+            'request:{}'.format(base_url),
+            failure_exceptions=CIRCUIT_BREAKER_FAILURE_EXCEPTIONS,
+            result_is_failure=_is_server_error,
+        )
 
     @raise_if_error
     def request(self, method, url, **kwargs):
         full_url = urljoin(self.base_url, url)
-        return super().request(method, url=full_url, **kwargs)
+        kwargs.setdefault('timeout', self.timeout)
+        labels = {
+            'method': method.lower(),
+            'endpoint': urlparse(full_url).path,
+        }
+        with metrics.timer(MetricName.REQUEST_DURATION, **labels):
+            res = self.circuit_breaker.call(
+                super().request,
+                method,
+                url=full_url,
+                **kwargs
+            )
+        metrics.increment(MetricName.REQUESTS, status=res.status_code, **labels)
+        return res
 
     @raise_if_error
     def head(self, url, **kwargs):
@@ -44,16 +44,30 @@ class InfluxDBResponse:
         return raws
 
     @property
-    def error(self):
+    def results(self):
+        """An ``InfluxDBResponse`` per statement of the query."""
+        return [
+            InfluxDBResponse({'results': [result]})
+            for result in self.raw.get('results', [])
+        ]
+
+    @property
+    def errors(self):
+        """Error of the request then of each failed statement."""
+        errors = []
         main_level_error = self.raw.get('error', None)
         if main_level_error:
-            return main_level_error
-        if 'results' in self.raw:
-            results = self.raw['results']
-            if len(results):
-                result = results[0]
-                if 'error' in result:
-                    return result.get('error', None)
+            errors.append(main_level_error)
+        for result in self.raw.get('results', []):
+            if result.get('error'):
+                errors.append(result['error'])
+        return errors
+
+    @property
+    def error(self):
+        errors = self.errors
+        if errors:
+            return errors[0]
 
     def raise_if_error(self):
         if self.error:
@@ -81,6 +95,10 @@ class InfluxDBSerieResponse:
     def values(self):
         return self._raw_json_serie.get("values", None)
 
+    @property
+    def tags(self):
+        return self._raw_json_serie.get("tags") or {}
+
 
 class InfluxDBErrorResponse:
     def __init__(self, raw_json):
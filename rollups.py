@@ -0,0 +1,273 @@
+"""
+Rollups of a measurement, maintained by continuous queries.
+
+Rollups are declared on the ``Meta`` of a ``Measurement``::
+
+    class Cpu(Measurement):
+        class Meta:
+            db_table = 'cpu'
+            rollups = [
+                Rollup('5m', policy='one_month', aggregations=['mean', 'max'],
+                       start='2020-03-01'),
+                Rollup('1h', policy='one_year', duration='52w', start='2020-03-01'),
+            ]
+
+``InfluxDBAdmin.create_rollups(Cpu)`` creates their continuous queries,
+each aggregated field is written as `<aggregation>_<field>`. A continuous
+query only aggregates the intervals ending after its creation, the
+`start` of a rollup is the time from which it holds every interval: when
+its continuous query was created, or the start of the backfill of
+``create_rollups(Cpu, backfill_start=...)``. Queries grouped by time are
+then served from the coarsest rollup whose interval divides theirs and
+which keeps the aggregations, fields and time range they need, see
+``route``. A rollup without a `start` is never read.
+"""
+import datetime
+import logging
+import re
+
+from . import exceptions
+from .fields import IntegerField, TagField
+from .helpers.utils import (
+    datetime_to_nanoseconds, format_duration, parse_duration, parse_time_nanoseconds,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# aggregation of the rollup: function aggregating its values again
+ROLLUP_AGGREGATIONS = {
+    'mean': 'MEAN',
+    'max': 'MAX',
+    'min': 'MIN',
+    'sum': 'SUM',
+    'count': 'SUM',
+    'first': 'FIRST',
+    'last': 'LAST',
+}
+
+SELECTED_FIELD_REGEX = re.compile(
+    r'^(\w+)\(\s*"?(\w+)"?\s*\)(?:\s+AS\s+"?(\w+)"?)?$',
+    re.IGNORECASE,
+)
+
+
+class Rollup:
+    def __init__(
+        self,
+        interval,
+        policy=None,
+        aggregations=('mean',),
+        fields=None,
+        measurement=None,
+        duration=None,
+        name=None,
+        start=None,
+    ):
+        for aggregation in aggregations:
+            if aggregation not in ROLLUP_AGGREGATIONS:
+                msg = 'aggregation `{}` must be one of {}'.format(
+                    aggregation,
+                    sorted(ROLLUP_AGGREGATIONS),
+                )
+                raise exceptions.InfluxDBInvalidChoiceError(msg)
+        if not policy and not measurement:
+            # the aggregates would be written into the raw measurement
+            msg = '`policy` or `measurement` must be not null'
+            raise exceptions.InfluxDBError(msg)
+        try:
+            self.interval = format_duration(interval)
+            self.duration = format_duration(duration) if duration else None
+            # nanoseconds since the epoch
+            self.start = parse_time_nanoseconds(start) if start is not None else None
+        except (TypeError, ValueError) as err:
+            raise exceptions.InfluxDBInvalidTypeError(str(err))
+        self.policy = policy
+        self.aggregations = list(aggregations)
+        self.fields = list(fields) if fields is not None else None
+        self.measurement = measurement
+        self.name = name
+
+    def __repr__(self):
+        return '<Rollup {} {}>'.format(self.policy, self.interval)
+
+    @property
+    def interval_timedelta(self):
+        return parse_duration(self.interval)
+
+    @property
+    def duration_timedelta(self):
+        return parse_duration(self.duration) if self.duration else None
+
+    def get_measurement(self, model):
+        return self.measurement or model.Meta.db_table
+
+    def get_fields(self, model):
+        if self.fields is not None:
+            return self.fields
+        return [
+            f.field_name
+            for f in model._get_fields()
+            if isinstance(f, IntegerField)
+        ]
+
+    def get_name(self, model):
+        if self.name:
+            return self.name
+        return 'cq_{}_{}'.format(self.get_measurement(model), self.interval)
+
+    def writes_into_source(self, model):
+        return not self.policy and self.get_measurement(model) == model.Meta.db_table
+
+    def get_target(self, model):
+        if self.writes_into_source(model):
+            msg = 'rollup {} of `{}` must be written into another measurement'.format(
+                self.interval,
+                model.Meta.db_table,
+            )
+            raise exceptions.InfluxDBError(msg)
+        measurement = '"{}"'.format(self.get_measurement(model))
+        if self.policy:
+            return '"{}".{}'.format(self.policy, measurement)
+        return measurement
+
+    def get_select_query(self, model, start=None, end=None):
+        """
+        `SELECT ... INTO` statement of the continuous query, of the backfill
+        of the intervals from `start` to `end` in nanoseconds when given.
+        """
+        selected_fields = [
+            '{}("{}") AS "{}_{}"'.format(aggregation, field, aggregation, field)
+            for field in self.get_fields(model)
+            for aggregation in self.aggregations
+        ]
+        conditions = []
+        if start is not None:
+            conditions.append('time >= {}'.format(start))
+        if end is not None:
+            conditions.append('time < {}'.format(end))
+        where_clause = ' WHERE {}'.format(' AND '.join(conditions)) if conditions else ''
+        return 'SELECT {} INTO {} FROM "{}"{} GROUP BY time({}), *'.format(
+            ', '.join(selected_fields),
+            self.get_target(model),
+            model.Meta.db_table,
+            where_clause,
+            self.interval,
+        )
+
+    def serves(self, model, interval, selected_fields, time_range, now):
+        """
+        Whether the rollup holds what a query grouped by `interval` and
+        selecting `(aggregation, field, alias)` tuples in `time_range`
+        needs: the range must be within `[start, now - interval)`, as the
+        continuous query aggregates an interval once it has ended.
+        """
+        if self.writes_into_source(model) or self.start is None:
+            return False
+        rollup_interval = self.interval_timedelta
+        if interval < rollup_interval or interval % rollup_interval:
+            return False
+        fields = self.get_fields(model)
+        for aggregation, field, _ in selected_fields:
+            if aggregation not in self.aggregations or field not in fields:
+                return False
+        if time_range.start is None or time_range.start < self.start:
+            return False
+        # a query without an upper bound ends at now()
+        end = time_range.end if time_range.end is not None else datetime_to_nanoseconds(now)
+        if end > datetime_to_nanoseconds(now - rollup_interval):
+            return False
+        duration = self.duration_timedelta
+        if duration is not None and time_range.start < datetime_to_nanoseconds(now - duration):
+            return False
+        return True
+
+    def get_selected_fields(self, selected_fields):
+        return [
+            '{}("{}_{}") AS "{}"'.format(
+                ROLLUP_AGGREGATIONS[aggregation],
+                aggregation,
+                field,
+                alias,
+            )
+            for aggregation, field, alias in selected_fields
+        ]
+
+
+def get_rollups(model):
+    if model is None:
+        return []
+    return list(getattr(model.Meta, 'rollups', None) or [])
+
+
+def parse_selected_fields(selected_fields):
+    """
+    `(aggregation, field, alias)` tuples of aggregated fields such as
+    `MEAN("value") AS "value"`, `None` when one can't come from a rollup.
+    """
+    parsed_fields = []
+    for selected_field in selected_fields:
+        match = SELECTED_FIELD_REGEX.match(selected_field.strip())
+        if match is None:
+            return None
+        function, field, alias = match.groups()
+        aggregation = function.lower()
+        if aggregation not in ROLLUP_AGGREGATIONS:
+            return None
+        parsed_fields.append((aggregation, field, alias or aggregation))
+    aliases = [alias for _, _, alias in parsed_fields]
+    if len(set(aliases)) != len(aliases):
+        return None
+    return parsed_fields
+
+
+def _get_criteria_names(criteria):
+    if hasattr(criteria, 'criteria'):
+        for c in criteria.criteria:
+            yield from _get_criteria_names(c)
+    else:
+        yield str(criteria.left_operand)
+
+
+def _filters_on_tags_only(query, tags):
+    names = set()
+    for criteria in query.selected_criteria:
+        names.update(_get_criteria_names(criteria))
+    for search_key in query.search_keys + query.exact_search_keys:
+        names.update(search_key)
+    return names <= tags | {'time'}
+
+
+def route(query, now=None):
+    """
+    Returns the rollup serving `query` and its rewritten selected fields,
+    `(None, None)` when the raw data must be read.
+    """
+    rollups = get_rollups(query.model)
+    if not rollups or query.group_by_interval is None:
+        return None, None
+    if query.group_by_offset is not None:
+        return None, None
+    selected_fields = parse_selected_fields(query.selected_fields)
+    if not selected_fields:
+        return None, None
+    tags = {
+        f.field_name
+        for f in query.model._get_fields()
+        if isinstance(f, TagField)
+    }
+    if not _filters_on_tags_only(query, tags):
+        return None, None
+
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    interval = parse_duration(query.group_by_interval)
+    time_range = query.get_time_range(now)
+    candidates = [
+        rollup for rollup in rollups
+        if rollup.serves(query.model, interval, selected_fields, time_range, now)
+    ]
+    if not candidates:
+        return None, None
+    rollup = max(candidates, key=lambda r: r.interval_timedelta)
+    logger.debug('query on %s served by %r', query.selected_measurement, rollup)
+    return rollup, rollup.get_selected_fields(selected_fields)
@@ -0,0 +1,278 @@
+"""
+Cache of the field and tag keys of the measurements.
+
+The keys of a measurement are loaded with ``SHOW FIELD KEYS`` and ``SHOW TAG
+KEYS`` on first use, then refreshed in a background thread once older than
+the ``TTL`` of the ``INFLUXDB_SCHEMA_CACHE`` setting, one measurement at a
+time. Writes introducing unknown keys invalidate the measurement::
+
+    INFLUXDB_SCHEMA_CACHE = {
+        'ENABLED': True,
+        'TTL': 300,
+        'TAG_VALUES': False,
+    }
+
+``Query.filter`` reads it to cast the keyword predicates to `::tag` or
+`::field`, without a query: a missing schema is loaded in the background
+and the predicates are not cast until it is.
+"""
+import logging
+import threading
+import time
+
+from django.dispatch import receiver
+
+from . import settings
+from .app import influxables
+from .signals import points_written
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CACHE_DEFAULT_OPTIONS = {
+    'ENABLED': True,
+    'TTL': 300,
+    'TAG_VALUES': False,
+}
+
+
+def _split(string, separator):
+    # splits on unescaped separators outside of double quoted strings
+    parts = []
+    start = 0
+    escaped = in_quotes = False
+    for i, char in enumerate(string):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '"':
+            in_quotes = not in_quotes
+        elif char == separator and not in_quotes:
+            parts.append(string[start:i])
+            start = i + 1
+    parts.append(string[start:])
+    return parts
+
+
+def _unescape(key):
+    return key.replace('\\', '')
+
+
+def get_line_keys(line):
+    """`(measurement, tag keys, field keys)` of a line protocol line."""
+    sections = _split(line.strip(), ' ')
+    series_key = _split(sections[0], ',')
+    measurement = _unescape(series_key[0])
+    tag_keys = {_unescape(_split(tag, '=')[0]) for tag in series_key[1:]}
+    field_keys = set()
+    if len(sections) > 1:
+        field_keys = {
+            _unescape(_split(field, '=')[0])
+            for field in _split(sections[1], ',')
+        }
+    return measurement, tag_keys, field_keys
+
+
+def get_point_keys(point):
+    if isinstance(point, dict):
+        return (
+            point.get('measurement', ''),
+            set(point.get('tags') or {}),
+            set(point.get('fields') or {}),
+        )
+    return get_line_keys(point)
+
+
+class MeasurementSchema:
+    def __init__(self, measurement, field_keys=None, tag_keys=None, tag_values=None):
+        self.measurement = measurement
+        # field key: InfluxDB type, `float`, `integer`, `string` or `boolean`
+        self.field_keys = field_keys or {}
+        self.tag_keys = set(tag_keys or ())
+        self.tag_values = tag_values or {}
+        self.loaded_at = time.monotonic()
+
+    def __repr__(self):
+        return '<MeasurementSchema {}>'.format(self.measurement)
+
+    def get_key_type(self, key):
+        if key in self.tag_keys:
+            return 'tag'
+        if key in self.field_keys:
+            return 'field'
+        return None
+
+    def has_keys(self, tag_keys, field_keys):
+        return tag_keys <= self.tag_keys and field_keys <= set(self.field_keys)
+
+    def is_stale(self, ttl):
+        return time.monotonic() - self.loaded_at > ttl
+
+
+class SchemaCache:
+    """
+    Thread-safe cache of a ``MeasurementSchema`` per database and
+    measurement.
+    """
+
+    def __init__(self, options=None):
+        self._options = options
+        self._schemas = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @property
+    def options(self):
+        if self._options is None:
+            self._options = {
+                **SCHEMA_CACHE_DEFAULT_OPTIONS,
+                **settings.INFLUXDB_SCHEMA_CACHE,
+            }
+        return self._options
+
+    @property
+    def is_enabled(self):
+        return self.options['ENABLED']
+
+    def get(self, measurement, using=None):
+        """
+        Returns the schema of `measurement`, loaded when missing. A stale
+        schema is returned while a refresh runs in the background.
+        """
+        if not self.is_enabled:
+            return None
+        key = (influxables.get_database_name(using), measurement)
+        schema = self._schemas.get(key)
+        if schema is None:
+            try:
+                return self.refresh(measurement, using)
+            except Exception:
+                logger.exception('Error while loading the schema of %s', measurement)
+                # an empty schema until the next refresh, after the TTL
+                with self._lock:
+                    return self._schemas.setdefault(key, MeasurementSchema(measurement))
+        if schema.is_stale(self.options['TTL']):
+            self._refresh_in_background(measurement, using, schema)
+        return schema
+
+    def get_cached(self, measurement, using=None):
+        """Returns the schema of `measurement` if loaded, without a query."""
+        if not self.is_enabled:
+            return None
+        return self._schemas.get((influxables.get_database_name(using), measurement))
+
+    def get_key_type(self, measurement, key, using=None):
+        """
+        `tag`, `field` or `None` when `key` is unknown. The schema is only
+        read from the cache, `None` is returned while a missing schema is
+        loaded in the background.
+        """
+        if not self.is_enabled:
+            return None
+        schema = self.get_cached(measurement, using)
+        if schema is None or schema.is_stale(self.options['TTL']):
+            self._refresh_in_background(measurement, using, schema)
+        return schema.get_key_type(key) if schema else None
+
+    def refresh(self, measurement, using=None):
+        from .db.admin import InfluxDBAdmin
+        admin = InfluxDBAdmin.using(using)
+        database_name = influxables.get_database_name(using)
+
+        field_keys = {}
+        for serie in admin.show_field_keys([measurement]):
+            for values in serie.values():
+                field_keys.update((v['fieldKey'], v['fieldType']) for v in values)
+        tag_keys = set()
+        for serie in admin.show_tag_keys([measurement]):
+            for values in serie.values():
+                tag_keys.update(v['tagKey'] for v in values)
+        tag_values = {}
+        if self.options['TAG_VALUES']:
+            for tag_key in sorted(tag_keys):
+                for serie in admin.show_tag_values(tag_key, [measurement]):
+                    for values in serie.values():
+                        tag_values.setdefault(tag_key, set()).update(
+                            v['value'] for v in values
+                        )
+
+        schema = MeasurementSchema(measurement, field_keys, tag_keys, tag_values)
+        with self._lock:
+            self._schemas[(database_name, measurement)] = schema
+        return schema
+
+    def _refresh_in_background(self, measurement, using, schema):
+        key = (influxables.get_database_name(using), measurement)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.refresh(measurement, using)
+            except Exception:
+                logger.exception('Error while refreshing the schema of %s', measurement)
+                # the stale schema, or an empty one, is kept until the next
+                # attempt after the TTL
+                if schema is None:
+                    with self._lock:
+                        self._schemas.setdefault(key, MeasurementSchema(measurement))
+                else:
+                    schema.loaded_at = time.monotonic()
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        thread = threading.Thread(
+            target=refresh,
+            name='influxdb-schema-refresh',
+            daemon=True,
+        )
+        thread.start()
+
+    def invalidate(self, database_name=None, measurement=None):
+        with self._lock:
+            for key in list(self._schemas):
+                if database_name is not None and key[0] != database_name:
+                    continue
+                if measurement is not None and key[1] != measurement:
+                    continue
+                del self._schemas[key]
+
+    def observe_points(self, database_name, points):
+        """Invalidates the measurements of `points` having new keys."""
+        if not self._schemas:
+            return
+        if isinstance(points, str):
+            points = points.splitlines()
+        checked = set()
+        for point in points:
+            if not point or isinstance(point, str) and point.startswith('#'):
+                continue
+            measurement, tag_keys, field_keys = get_point_keys(point)
+            key = (database_name, measurement)
+            if key in checked:
+                continue
+            schema = self._schemas.get(key)
+            if schema is None:
+                checked.add(key)
+            elif not schema.has_keys(tag_keys, field_keys):
+                self.invalidate(database_name, measurement)
+                checked.add(key)
+
+    def clear(self):
+        with self._lock:
+            self._schemas.clear()
+
+
+schema_cache = SchemaCache()
+
+
+@receiver(points_written)
+def _invalidate_schemas(sender, database, points, **kwargs):
+    try:
+        schema_cache.observe_points(database, points)
+    except Exception:
+        logger.exception('Error while checking the keys of written points')
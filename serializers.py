@@ -1,10 +1,16 @@
+import csv
 import json
 import itertools
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
 from .fields import (
     BaseField, GenericField, IntegerField ,BooleanField, DateTimeField, FloatField,
     StringField, TagField, TimestampField, TimestampPrecision, SerializerMethodField
 )
 from .exceptions import InfluxDBInvalidResponseError
+from .instrumentation import QueryPhase, phase, profile_query
 from .response import InfluxDBResponse
 
 
@@ -18,6 +24,9 @@ class BaseSerializer:
     def convert(self):
         return self.response.raw
 
+    def stream(self):
+        yield self.convert()
+
 
 class JsonSerializer(BaseSerializer):
     def convert(self):
@@ -26,35 +35,55 @@ class JsonSerializer(BaseSerializer):
 
 class FormattedSerieSerializer(BaseSerializer):
     def convert(self):
-        formatted_series = []
-        series = self.response.series
-        for serie in series:
-            name = serie.name
-            columns = serie.columns
-            values = serie.values
-            if values is None:
-                values = [[None] * len(serie.columns)]
-            formatted_values = [dict(zip(columns, v)) for v in values]
-            formatted_series.append({name: formatted_values})
-        return formatted_series
+        return [
+            {name: list(formatted_values)}
+            for name, formatted_values in self.stream_series()
+        ]
+
+    def stream(self):
+        """Yields a ``(serie name, row dict)`` tuple per value."""
+        for name, formatted_values in self.stream_series():
+            for formatted_value in formatted_values:
+                yield name, formatted_value
+
+    def stream_series(self):
+        for serie in self.response.series:
+            yield serie.name, self._format_values(serie)
+
+    @staticmethod
+    def _format_values(serie):
+        columns = serie.columns
+        values = serie.values
+        if values is None:
+            values = [[None] * len(serie.columns)]
+        for v in values:
+            yield dict(zip(columns, v))
 
 
 class FlatFormattedSerieSerializer(FormattedSerieSerializer):
     def convert(self):
-        formatted_series = super().convert()
-        if len(formatted_series) == 1:
-            main_serie = formatted_series[0]
-            flat_main_serie = list(main_serie.values())[0]
-            return flat_main_serie
-        return []
+        return list(self._iter_rows())
+
+    def stream(self):
+        return self._iter_rows()
+
+    def _iter_rows(self):
+        series = self.response.series
+        if len(series) == 1:
+            yield from self._format_values(series[0])
 
 
 class FlatSimpleResultSerializer(BaseSerializer):
     def convert(self):
+        return list(self._iter_values())
+
+    def stream(self):
+        return self._iter_values()
+
+    def _iter_values(self):
         serie = self.response.main_serie
         values = serie.values if serie else []
-        flatten_serie = list(itertools.chain(*values))
-        return flatten_serie
+        return itertools.chain.from_iterable(values)
 
 
 class FlatSingleValueSerializer(FlatSimpleResultSerializer):
@@ -64,6 +93,9 @@ class FlatSingleValueSerializer(FlatSimpleResultSerializer):
             return simple_result[0]
         return None
 
+    def stream(self):
+        yield self.convert()
+
 
 class MeasurementPointSerializer(FlatFormattedSerieSerializer):
     def __init__(self, response, measurement):
@@ -88,6 +120,9 @@ class MeasurementPointSerializer(FlatFormattedSerieSerializer):
         points = [self.measurement(**ffs) for ffs in flat_formatted_series]
         return points
 
+    def stream(self):
+        yield from self.convert()
+
     def convert_to_seconds(self, attr_names, series):
         NANO_TO_SEC_RATIO = 1000 * 1000 * 1000
         for field in series:
@@ -102,17 +137,83 @@ class QuerySerializer:
 
     def _get_fields(self):
         try:
-            return list(self.query)[0]._fields
+            return next(iter(self.query))._fields
         except Exception as e:
             return []
 
     @property
     def data(self):
-        _data = []
-        _fields = self._get_fields()
-        for obj in self.query:
-            _obj_dict = dict()
-            for f in _fields:
-                _obj_dict.update({f: getattr(obj, f)})
-            _data.append(_obj_dict)
-        return _data
+        with profile_query(using=getattr(self.query, 'db', None)):
+            _fields = self._get_fields()
+            with phase(QueryPhase.SERIALIZE):
+                return [self._to_dict(obj, _fields) for obj in self.query]
+
+    def stream(self, chunk_size=None):
+        """
+        Yields a dict per object. With a `chunk_size` the query is streamed
+        by chunks through ``Query.iterator`` and never cached.
+        """
+        objects = self.query
+        if chunk_size is not None:
+            objects = self.query.iterator(chunk_size=chunk_size)
+        _fields = None
+        for obj in objects:
+            if _fields is None:
+                _fields = getattr(obj, '_fields', [])
+            yield self._to_dict(obj, _fields)
+
+    @staticmethod
+    def _to_dict(obj, fields):
+        return {f: getattr(obj, f) for f in fields}
+
+
+def stream_chunks(responses, serializer_class=FlatFormattedSerieSerializer, **kwargs):
+    """Chains the streamed rows of several responses, e.g. query chunks."""
+    for response in responses:
+        yield from serializer_class(response, **kwargs).stream()
+
+
+class _EchoBuffer:
+    def write(self, value):
+        return value
+
+
+def iter_json_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def iter_csv_lines(rows, fields=None):
+    """
+    Yields CSV lines from row dicts; the header is made of `fields` or of
+    the keys of the first row.
+    """
+    writer = csv.writer(_EchoBuffer())
+    if fields is not None:
+        yield writer.writerow(fields)
+    for row in rows:
+        if fields is None:
+            fields = list(row)
+            yield writer.writerow(fields)
+        yield writer.writerow([row.get(f) for f in fields])
+
+
+STREAMING_FORMATS = {
+    'jsonl': ('application/x-ndjson', iter_json_lines),
+    'csv': ('text/csv', iter_csv_lines),
+}
+
+
+def streaming_response(rows, format='jsonl', filename=None, **kwargs):
+    """
+    Builds a ``StreamingHttpResponse`` writing the rows as JSON lines or
+    CSV, so exports use constant memory.
+    """
+    content_type, iter_lines = STREAMING_FORMATS[format]
+    response = StreamingHttpResponse(
+        iter_lines(rows, **kwargs),
+        content_type=content_type,
+    )
+    if filename:
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
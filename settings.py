@@ -1,6 +1,18 @@
 from django.conf import settings
 
-INFLUXDB_URL = getattr(settings, 'INFLUXDB_URL')
-INFLUXDB_USER = getattr(settings, 'INFLUXDB_USER')
-INFLUXDB_PASSWORD = getattr(settings, 'INFLUXDB_PASSWORD')
-INFLUXDB_DATABASE = getattr(settings, 'INFLUXDB_DATABASE')
+INFLUXDB_URL = getattr(settings, 'INFLUXDB_URL', None)
+INFLUXDB_USER = getattr(settings, 'INFLUXDB_USER', None)
+INFLUXDB_PASSWORD = getattr(settings, 'INFLUXDB_PASSWORD', None)
+INFLUXDB_DATABASE = getattr(settings, 'INFLUXDB_DATABASE', None)
+INFLUXDB_DATABASES = getattr(settings, 'INFLUXDB_DATABASES', {})
+INFLUXDB_TIMEOUT = getattr(settings, 'INFLUXDB_TIMEOUT', None)
+INFLUXDB_CIRCUIT_BREAKER = getattr(settings, 'INFLUXDB_CIRCUIT_BREAKER', {})
+INFLUXDB_URLS = getattr(settings, 'INFLUXDB_URLS', None)
+INFLUXDB_CLUSTER = getattr(settings, 'INFLUXDB_CLUSTER', {})
+INFLUXDB_METRICS = getattr(settings, 'INFLUXDB_METRICS', {})
+INFLUXDB_RETENTION_POLICY = getattr(settings, 'INFLUXDB_RETENTION_POLICY', None)
+INFLUXDB_SCHEMA_CACHE = getattr(settings, 'INFLUXDB_SCHEMA_CACHE', {})
+INFLUXDB_CARDINALITY = getattr(settings, 'INFLUXDB_CARDINALITY', {})
+INFLUXDB_SLOW_QUERY_LOG = getattr(settings, 'INFLUXDB_SLOW_QUERY_LOG', {})
+INFLUXDB_QUERY_WATCHDOG = getattr(settings, 'INFLUXDB_QUERY_WATCHDOG', {})
+INFLUXDB_DIAGNOSTICS = getattr(settings, 'INFLUXDB_DIAGNOSTICS', {})
@@ -0,0 +1,323 @@
+"""
+Shard-aware deletion of old data.
+
+A ``DELETE`` rewrites every shard it touches and is far more expensive
+than dropping a shard, which removes its files at once. ``ShardPlanner``
+maps a time range to the shards of the database and plans a ``DROP
+SHARD`` for each shard it fully covers, and ``DELETE`` statements for the
+parts of the range in partially covered shards only. A shard holds every
+measurement of its time range, so the deletion of some measurements is
+always planned with ``DELETE``::
+
+    planner = ShardPlanner(using='default')
+    plan = planner.plan(end='now() - 90d')
+    print(plan.format())
+    planner.execute(plan)
+
+The shards of every retention policy are planned, as a ``DELETE`` applies
+to all of them. The sizes come from the ``shard`` statistics of ``SHOW
+STATS``, `None` when the server doesn't report them. Each node of an
+``INFLUXDB_URLS`` cluster numbers its shards, so their shards are listed
+and dropped node by node, while the ``DELETE`` statements are replicated.
+"""
+import logging
+
+from . import exceptions
+from .api import InfluxDBApi
+from .app import Influxable
+from .db.criteria import Field, TimeRange
+from .helpers.utils import parse_time_nanoseconds
+from .response import InfluxDBResponse
+from .serializers import FormattedSerieSerializer
+
+
+logger = logging.getLogger(__name__)
+
+
+class Shard:
+    def __init__(
+        self,
+        id,
+        database,
+        retention_policy,
+        shard_group,
+        start,
+        end,
+        expiry=None,
+        size=None,
+        base_url=None,
+    ):
+        self.id = id
+        self.database = database
+        self.retention_policy = retention_policy
+        self.shard_group = shard_group
+        # nanoseconds since the epoch
+        self.start = start
+        self.end = end
+        self.expiry = expiry
+        # bytes on disk
+        self.size = size
+        # node of a cluster holding the shard, `None` for a single server
+        self.base_url = base_url
+
+    def __repr__(self):
+        return '<Shard {} {}.{} [{}, {})>'.format(
+            self.id,
+            self.database,
+            self.retention_policy,
+            self.start,
+            self.end,
+        )
+
+    @property
+    def time_range(self):
+        return TimeRange(self.start, self.end)
+
+    def is_covered_by(self, time_range):
+        return (time_range.start is None or time_range.start <= self.start) and \
+            (time_range.end is None or time_range.end >= self.end)
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'database': self.database,
+            'retention_policy': self.retention_policy,
+            'shard_group': self.shard_group,
+            'start_time': self.time_range.start_datetime,
+            'end_time': self.time_range.end_datetime,
+            'size': self.size,
+            'base_url': self.base_url,
+        }
+
+
+def merge_time_ranges(time_ranges):
+    """Bounded `time_ranges` sorted, the overlapping or adjacent ones merged."""
+    merged = []
+    for time_range in sorted(time_ranges, key=lambda r: (r.start, r.end)):
+        if merged and time_range.start <= merged[-1].end:
+            merged[-1] = merged[-1].union(time_range)
+        else:
+            merged.append(time_range)
+    return merged
+
+
+class ShardPlan:
+    def __init__(self, database, time_range, measurements, drops, deletes):
+        self.database = database
+        self.time_range = time_range
+        self.measurements = measurements
+        # shards to drop
+        self.drops = drops
+        # `TimeRange`s to delete the points of, within partial shards
+        self.deletes = deletes
+
+    def __repr__(self):
+        return '<ShardPlan {} {} drops {} deletes>'.format(
+            self.database,
+            len(self.drops),
+            len(self.deletes),
+        )
+
+    @property
+    def is_empty(self):
+        return not self.drops and not self.deletes
+
+    @property
+    def reclaimed_bytes(self):
+        """Size of the dropped shards, `None` when unknown."""
+        sizes = [shard.size for shard in self.drops]
+        if None in sizes:
+            return None
+        return sum(sizes)
+
+    def get_delete_criteria(self):
+        """Time criteria of each ``DELETE``."""
+        time = Field('time')
+        return [[time >= r.start, time < r.end] for r in self.deletes]
+
+    def as_dict(self):
+        return {
+            'database': self.database,
+            'start_time': self.time_range.start_datetime,
+            'end_time': self.time_range.end_datetime,
+            'measurements': self.measurements,
+            'drops': [shard.as_dict() for shard in self.drops],
+            'deletes': [
+                {'start_time': r.start_datetime, 'end_time': r.end_datetime}
+                for r in self.deletes
+            ],
+            'reclaimed_bytes': self.reclaimed_bytes,
+        }
+
+    def format(self):
+        lines = ['{}: {} shards to drop, {} ranges to delete'.format(
+            self.database,
+            len(self.drops),
+            len(self.deletes),
+        )]
+        for shard in self.drops:
+            lines.append('  DROP SHARD {}{} ({}, {} to {}){}'.format(
+                shard.id,
+                '' if shard.base_url is None else ' on ' + shard.base_url,
+                shard.retention_policy,
+                shard.time_range.start_datetime.isoformat(),
+                shard.time_range.end_datetime.isoformat(),
+                '' if shard.size is None else ', {} bytes'.format(shard.size),
+            ))
+        for r in self.deletes:
+            lines.append('  DELETE {}from {} to {}'.format(
+                '' if not self.measurements else ', '.join(self.measurements) + ' ',
+                r.start_datetime.isoformat(),
+                r.end_datetime.isoformat(),
+            ))
+        reclaimed_bytes = self.reclaimed_bytes
+        if self.drops:
+            lines.append('Reclaimed: {} bytes'.format(
+                '?' if reclaimed_bytes is None else reclaimed_bytes,
+            ))
+        return '\n'.join(lines)
+
+
+class ShardPlanner:
+    def __init__(self, using=None):
+        from .db.admin import InfluxDBAdmin
+        self.using = using
+        self.admin = InfluxDBAdmin.using(using)
+
+    def get_node_requests(self):
+        """
+        Requests of the nodes of a cluster, `[None]` for a single server
+        queried through the admin.
+        """
+        request = Influxable.get_instance(self.using).connection.request
+        if not getattr(request, 'is_cluster', False):
+            return [None]
+        return [node.request for node in request.nodes]
+
+    def _execute_query(self, query, request=None):
+        if request is None:
+            return self.admin._execute_query(query)
+        response = InfluxDBResponse(
+            InfluxDBApi.execute_query(request, query, method='post'),
+        )
+        response.raise_if_error()
+        return response
+
+    def get_shards(self, request=None):
+        """
+        Shards of the database, of every retention policy, on the node of
+        `request` or the single server.
+        """
+        database = self.admin._get_database_name()
+        sizes = self.get_shard_sizes(request)
+        response = self._execute_query('SHOW SHARDS', request)
+        shards = []
+        for serie in FormattedSerieSerializer(response).convert():
+            for rows in serie.values():
+                for row in rows:
+                    if row['database'] != database:
+                        continue
+                    shards.append(Shard(
+                        row['id'],
+                        row['database'],
+                        row['retention_policy'],
+                        row['shard_group'],
+                        parse_time_nanoseconds(row['start_time']),
+                        parse_time_nanoseconds(row['end_time']),
+                        expiry=row.get('expiry_time'),
+                        size=sizes.get(row['id']),
+                        base_url=getattr(request, 'base_url', None),
+                    ))
+        return sorted(shards, key=lambda s: (s.start, s.id))
+
+    def get_shard_sizes(self, request=None):
+        """Size on disk by shard id, empty when ``SHOW STATS`` fails."""
+        try:
+            response = self._execute_query('SHOW STATS', request)
+        except Exception as err:
+            logger.warning('Sizes of the shards not available: %r', err)
+            return {}
+        sizes = {}
+        for serie in response.series:
+            if serie.name != 'shard' or 'diskBytes' not in serie.columns:
+                continue
+            index = serie.columns.index('diskBytes')
+            shard_id = int(serie.tags['id'])
+            sizes[shard_id] = sum(values[index] for values in serie.values)
+        return sizes
+
+    def plan(self, start=None, end=None, measurements=None, now=None):
+        """
+        Returns the ``ShardPlan`` deleting the points from `start`
+        included to `end` excluded, of `measurements` or of every
+        measurement. The bounds are nanoseconds, datetimes, date strings or
+        `now() - 1h` expressions, at least one is required.
+        """
+        if start is None and end is None:
+            msg = '`start` or `end` must be not null'
+            raise exceptions.InfluxDBError(msg)
+        time_range = TimeRange(
+            parse_time_nanoseconds(start, now) if start is not None else None,
+            parse_time_nanoseconds(end, now) if end is not None else None,
+        )
+        measurements = list(measurements) if measurements else None
+        drops = []
+        partial_ranges = []
+        shards = [
+            shard
+            for request in self.get_node_requests()
+            for shard in self.get_shards(request)
+        ]
+        for shard in shards:
+            overlap = shard.time_range.intersection(time_range)
+            if overlap.is_empty:
+                continue
+            if measurements is None and shard.is_covered_by(time_range):
+                drops.append(shard)
+            else:
+                partial_ranges.append(overlap)
+        return ShardPlan(
+            self.admin._get_database_name(),
+            time_range,
+            measurements,
+            drops,
+            merge_time_ranges(partial_ranges),
+        )
+
+    def execute(self, plan, **batch_options):
+        """
+        Drops the shards and runs the ``DELETE`` of `plan`, returns the
+        reclaimed size. See ``InfluxDBAdmin.execute_many`` for
+        `batch_options`.
+        """
+        requests = {
+            getattr(request, 'base_url', None): request
+            for request in self.get_node_requests()
+        }
+        for base_url, request in requests.items():
+            statements = [
+                self.admin._prepare_query('DROP SHARD {shard_id}', {'shard_id': shard.id})
+                for shard in plan.drops
+                if shard.base_url == base_url
+            ]
+            if not statements:
+                continue
+            if request is None:
+                self.admin.execute_many(statements, **batch_options)
+                continue
+            # the shard ids are local to the node, the statements must not
+            # be replicated to the other nodes
+            for batch in self.admin._get_batches(statements):
+                self._execute_query(';'.join(batch), request)
+        if plan.deletes:
+            self.admin.delete_many(
+                [(plan.measurements or [], c) for c in plan.get_delete_criteria()],
+                **batch_options,
+            )
+        logger.info(
+            'Dropped %s shards and deleted %s ranges of %s',
+            len(plan.drops),
+            len(plan.deletes),
+            plan.database,
+        )
+        return plan.reclaimed_bytes
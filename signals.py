@@ -0,0 +1,20 @@
+from django.dispatch import Signal
+
+# sent with `name`, `old_state` and `new_state` when a circuit breaker
+# changes state
+circuit_breaker_state_changed = Signal()
+
+# sent with `profile` (a QueryProfile) before a query is sent
+query_started = Signal()
+
+# sent with `profile` (a QueryProfile) once a query and the decoding of its
+# result are done
+query_finished = Signal()
+
+# sent with `database` and `points`, point dicts or line protocol strings,
+# once they are written
+points_written = Signal()
+
+# sent with `database`, `qid`, `query`, `duration` and `budget` (timedeltas)
+# when the watchdog kills a query running for too long
+query_killed = Signal()
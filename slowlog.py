@@ -0,0 +1,221 @@
+"""
+Log of the slow queries.
+
+Once enabled with the ``INFLUXDB_SLOW_QUERY_LOG`` setting, every query is
+timed and the ones slower than ``THRESHOLD`` seconds are kept with their
+InfluxQL in a ring buffer of the last ``MAX_ENTRIES`` entries. The plan of
+a ``SAMPLE_RATE`` share of the slow ``SELECT`` is captured with ``EXPLAIN
+ANALYZE`` in a background thread, which runs the query again. When
+``CACHE`` names a Django cache the entries are mirrored there, for the
+``influxdb_slow_queries`` management command to read them from another
+process::
+
+    INFLUXDB_SLOW_QUERY_LOG = {
+        'ENABLED': True,
+        'THRESHOLD': 1.0,
+        'MAX_ENTRIES': 100,
+        'SAMPLE_RATE': 0.1,
+        'CACHE': 'default',
+    }
+"""
+import collections
+import logging
+import queue
+import random
+import threading
+import uuid
+
+from . import settings
+from .signals import query_finished
+
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_LOG_DEFAULT_OPTIONS = {
+    'ENABLED': False,
+    'THRESHOLD': 1.0,
+    'MAX_ENTRIES': 100,
+    'SAMPLE_RATE': 0.1,
+    # slow queries waiting for their plan, the next ones are not explained
+    'EXPLAIN_QUEUE_SIZE': 10,
+    'CACHE': None,
+    'CACHE_KEY': 'influxdb_slow_queries',
+}
+
+
+class SlowQueryEntry:
+    def __init__(self, profile):
+        self.id = uuid.uuid4().hex
+        self.using = profile.using
+        self.query = profile.query
+        self.duration = profile.duration
+        self.started_at = profile.started_at
+        self.row_count = profile.row_count
+        self.phases = dict(profile.phases)
+        self.error = repr(profile.error) if profile.error else None
+        # lines of the `EXPLAIN ANALYZE` output, once captured
+        self.explain = None
+        self.explain_error = None
+
+    def __repr__(self):
+        return '<SlowQueryEntry {:.3f}s {}>'.format(self.duration, self.query)
+
+    @property
+    def is_select(self):
+        return self.query.lstrip().upper().startswith('SELECT')
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'using': self.using,
+            'query': self.query,
+            'duration': self.duration,
+            'started_at': self.started_at,
+            'row_count': self.row_count,
+            'phases': dict(self.phases),
+            'error': self.error,
+            'explain': self.explain,
+            'explain_error': self.explain_error,
+        }
+
+
+class SlowQueryLog:
+    def __init__(self, options=None):
+        self._options = options
+        self._entries = None
+        self._lock = threading.Lock()
+        self._explain_queue = None
+        self._explain_thread = None
+
+    @property
+    def options(self):
+        if self._options is None:
+            self._options = {
+                **SLOW_QUERY_LOG_DEFAULT_OPTIONS,
+                **settings.INFLUXDB_SLOW_QUERY_LOG,
+            }
+        return self._options
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = collections.deque(maxlen=self.options['MAX_ENTRIES'])
+        return self._entries
+
+    def enable(self):
+        """Times every query, see ``instrumentation.profile_query``."""
+        query_finished.connect(self._record_profile, dispatch_uid=id(self))
+
+    def disable(self):
+        query_finished.disconnect(self._record_profile, dispatch_uid=id(self))
+
+    def _record_profile(self, sender, profile, **kwargs):
+        try:
+            self.record(profile)
+        except Exception:
+            logger.exception('Error while recording a slow query')
+
+    def record(self, profile):
+        """Returns the entry of `profile` when its query was slow."""
+        if not profile.query or profile.duration is None:
+            return None
+        if profile.duration < self.options['THRESHOLD']:
+            return None
+        if profile.query.lstrip().upper().startswith('EXPLAIN'):
+            return None
+        entry = SlowQueryEntry(profile)
+        logger.warning('Slow query (%.3fs): %s', entry.duration, entry.query)
+        with self._lock:
+            self.entries.append(entry)
+        self._mirror(entry)
+        if entry.is_select and random.random() < self.options['SAMPLE_RATE']:
+            self._queue_explain(entry)
+        return entry
+
+    def get_entries(self, limit=None):
+        """Entries as dicts, the most recent first, from the cache if set."""
+        cache = self._get_cache()
+        if cache is not None:
+            entries = cache.get(self.options['CACHE_KEY']) or []
+        else:
+            with self._lock:
+                entries = [entry.as_dict() for entry in self.entries]
+        entries = sorted(entries, key=lambda e: e['started_at'], reverse=True)
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+        cache = self._get_cache()
+        if cache is not None:
+            cache.delete(self.options['CACHE_KEY'])
+
+    def _get_cache(self):
+        if not self.options['CACHE']:
+            return None
+        from django.core.cache import caches
+        return caches[self.options['CACHE']]
+
+    def _mirror(self, entry):
+        # the entries of every process share the cache key, the update is
+        # best effort
+        cache = self._get_cache()
+        if cache is None:
+            return
+        try:
+            with self._lock:
+                key = self.options['CACHE_KEY']
+                entries = [
+                    e for e in cache.get(key) or []
+                    if e['id'] != entry.id
+                ]
+                entries.append(entry.as_dict())
+                cache.set(key, entries[-self.options['MAX_ENTRIES']:], None)
+        except Exception:
+            logger.exception('Error while mirroring a slow query to the cache')
+
+    def _queue_explain(self, entry):
+        with self._lock:
+            if self._explain_thread is None:
+                self._explain_queue = queue.Queue(self.options['EXPLAIN_QUEUE_SIZE'])
+                self._explain_thread = threading.Thread(
+                    target=self._explain_forever,
+                    name='influxdb-slow-query-explain',
+                    daemon=True,
+                )
+                self._explain_thread.start()
+        try:
+            self._explain_queue.put_nowait(entry)
+        except queue.Full:
+            logger.debug('Slow query not explained, too many are waiting')
+
+    def _explain_forever(self):
+        while True:
+            entry = self._explain_queue.get()
+            try:
+                self.explain(entry)
+            finally:
+                self._explain_queue.task_done()
+
+    def explain(self, entry):
+        from .db.admin import InfluxDBAdmin
+        admin = InfluxDBAdmin.using(entry.using)
+        try:
+            rows = admin.explain(entry.query, analyze=True)
+        except Exception as err:
+            logger.warning('Error while explaining a slow query: %r', err)
+            entry.explain_error = repr(err)
+        else:
+            entry.explain = [
+                value
+                for row in rows
+                for value in row.values()
+            ]
+        self._mirror(entry)
+        return entry
+
+
+slow_query_log = SlowQueryLog()
+
+if slow_query_log.options['ENABLED']:
+    slow_query_log.enable()
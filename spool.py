@@ -0,0 +1,426 @@
+"""Append-only on-disk spool for points that could not be written."""
+import json
+import logging
+import os
+import threading
+import time
+
+from .exceptions import InfluxDBSpoolLockedError
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # not available on Windows, the spool is not locked there
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.lp'
+CHECKPOINT_FILE_NAME = 'checkpoint'
+LOCK_FILE_NAME = 'lock'
+HEADER_PREFIX = '#'
+
+
+class WriteSpool:
+    """
+    Stores batches of line protocol in numbered segment files.
+
+    Every batch is framed by a ``#{json header}`` comment line giving its
+    precision, database, retention policy and number of lines, so that a
+    segment is itself valid line protocol. The read position is kept in a
+    checkpoint file; fully replayed segments are deleted and the head
+    segment is rewritten by ``compact()``. A directory is used by one
+    process at a time, ``InfluxDBSpoolLockedError`` is raised when another
+    process holds its lock.
+
+    """
+
+    def __init__(
+        self,
+        directory,
+        segment_max_bytes=16 * 1024 * 1024,
+        max_bytes=1024 * 1024 * 1024,
+        fsync_every=100,
+    ):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_bytes = max_bytes
+        self.fsync_every = fsync_every
+
+        self._lock = threading.RLock()
+        self._active_file = None
+        self._pending_fsync = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = self._acquire_lock()
+        self._segments = self._load_segments()
+        self._checkpoint = self._load_checkpoint()
+        # segment ids keep increasing once the spool is emptied, the
+        # checkpoint may already point past the last segment
+        self._last_segment_id = max(
+            max(self._segments, default=0),
+            self._checkpoint[0] - 1,
+        )
+
+    @property
+    def size(self):
+        with self._lock:
+            return sum(self._segments.values())
+
+    def is_empty(self):
+        with self._lock:
+            if not self._segments:
+                return True
+            segment_id, offset = self._checkpoint
+            last_segment_id = max(self._segments)
+            return segment_id == last_segment_id and \
+                offset >= self._segments[last_segment_id]
+
+    def append(self, lines, precision=None, database=None,
+               retention_policy=None):
+        if not lines:
+            return False
+        header = json.dumps({
+            'count': len(lines),
+            'database': database,
+            'precision': precision,
+            'retention_policy': retention_policy,
+        }, sort_keys=True)
+        record = '{}{}\n{}\n'.format(HEADER_PREFIX, header, '\n'.join(lines))
+        record = record.encode('utf-8')
+
+        with self._lock:
+            if not self._reserve(len(record)):
+                logger.error(
+                    'Spool is full, dropping a batch of %s points',
+                    len(lines),
+                )
+                return False
+            active_file = self._get_active_file(len(record))
+            active_file.write(record)
+            active_file.flush()
+            self._segments[self._active_segment_id] += len(record)
+            self._pending_fsync += 1
+            if self._pending_fsync >= self.fsync_every:
+                self.sync()
+        return True
+
+    def sync(self):
+        with self._lock:
+            if self._active_file is not None:
+                os.fsync(self._active_file.fileno())
+            self._pending_fsync = 0
+
+    def read_batch(self, max_lines=5000):
+        """
+        Returns ``(options, lines, position)`` for the next records sharing
+        the same options, or ``None`` when the spool is drained. Pass
+        ``position`` to ``commit()`` once the lines are written.
+        """
+        with self._lock:
+            self._skip_consumed_segments()
+            segment_id, offset = self._checkpoint
+            if segment_id not in self._segments or \
+               offset >= self._segments[segment_id]:
+                return None
+
+            options = None
+            lines = []
+            path = self._get_segment_path(segment_id)
+            with open(path, 'rb') as segment_file:
+                segment_file.seek(offset)
+                while len(lines) < max_lines:
+                    header_line = segment_file.readline()
+                    if not header_line:
+                        break
+                    header = self._parse_header(header_line)
+                    if header is None:
+                        # a header truncated by a crash ends its segment
+                        logger.error(
+                            'Skipping truncated header in spool segment %s',
+                            segment_id,
+                        )
+                        offset = self._segments[segment_id]
+                        break
+                    count = header.pop('count')
+                    if options is not None and options != header:
+                        break
+                    if lines and len(lines) + count > max_lines:
+                        break
+                    record_lines = self._read_record_lines(segment_file, count)
+                    if record_lines is None:
+                        # a record truncated by a crash ends its segment
+                        logger.error(
+                            'Skipping truncated record in spool segment %s',
+                            segment_id,
+                        )
+                        offset = self._segments[segment_id]
+                        break
+                    options = header
+                    lines.extend(record_lines)
+                    offset = segment_file.tell()
+
+            if not lines:
+                if offset != self._checkpoint[1]:
+                    self.commit((segment_id, offset))
+                    return self.read_batch(max_lines)
+                return None
+            return options, lines, (segment_id, offset)
+
+    def commit(self, position):
+        with self._lock:
+            self._checkpoint = position
+            self._skip_consumed_segments()
+            self._save_checkpoint()
+
+    def compact(self):
+        """
+        Deletes replayed segments and rewrites the head segment without its
+        already replayed records.
+        """
+        with self._lock:
+            self._skip_consumed_segments()
+            segment_id, offset = self._checkpoint
+            if offset == 0 or segment_id not in self._segments:
+                return
+            if segment_id == self._active_segment_id:
+                # the next append opens a new segment
+                self.close()
+            if offset >= self._segments[segment_id]:
+                self._remove_segment(segment_id)
+                return
+
+            path = self._get_segment_path(segment_id)
+            tmp_path = path + '.tmp'
+            with open(path, 'rb') as segment_file, \
+                    open(tmp_path, 'wb') as tmp_file:
+                segment_file.seek(offset)
+                while True:
+                    chunk = segment_file.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    tmp_file.write(chunk)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, path)
+            self._segments[segment_id] -= offset
+            self._checkpoint = (segment_id, 0)
+            self._save_checkpoint()
+
+    def close(self):
+        with self._lock:
+            if self._active_file is not None:
+                self.sync()
+                self._active_file.close()
+                self._active_file = None
+
+    def _acquire_lock(self):
+        # released by the system when the process exits
+        lock_file = open(os.path.join(self.directory, LOCK_FILE_NAME), 'a')
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise InfluxDBSpoolLockedError(self.directory)
+        return lock_file
+
+    @property
+    def _active_segment_id(self):
+        return max(self._segments) if self._segments else None
+
+    def _get_active_file(self, record_size):
+        # a new segment is started after a restart or a compaction so that
+        # appends never follow a possibly truncated record
+        segment_id = self._active_segment_id
+        if self._active_file is None or \
+           self._segments[segment_id] + record_size > self.segment_max_bytes:
+            self._rotate()
+        return self._active_file
+
+    def _rotate(self):
+        if self._active_file is not None:
+            self.sync()
+            self._active_file.close()
+        segment_id = max(self._last_segment_id + 1, self._checkpoint[0])
+        self._last_segment_id = segment_id
+        self._segments[segment_id] = 0
+        path = self._get_segment_path(segment_id)
+        self._active_file = open(path, 'ab')
+        if self._checkpoint[0] not in self._segments:
+            self._checkpoint = (segment_id, 0)
+            self._save_checkpoint()
+
+    def _reserve(self, record_size):
+        # oldest segments are dropped first to keep the spool bounded
+        while sum(self._segments.values()) + record_size > self.max_bytes:
+            oldest_segment_id = min(self._segments, default=None)
+            if oldest_segment_id is None or \
+               oldest_segment_id == self._active_segment_id:
+                return False
+            logger.error(
+                'Spool exceeds %s bytes, dropping segment %s',
+                self.max_bytes,
+                oldest_segment_id,
+            )
+            self._remove_segment(oldest_segment_id)
+        return True
+
+    def _skip_consumed_segments(self):
+        segment_id, offset = self._checkpoint
+        while segment_id in self._segments and \
+                segment_id != self._active_segment_id and \
+                offset >= self._segments[segment_id]:
+            self._remove_segment(segment_id)
+            segment_id, offset = self._checkpoint
+
+    def _remove_segment(self, segment_id):
+        os.remove(self._get_segment_path(segment_id))
+        del self._segments[segment_id]
+        if self._checkpoint[0] == segment_id:
+            next_segment_ids = [s for s in self._segments if s > segment_id]
+            next_segment_id = min(next_segment_ids, default=segment_id + 1)
+            self._checkpoint = (next_segment_id, 0)
+            self._save_checkpoint()
+
+    def _get_segment_path(self, segment_id):
+        file_name = '{:020d}{}'.format(segment_id, SEGMENT_SUFFIX)
+        return os.path.join(self.directory, file_name)
+
+    def _load_segments(self):
+        segments = {}
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(SEGMENT_SUFFIX):
+                continue
+            segment_id = int(file_name[:-len(SEGMENT_SUFFIX)])
+            path = os.path.join(self.directory, file_name)
+            segments[segment_id] = os.path.getsize(path)
+        return segments
+
+    def _load_checkpoint(self):
+        path = os.path.join(self.directory, CHECKPOINT_FILE_NAME)
+        first_segment_id = min(self._segments, default=1)
+        try:
+            with open(path) as checkpoint_file:
+                segment_id, offset = checkpoint_file.read().split()
+            checkpoint = (int(segment_id), int(offset))
+        except (OSError, ValueError):
+            return (first_segment_id, 0)
+        if checkpoint[0] < first_segment_id:
+            return (first_segment_id, 0)
+        return checkpoint
+
+    def _save_checkpoint(self):
+        path = os.path.join(self.directory, CHECKPOINT_FILE_NAME)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as checkpoint_file:
+            checkpoint_file.write('{} {}'.format(*self._checkpoint))
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_record_lines(segment_file, count):
+        record_lines = []
+        for _ in range(count):
+            line = segment_file.readline()
+            if not line.endswith(b'\n'):
+                return None
+            record_lines.append(line[:-1].decode('utf-8'))
+        return record_lines
+
+    @staticmethod
+    def _parse_header(header_line):
+        """Returns the header of a record, `None` when it is truncated."""
+        if not header_line.endswith(b'\n'):
+            return None
+        try:
+            header_line = header_line.decode('utf-8').strip()
+            header = json.loads(header_line[len(HEADER_PREFIX):])
+        except ValueError:
+            return None
+        if not isinstance(header, dict) or 'count' not in header:
+            return None
+        return header
+
+
+class SpoolReplayer(threading.Thread):
+    """
+    Drains a ``WriteSpool`` in the background.
+
+    ``write_func(lines, **options)`` writes a batch and
+    ``health_check()`` returns whether the server can take writes; the
+    replay is throttled to ``rate`` points per second. A batch failing
+    with an error for which ``is_retryable(error)`` is false is dropped,
+    so that it doesn't block the batches after it.
+
+    """
+
+    def __init__(
+        self,
+        spool,
+        write_func,
+        health_check=None,
+        is_retryable=None,
+        rate=5000,
+        batch_size=5000,
+        interval=5,
+    ):
+        super().__init__(name='influxdb-spool-replayer', daemon=True)
+        self.spool = spool
+        self.write_func = write_func
+        self.health_check = health_check
+        self.is_retryable = is_retryable
+        self.rate = rate
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                replayed = self.replay_once()
+            except Exception:
+                logger.exception('Error while replaying spooled points')
+                replayed = 0
+            if not replayed:
+                self._stop_event.wait(self.interval)
+
+    def replay_once(self):
+        if self.spool.is_empty():
+            return 0
+        if self.health_check is not None and not self.health_check():
+            return 0
+
+        batch = self.spool.read_batch(self.batch_size)
+        if batch is None:
+            return 0
+        options, lines, position = batch
+
+        start = time.monotonic()
+        try:
+            self.write_func(lines, **options)
+        except Exception as err:
+            if self.is_retryable is None or self.is_retryable(err):
+                raise
+            # the server keeps the valid points of a rejected batch
+            logger.error(
+                'Dropping %s spooled points rejected by the server: %r',
+                len(lines),
+                err,
+            )
+        else:
+            logger.info('Replayed %s spooled points', len(lines))
+        self.spool.commit(position)
+
+        if self.rate:
+            delay = len(lines) / self.rate - (time.monotonic() - start)
+            if delay > 0:
+                self._stop_event.wait(delay)
+        if self.spool.is_empty():
+            self.spool.compact()
+        return len(lines)
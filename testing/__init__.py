@@ -0,0 +1,6 @@
+from .server import FakeInfluxDBServer
+
+
+__all__ = [
+    'FakeInfluxDBServer',
+]
@@ -0,0 +1,1349 @@
+"""
+Parser and executor for the subset of InfluxQL answered by the fake server.
+
+Supported statements :
+
+- ``SELECT`` with raw fields, ``*`` or the ``COUNT``, ``SUM``, ``MEAN``,
+  ``MIN``, ``MAX``, ``FIRST``, ``LAST``, ``SPREAD``, ``MEDIAN``, ``STDDEV``
+  and ``DISTINCT`` functions, a ``WHERE`` condition (time ranges, tags and
+  fields comparisons, regexes), ``GROUP BY`` tags and ``time()``,
+  ``fill()``, ``ORDER BY time``, ``LIMIT``, ``OFFSET`` and subqueries
+- ``SHOW DATABASES``, ``MEASUREMENTS``, ``FIELD KEYS``, ``TAG KEYS``,
+  ``TAG VALUES``, ``SERIES``, ``RETENTION POLICIES``, ``QUERIES``,
+  ``STATS``, ``SHARDS`` and ``SHARD GROUPS``, the ``MEASUREMENT``,
+  ``SERIES`` and ``TAG VALUES`` cardinalities
+- ``EXPLAIN [ANALYZE]`` of a ``SELECT``, with a made up plan
+- ``CREATE DATABASE``, ``DROP DATABASE``, ``DROP MEASUREMENT``,
+  ``DROP SERIES``, ``DROP SHARD``, ``DELETE`` and ``KILL QUERY``
+
+The points are split in shards of the ``autogen`` retention policy, one
+per week starting on Monday like the default shard groups of InfluxDB.
+
+Other statements modifying the server are accepted and ignored, other
+read statements return an error.
+
+Differences from InfluxDB, to keep in mind when a test passes against the
+fake server only:
+
+- there is a single ``autogen`` retention policy, the ``CREATE``,
+  ``ALTER`` and ``DROP RETENTION POLICY`` statements and the retention
+  policy of a query or a write are ignored, nothing expires
+- the shard groups always last a week, whatever the duration of the
+  retention policy, and the sizes of ``SHOW STATS`` are estimated from
+  the number of points
+- the plan of ``EXPLAIN`` doesn't reflect the storage engine
+- ``SHOW QUERIES`` formats the keywords, identifiers and literals of the
+  queries like InfluxDB, see ``format_query``, but doesn't reorder or
+  complete their clauses
+- ``SELECT *`` returns the keys of the selected points only, not every
+  field of the measurement
+- the errors are reported with the messages of InfluxDB for the common
+  cases only, the parser accepts some statements InfluxDB rejects
+- continuous queries, ``SELECT ... INTO``, users and privileges are not
+  implemented
+
+The tests of this module are in ``tests/test_influxql.py``.
+"""
+import itertools
+import re
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+from .storage import PRECISION_TO_NS, Point
+
+
+class InfluxQLError(Exception):
+    pass
+
+
+DURATION_UNITS = {
+    'ns': 1,
+    'u': 1000,
+    'µ': 1000,
+    'ms': 1000 * 1000,
+    's': 1000 * 1000 * 1000,
+    'm': 60 * 1000 * 1000 * 1000,
+    'h': 60 * 60 * 1000 * 1000 * 1000,
+    'd': 24 * 60 * 60 * 1000 * 1000 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000 * 1000 * 1000,
+}
+
+TOKEN_REGEX = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<quoted_ident>"(?:[^"\\]|\\.)*")
+  | (?P<string>'(?:[^'\\]|\\.)*')
+  | (?P<duration>(?:\d+(?:ns|ms|u|µ|s|m|h|d|w))+(?![\w]))
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<op>=~|!~|!=|<>|<=|>=|::|[=<>+\-*/(),;.])
+  | (?P<ident>[^\W\d]\w*)
+''', re.VERBOSE)
+
+IDENT_REGEX = re.compile(r'^[^\W\d]\w*$')
+
+RFC3339_REGEX = re.compile(
+    r'^(\d{4}-\d{2}-\d{2})'
+    r'(?:[T ](\d{2}:\d{2}:\d{2})(?:\.(\d{1,9}))?)?'
+    r'(Z|[+-]\d{2}:\d{2})?$'
+)
+
+AGGREGATE_FUNCTIONS = {
+    'COUNT', 'SUM', 'MEAN', 'MIN', 'MAX', 'FIRST', 'LAST', 'SPREAD',
+    'MEDIAN', 'STDDEV', 'DISTINCT',
+}
+MAX_SELECT_BUCKETS = 100000
+SHARD_GROUP_DURATION = DURATION_UNITS['w']
+# the shard groups of a week start on Monday, 1970-01-05
+SHARD_GROUP_OFFSET = 4 * DURATION_UNITS['d']
+# estimated size of a point on disk
+SHARD_POINT_BYTES = 64
+IGNORED_STATEMENTS = ('CREATE', 'DROP', 'ALTER', 'GRANT', 'REVOKE', 'SET')
+KEYWORDS = {
+    'ALL', 'ALTER', 'ANALYZE', 'AND', 'ANY', 'AS', 'ASC', 'BEGIN', 'BY',
+    'CARDINALITY', 'CONTINUOUS', 'CREATE', 'DATABASE', 'DATABASES',
+    'DEFAULT', 'DELETE', 'DESC', 'DESTINATIONS', 'DIAGNOSTICS', 'DISTINCT',
+    'DROP', 'DURATION', 'END', 'EVERY', 'EXACT', 'EXPLAIN', 'FIELD', 'FOR',
+    'FROM', 'GRANT', 'GRANTS', 'GROUP', 'GROUPS', 'IN', 'INF', 'INSERT',
+    'INTO', 'KEY', 'KEYS', 'KILL', 'LIMIT', 'MEASUREMENT', 'MEASUREMENTS',
+    'NAME', 'OFFSET', 'ON', 'OR', 'ORDER', 'PASSWORD', 'POLICIES', 'POLICY',
+    'PRIVILEGES', 'QUERIES', 'QUERY', 'READ', 'REPLICATION', 'RESAMPLE',
+    'RETENTION', 'REVOKE', 'SELECT', 'SERIES', 'SET', 'SHARD', 'SHARDS',
+    'SLIMIT', 'SOFFSET', 'STATS', 'SUBSCRIPTION', 'SUBSCRIPTIONS', 'TAG',
+    'TO', 'USER', 'USERS', 'VALUES', 'WHERE', 'WITH', 'WRITE',
+}
+
+
+class Token:
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value
+
+    def is_keyword(self, *keywords):
+        return self.kind == 'ident' and self.value.upper() in keywords
+
+    def is_op(self, *ops):
+        return self.kind == 'op' and self.value in ops
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.kind, self.value)
+
+
+def _unquote(string):
+    return re.sub(r'\\(.)', r'\1', string[1:-1])
+
+
+def _scan(query):
+    """Yields the `(kind, text)` of the lexemes of `query`."""
+    position = 0
+    previous = None
+    while position < len(query):
+        if previous is not None and previous[0] == 'op' and previous[1] in ('=~', '!~'):
+            # a regex literal always follows the regex operators
+            match = re.compile(r'\s*/((?:[^/\\]|\\.)*)/').match(query, position)
+            if match is None:
+                raise InfluxQLError('found {}, expected regex'.format(query[position:]))
+            previous = ('regex', match.group(1))
+            position = match.end()
+            yield previous
+            continue
+        match = TOKEN_REGEX.match(query, position)
+        if match is None:
+            raise InfluxQLError('found {}, unexpected character'.format(query[position]))
+        kind = match.lastgroup
+        position = match.end()
+        if kind == 'ws':
+            continue
+        previous = (kind, match.group(kind))
+        yield previous
+
+
+def tokenize(query):
+    tokens = []
+    for kind, value in _scan(query):
+        if kind == 'regex':
+            tokens.append(Token('regex', re.compile(value.replace('\\/', '/'))))
+        elif kind == 'quoted_ident':
+            tokens.append(Token('ident', _unquote(value)))
+        elif kind == 'string':
+            tokens.append(Token('string', _unquote(value)))
+        elif kind == 'duration':
+            tokens.append(Token('duration', _parse_duration(value)))
+        elif kind == 'number':
+            is_float = any(c in value for c in '.eE')
+            tokens.append(Token('number', float(value) if is_float else int(value)))
+        else:
+            tokens.append(Token(kind, value))
+    tokens.append(Token('eof', None))
+    return tokens
+
+
+def _parse_duration(literal):
+    return sum(
+        int(number) * DURATION_UNITS[unit]
+        for number, unit in re.findall(r'(\d+)(ns|ms|u|µ|s|m|h|d|w)', literal)
+    )
+
+
+def format_duration_literal(nanoseconds):
+    """Formats a duration in its largest exact unit, like InfluxQL."""
+    if not nanoseconds:
+        return '0s'
+    for unit in ('w', 'd', 'h', 'm', 's', 'ms', 'u'):
+        if not nanoseconds % DURATION_UNITS[unit]:
+            return '{}{}'.format(nanoseconds // DURATION_UNITS[unit], unit)
+    return '{}ns'.format(nanoseconds)
+
+
+def _quote_ident(ident):
+    if IDENT_REGEX.match(ident) and ident.upper() not in KEYWORDS:
+        return ident
+    return '"{}"'.format(ident.replace('"', '\\"'))
+
+
+def format_query(query):
+    """
+    Formats `query` like InfluxDB lists it in ``SHOW QUERIES``: keywords
+    in upper case, identifiers quoted only when needed, floats with 3
+    decimals and durations in their largest exact unit, `7d` as `1w`. The
+    clauses are kept in their order.
+    """
+    lexemes = list(_scan(query))
+    parts = []
+    for index, (kind, value) in enumerate(lexemes):
+        next_value = lexemes[index + 1][1] if index + 1 < len(lexemes) else None
+        if kind == 'ident' and value.upper() in KEYWORDS:
+            text = value.upper()
+        elif kind == 'ident' and next_value == '(':
+            # function names are lower case
+            text = value.lower()
+        elif kind in ('ident', 'quoted_ident'):
+            text = _quote_ident(value if kind == 'ident' else _unquote(value))
+        elif kind == 'duration':
+            text = format_duration_literal(_parse_duration(value))
+        elif kind == 'number' and any(c in value for c in '.eE'):
+            text = '{:.3f}'.format(float(value))
+        elif kind == 'regex':
+            text = '/{}/'.format(value)
+        elif value == '<>':
+            text = '!='
+        else:
+            text = value
+        previous = parts[-1] if parts else None
+        is_call = value == '(' and index and lexemes[index - 1][0] in ('ident', 'quoted_ident') \
+            and previous.upper() not in KEYWORDS
+        if previous is not None and previous not in ('(', '.') and \
+           text not in (')', ',', ';', '.') and not is_call:
+            parts.append(' ')
+        parts.append(text)
+    return ''.join(parts)
+
+
+def parse_time(value):
+    """Converts an integer or a RFC3339 string to nanoseconds."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        match = RFC3339_REGEX.match(value.strip())
+        if match:
+            date, clock, fraction, offset = match.groups()
+            moment = datetime.strptime(
+                '{}T{}'.format(date, clock or '00:00:00'),
+                '%Y-%m-%dT%H:%M:%S',
+            ).replace(tzinfo=timezone.utc)
+            seconds = int(moment.timestamp())
+            if offset and offset != 'Z':
+                sign = 1 if offset[0] == '+' else -1
+                hours, minutes = offset[1:].split(':')
+                seconds -= sign * (int(hours) * 3600 + int(minutes) * 60)
+            nanoseconds = int((fraction or '0').ljust(9, '0'))
+            return seconds * 10 ** 9 + nanoseconds
+    raise InfluxQLError('invalid time {!r}'.format(value))
+
+
+def format_time(timestamp, epoch=None):
+    if epoch:
+        return timestamp // PRECISION_TO_NS.get(epoch, 1)
+    seconds, nanoseconds = divmod(timestamp, 10 ** 9)
+    moment = datetime.fromtimestamp(seconds, timezone.utc)
+    formatted = moment.strftime('%Y-%m-%dT%H:%M:%S')
+    if nanoseconds:
+        formatted += '.' + '{:09d}'.format(nanoseconds).rstrip('0')
+    return formatted + 'Z'
+
+
+class Call:
+    def __init__(self, name, args):
+        self.name = name.upper()
+        self.args = args
+
+
+class SelectStatement:
+    def __init__(self):
+        self.fields = []
+        self.sources = []
+        self.condition = None
+        self.group_by_tags = []
+        self.group_by_all_tags = False
+        self.group_by_interval = None
+        self.group_by_offset = 0
+        self.fill = 'null'
+        self.descending = False
+        self.limit = None
+        self.offset = 0
+
+
+class Statement:
+    """Any statement other than ``SELECT``, described by its keywords."""
+
+    def __init__(self, kind, **options):
+        self.kind = kind
+        self.options = options
+
+
+class Parser:
+    def __init__(self, query):
+        self.tokens = tokenize(query)
+        self.position = 0
+
+    def peek(self, offset=0):
+        return self.tokens[min(self.position + offset, len(self.tokens) - 1)]
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def accept_keyword(self, *keywords):
+        if self.peek().is_keyword(*keywords):
+            return self.next()
+        return None
+
+    def accept_op(self, *ops):
+        if self.peek().is_op(*ops):
+            return self.next()
+        return None
+
+    def expect_keyword(self, *keywords):
+        token = self.accept_keyword(*keywords)
+        if token is None:
+            self._raise_unexpected(', '.join(keywords))
+        return token
+
+    def expect_op(self, op):
+        token = self.accept_op(op)
+        if token is None:
+            self._raise_unexpected(op)
+        return token
+
+    def expect_kind(self, kind):
+        if self.peek().kind != kind:
+            self._raise_unexpected(kind)
+        return self.next()
+
+    def _raise_unexpected(self, expected):
+        token = self.peek()
+        found = 'EOF' if token.kind == 'eof' else token.value
+        raise InfluxQLError('found {}, expected {}'.format(found, expected))
+
+    def parse(self):
+        statements = []
+        while self.peek().kind != 'eof':
+            if self.accept_op(';'):
+                continue
+            statements.append(self.parse_statement())
+            if self.peek().kind != 'eof':
+                self.expect_op(';')
+        if not statements:
+            raise InfluxQLError('empty query')
+        return statements
+
+    def parse_statement(self):
+        token = self.peek()
+        if token.is_keyword('SELECT'):
+            return self.parse_select()
+        if token.is_keyword('SHOW'):
+            return self.parse_show()
+        if token.is_keyword('EXPLAIN'):
+            self.next()
+            analyze = bool(self.accept_keyword('ANALYZE'))
+            return Statement('EXPLAIN', select=self.parse_select(), analyze=analyze)
+        if token.is_keyword('DELETE'):
+            self.next()
+            options = {'sources': [], 'condition': None}
+            if self.accept_keyword('FROM'):
+                options['sources'] = self.parse_sources()
+            if self.accept_keyword('WHERE'):
+                options['condition'] = self.parse_expression()
+            return Statement('DELETE', **options)
+        if token.is_keyword('KILL') and self.peek(1).is_keyword('QUERY'):
+            self.position += 2
+            qid = self.expect_kind('number').value
+            self._skip_statement()
+            return Statement('KILL QUERY', qid=qid)
+        if token.is_keyword('DROP') and self.peek(1).is_keyword('SHARD'):
+            self.position += 2
+            shard_id = self.expect_kind('number').value
+            self._skip_statement()
+            return Statement('DROP SHARD', shard_id=shard_id)
+        if token.is_keyword('CREATE') and self.peek(1).is_keyword('DATABASE') or \
+                token.is_keyword('DROP') and \
+                self.peek(1).is_keyword('DATABASE', 'MEASUREMENT', 'SERIES'):
+            action = self.next().value.upper()
+            target = self.next().value.upper()
+            if target == 'SERIES':
+                options = {'sources': [], 'condition': None}
+                if self.accept_keyword('FROM'):
+                    options['sources'] = self.parse_sources()
+                if self.accept_keyword('WHERE'):
+                    options['condition'] = self.parse_expression()
+                return Statement('DROP SERIES', **options)
+            name = self.expect_kind('ident').value
+            self._skip_statement()
+            return Statement('{} {}'.format(action, target), name=name)
+        if not token.is_keyword(*IGNORED_STATEMENTS):
+            self._raise_unexpected('SELECT, DELETE, SHOW, EXPLAIN, CREATE, DROP, GRANT, REVOKE, ALTER, SET or KILL')
+        kind = ' '.join(self._skip_statement()).upper()
+        return Statement('UNSUPPORTED', statement=kind)
+
+    def _skip_statement(self):
+        words = []
+        while self.peek().kind != 'eof' and not self.peek().is_op(';'):
+            token = self.next()
+            if token.kind == 'ident' and len(words) < 3:
+                words.append(token.value)
+        return words
+
+    def parse_show(self):
+        self.expect_keyword('SHOW')
+        token = self.next()
+        kind = token.value.upper() if token.kind == 'ident' else ''
+        if kind in ('FIELD', 'TAG', 'RETENTION', 'SHARD'):
+            second = self.next()
+            kind = '{} {}'.format(kind, (second.value or '').upper())
+        options = {'database': None, 'sources': [], 'condition': None}
+        exact = self.accept_keyword('EXACT')
+        if self.accept_keyword('CARDINALITY'):
+            kind += ' CARDINALITY'
+            options['exact'] = exact
+        if kind not in (
+            'DATABASES', 'MEASUREMENTS', 'FIELD KEYS', 'TAG KEYS',
+            'TAG VALUES', 'SERIES', 'RETENTION POLICIES', 'QUERIES', 'STATS',
+            'SHARDS', 'SHARD GROUPS',
+            'MEASUREMENT CARDINALITY', 'SERIES CARDINALITY',
+            'TAG VALUES CARDINALITY',
+        ):
+            self._skip_statement()
+            return Statement('SHOW UNSUPPORTED', statement=kind)
+        while self.peek().kind != 'eof' and not self.peek().is_op(';'):
+            if self.accept_keyword('ON'):
+                options['database'] = self.expect_kind('ident').value
+            elif self.accept_keyword('FROM'):
+                options['sources'] = self.parse_sources()
+            elif self.accept_keyword('WITH'):
+                options.update(self.parse_with_clause())
+            elif self.accept_keyword('WHERE'):
+                options['condition'] = self.parse_expression()
+            elif self.accept_keyword('LIMIT'):
+                options['limit'] = self.expect_kind('number').value
+            elif self.accept_keyword('OFFSET'):
+                options['offset'] = self.expect_kind('number').value
+            else:
+                self._raise_unexpected('ON, FROM, WITH, WHERE, LIMIT or OFFSET')
+        return Statement('SHOW ' + kind, **options)
+
+    def parse_with_clause(self):
+        key = self.expect_kind('ident').value.upper()
+        if key not in ('KEY', 'MEASUREMENT'):
+            self._raise_unexpected('KEY or MEASUREMENT')
+        if self.accept_op('=~'):
+            regex = self.expect_kind('regex').value
+            matcher = regex.search
+        elif self.accept_keyword('IN'):
+            self.expect_op('(')
+            names = [self.expect_kind('ident').value]
+            while self.accept_op(','):
+                names.append(self.expect_kind('ident').value)
+            self.expect_op(')')
+            matcher = names.__contains__
+        else:
+            self.expect_op('=')
+            name = self.expect_kind('ident').value
+            matcher = name.__eq__
+        return {'with_{}'.format(key.lower()): matcher}
+
+    def parse_select(self):
+        statement = SelectStatement()
+        self.expect_keyword('SELECT')
+        statement.fields.append(self.parse_field())
+        while self.accept_op(','):
+            statement.fields.append(self.parse_field())
+        self.expect_keyword('FROM')
+        statement.sources = self.parse_sources(allow_subqueries=True)
+        if self.accept_keyword('WHERE'):
+            statement.condition = self.parse_expression()
+        if self.accept_keyword('GROUP'):
+            self.expect_keyword('BY')
+            self.parse_group_by(statement)
+            while self.accept_op(','):
+                self.parse_group_by(statement)
+        if self.accept_keyword('FILL'):
+            self.expect_op('(')
+            token = self.next()
+            if token.kind == 'number':
+                statement.fill = token.value
+            elif token.is_op('-'):
+                statement.fill = -self.expect_kind('number').value
+            elif token.is_keyword('NULL', 'NONE', 'PREVIOUS', 'LINEAR'):
+                statement.fill = token.value.lower()
+            else:
+                raise InfluxQLError('fill() must be null, none, previous, linear or a number')
+            self.expect_op(')')
+        if self.accept_keyword('ORDER'):
+            self.expect_keyword('BY')
+            token = self.expect_kind('ident')
+            if token.value.lower() != 'time':
+                raise InfluxQLError('only ORDER BY time supported at this time')
+            if self.accept_keyword('DESC'):
+                statement.descending = True
+            else:
+                self.accept_keyword('ASC')
+        while self.peek().is_keyword('LIMIT', 'OFFSET', 'SLIMIT', 'SOFFSET', 'TZ'):
+            keyword = self.next().value.upper()
+            if keyword == 'TZ':
+                self.expect_op('(')
+                self.expect_kind('string')
+                self.expect_op(')')
+                continue
+            value = self.expect_kind('number').value
+            if keyword == 'LIMIT':
+                statement.limit = value
+            elif keyword == 'OFFSET':
+                statement.offset = value
+        return statement
+
+    def parse_group_by(self, statement):
+        if self.accept_op('*'):
+            statement.group_by_all_tags = True
+            return
+        token = self.expect_kind('ident')
+        if token.value.lower() == 'time' and self.accept_op('('):
+            statement.group_by_interval = self.expect_kind('duration').value
+            if self.accept_op(','):
+                sign = -1 if self.accept_op('-') else 1
+                statement.group_by_offset = sign * self.expect_kind('duration').value
+            self.expect_op(')')
+        else:
+            statement.group_by_tags.append(token.value)
+
+    def parse_field(self):
+        if self.accept_op('*'):
+            expression = ('wildcard',)
+        else:
+            expression = self.parse_field_expression()
+        alias = None
+        if self.accept_keyword('AS'):
+            alias = self.expect_kind('ident').value
+        return expression, alias
+
+    def parse_field_expression(self):
+        token = self.expect_kind('ident')
+        if self.accept_op('('):
+            args = []
+            if not self.peek().is_op(')'):
+                args.append(self.parse_call_argument())
+                while self.accept_op(','):
+                    args.append(self.parse_call_argument())
+            self.expect_op(')')
+            return ('call', Call(token.value, args))
+        return self.parse_ident_type(('ident', token.value, None))
+
+    def parse_call_argument(self):
+        if self.accept_op('*'):
+            return ('wildcard',)
+        if self.peek().kind in ('number', 'duration', 'string'):
+            return ('literal', self.next().value)
+        return self.parse_field_expression()
+
+    def parse_ident_type(self, node):
+        if self.accept_op('::'):
+            key_type = self.expect_kind('ident').value.lower()
+            return ('ident', node[1], key_type)
+        return node
+
+    def parse_sources(self, allow_subqueries=False):
+        sources = [self.parse_source(allow_subqueries)]
+        while self.accept_op(','):
+            sources.append(self.parse_source(allow_subqueries))
+        return sources
+
+    def parse_source(self, allow_subqueries=False):
+        if self.accept_op('('):
+            if not allow_subqueries:
+                raise InfluxQLError('subqueries are only supported in SELECT')
+            subquery = self.parse_select()
+            self.expect_op(')')
+            return None, subquery
+        parts = [self.expect_kind('ident').value]
+        while self.accept_op('.'):
+            if self.peek().is_op('.'):
+                parts.append('')
+                continue
+            parts.append(self.expect_kind('ident').value)
+        database = parts[0] if len(parts) == 3 else None
+        return database, parts[-1]
+
+    def parse_expression(self):
+        left = self.parse_and()
+        nodes = [left]
+        while self.accept_keyword('OR'):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_comparison()]
+        while self.accept_keyword('AND'):
+            nodes.append(self.parse_comparison())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def parse_comparison(self):
+        left = self.parse_additive()
+        token = self.peek()
+        if token.is_op('=', '!=', '<>', '<', '<=', '>', '>=', '=~', '!~'):
+            operator = self.next().value
+            right = self.parse_additive()
+            return ('compare', operator, left, right)
+        return left
+
+    def parse_additive(self):
+        node = self.parse_operand()
+        while self.peek().is_op('+', '-'):
+            operator = self.next().value
+            node = ('arithmetic', operator, node, self.parse_operand())
+        return node
+
+    def parse_operand(self):
+        if self.accept_op('('):
+            node = self.parse_expression()
+            self.expect_op(')')
+            return node
+        if self.accept_op('-'):
+            token = self.next()
+            if token.kind not in ('number', 'duration'):
+                raise InfluxQLError('found {}, expected number'.format(token.value))
+            return ('literal', -token.value)
+        token = self.next()
+        if token.kind in ('number', 'duration', 'string'):
+            return ('literal', token.value)
+        if token.kind == 'regex':
+            return ('regex', token.value)
+        if token.is_keyword('TRUE', 'FALSE'):
+            return ('literal', token.value.upper() == 'TRUE')
+        if token.kind == 'ident':
+            if token.value.lower() == 'now' and self.accept_op('('):
+                self.expect_op(')')
+                return ('now',)
+            return self.parse_ident_type(('ident', token.value, None))
+        self.position -= 1
+        self._raise_unexpected('identifier, string, number or bool')
+
+
+def parse(query):
+    return Parser(query).parse()
+
+
+def _evaluate(node, point, now):
+    kind = node[0]
+    if kind == 'literal':
+        return node[1]
+    if kind == 'ident':
+        return point.get(node[1], node[2]) if point is not None else None
+    if kind == 'now':
+        return now
+    if kind == 'regex':
+        return node[1]
+    if kind == 'arithmetic':
+        left = _evaluate(node[2], point, now)
+        right = _evaluate(node[3], point, now)
+        if isinstance(left, str):
+            left = parse_time(left)
+        if left is None or right is None:
+            return None
+        return left + right if node[1] == '+' else left - right
+    if kind == 'compare':
+        return _compare(node, point, now)
+    if kind == 'and':
+        return all(_evaluate(child, point, now) for child in node[1])
+    if kind == 'or':
+        return any(_evaluate(child, point, now) for child in node[1])
+    raise InfluxQLError('unsupported expression {}'.format(kind))
+
+
+def _is_time(node):
+    return node[0] == 'ident' and node[1].lower() == 'time'
+
+
+def _compare(node, point, now):
+    operator, left_node, right_node = node[1], node[2], node[3]
+    left = _evaluate(left_node, point, now)
+    right = _evaluate(right_node, point, now)
+    if _is_time(left_node) and isinstance(right, str):
+        right = parse_time(right)
+    elif _is_time(right_node) and isinstance(left, str):
+        left = parse_time(left)
+
+    if operator in ('=~', '!~'):
+        matched = isinstance(left, str) and bool(right.search(left))
+        return matched if operator == '=~' else not matched
+    if left is None or right is None:
+        return False
+    if isinstance(left, str) != isinstance(right, str):
+        return False
+    if operator == '=':
+        return left == right
+    if operator in ('!=', '<>'):
+        return left != right
+    if isinstance(left, bool) or isinstance(right, bool):
+        return False
+    if operator == '<':
+        return left < right
+    if operator == '<=':
+        return left <= right
+    if operator == '>':
+        return left > right
+    return left >= right
+
+
+def get_time_range(condition, now):
+    """Returns the ``[start, end)`` bounds of the time conditions."""
+    start, end = None, None
+    if condition is None:
+        return start, end
+    nodes = condition[1] if condition[0] == 'and' else [condition]
+    for node in nodes:
+        if node[0] != 'compare':
+            continue
+        operator, left, right = node[1], node[2], node[3]
+        if _is_time(right):
+            left, right = right, left
+            operator = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}.get(operator, operator)
+        if not _is_time(left):
+            continue
+        value = _evaluate(right, None, now)
+        if value is None:
+            continue
+        value = parse_time(value)
+        if operator in ('>', '>='):
+            value += 1 if operator == '>' else 0
+            start = value if start is None else max(start, value)
+        elif operator in ('<', '<='):
+            value += 1 if operator == '<=' else 0
+            end = value if end is None else min(end, value)
+        elif operator == '=':
+            start, end = value, value + 1
+    return start, end
+
+
+def _get_field_type(value):
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'float'
+    return 'string'
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _aggregate(name, values):
+    if name == 'COUNT':
+        return len(values)
+    if name == 'DISTINCT':
+        return list(dict.fromkeys(values))
+    if not values:
+        return None
+    if name == 'FIRST':
+        return values[0]
+    if name == 'LAST':
+        return values[-1]
+    numbers = [v for v in values if _is_number(v)]
+    if not numbers:
+        return None
+    if name == 'SUM':
+        return sum(numbers)
+    if name == 'MEAN':
+        return sum(numbers) / len(numbers)
+    if name == 'MIN':
+        return min(numbers)
+    if name == 'MAX':
+        return max(numbers)
+    if name == 'SPREAD':
+        return max(numbers) - min(numbers)
+    if name == 'MEDIAN':
+        return statistics.median(numbers)
+    if name == 'STDDEV':
+        return statistics.stdev(numbers) if len(numbers) > 1 else None
+    raise InfluxQLError('unsupported call: {}'.format(name.lower()))
+
+
+class QueryEngine:
+    """Runs parsed statements against an ``InMemoryStorage``."""
+
+    def __init__(self, storage, running_queries=None, get_stats=None):
+        self.storage = storage
+        self.running_queries = running_queries
+        self.get_stats = get_stats
+        # shard id by `(database, start)`, stable while the shard exists
+        self._shard_ids = {}
+        self._shard_id_counter = itertools.count(1)
+        self._shard_lock = threading.Lock()
+
+    def execute(self, query, database=None, now=None):
+        """
+        Returns the results of every statement, their `time` columns in
+        nanoseconds. Raises ``InfluxQLError`` when the query can't be
+        parsed.
+        """
+        now = now or time.time_ns()
+        results = []
+        failed = False
+        for statement_id, statement in enumerate(parse(query)):
+            result = {'statement_id': statement_id}
+            if failed:
+                # like InfluxDB, the statements after an error are skipped
+                result['error'] = 'not executed'
+                results.append(result)
+                continue
+            try:
+                series = self.execute_statement(statement, database, now)
+            except InfluxQLError as err:
+                result['error'] = str(err)
+                failed = True
+            else:
+                if series:
+                    result['series'] = series
+            results.append(result)
+        return results
+
+    def execute_statement(self, statement, database, now):
+        if isinstance(statement, SelectStatement):
+            return self.execute_select(statement, database, now)
+        options = dict(statement.options)
+        database = options.pop('database', None) or database
+        method_name = 'execute_{}'.format(statement.kind.lower().replace(' ', '_'))
+        method = getattr(self, method_name, self.execute_unsupported)
+        return method(database=database, now=now, **options)
+
+    def execute_unsupported(self, **kwargs):
+        # statements modifying the server are accepted and ignored
+        return []
+
+    def execute_show_unsupported(self, statement, **kwargs):
+        raise InfluxQLError('SHOW {} is not supported by the fake server'.format(statement))
+
+    def execute_create_database(self, name, **kwargs):
+        self.storage.create_database(name)
+        return []
+
+    def execute_drop_database(self, name, **kwargs):
+        self.storage.drop_database(name)
+        return []
+
+    def execute_drop_measurement(self, name, database, **kwargs):
+        self._require_database(database)
+        self.storage.drop_measurement(database, name)
+        return []
+
+    def execute_delete(self, sources, condition, database, now, **kwargs):
+        self._require_database(database)
+        measurements = [name for _, name in sources] or [None]
+        for measurement in measurements:
+            self.storage.delete(
+                database,
+                measurement,
+                lambda p: condition is None or _evaluate(condition, p, now),
+            )
+        return []
+
+    execute_drop_series = execute_delete
+
+    def execute_drop_shard(self, shard_id, **kwargs):
+        for shard in self.get_shards():
+            if shard['id'] == shard_id:
+                break
+        else:
+            # like InfluxDB, dropping a missing shard is not an error
+            return []
+        self.storage.delete(
+            shard['database'],
+            None,
+            lambda p: shard['start'] <= p.time < shard['end'],
+        )
+        return []
+
+    def get_shards(self):
+        """Shards of the stored points, ordered by database and time."""
+        counts = {}
+        for database in self.storage.get_database_names():
+            for measurement in self.storage.get_measurements(database):
+                for point in self.storage.get_points(database, measurement):
+                    start = (point.time - SHARD_GROUP_OFFSET) // SHARD_GROUP_DURATION * \
+                        SHARD_GROUP_DURATION + SHARD_GROUP_OFFSET
+                    counts[(database, start)] = counts.get((database, start), 0) + 1
+        shards = []
+        with self._shard_lock:
+            for key in sorted(counts):
+                if key not in self._shard_ids:
+                    self._shard_ids[key] = next(self._shard_id_counter)
+                database, start = key
+                shards.append({
+                    'id': self._shard_ids[key],
+                    'database': database,
+                    'retention_policy': 'autogen',
+                    'start': start,
+                    'end': start + SHARD_GROUP_DURATION,
+                    'points': counts[key],
+                })
+        return shards
+
+    def execute_select(self, statement, database, now):
+        aggregates = [f for f, _ in statement.fields if f[0] == 'call']
+        if aggregates and len(aggregates) != len(statement.fields):
+            raise InfluxQLError('mixing aggregate and non-aggregate queries is not supported')
+        start, end = get_time_range(statement.condition, now)
+        if statement.group_by_interval and start is None:
+            raise InfluxQLError('aggregate functions with GROUP BY time require a WHERE time clause')
+
+        series = []
+        sources = [
+            source_points
+            for source_database, source in statement.sources
+            for source_points in self._get_source_points(source_database or database, source, now)
+        ]
+        for measurement, source_points in sources:
+            points = [
+                p for p in source_points
+                if statement.condition is None or
+                _evaluate(statement.condition, p, now)
+            ]
+            for tags, group in self._group_points(statement, points):
+                if aggregates:
+                    serie = self._aggregate_serie(statement, group, start, end, now)
+                else:
+                    serie = self._raw_serie(statement, group)
+                if serie is None:
+                    continue
+                serie = dict(name=measurement, **serie)
+                if tags is not None:
+                    serie['tags'] = tags
+                series.append(serie)
+        return series
+
+    def _get_source_points(self, database, source, now):
+        if not isinstance(source, SelectStatement):
+            self._require_database(database)
+            return [(source, self.storage.get_points(database, source))]
+
+        # the rows of a subquery are the points read by the outer query
+        points_by_name = {}
+        for serie in self.execute_select(source, database, now):
+            columns = serie['columns'][1:]
+            tags = serie.get('tags') or {}
+            points = points_by_name.setdefault(serie['name'], [])
+            for row in serie['values']:
+                fields = {
+                    column: value
+                    for column, value in zip(columns, row[1:])
+                    if value is not None
+                }
+                points.append(Point(row[0], tags, fields))
+        return [
+            (name, sorted(points, key=lambda p: p.time))
+            for name, points in sorted(points_by_name.items())
+        ]
+
+    def _group_points(self, statement, points):
+        if not statement.group_by_tags and not statement.group_by_all_tags:
+            return [(None, points)] if points else []
+        tag_keys = statement.group_by_tags
+        if statement.group_by_all_tags:
+            tag_keys = sorted({k for p in points for k in p.tags})
+        groups = {}
+        for point in points:
+            key = tuple(point.tags.get(k, '') for k in tag_keys)
+            groups.setdefault(key, []).append(point)
+        return [
+            (dict(zip(tag_keys, key)), groups[key])
+            for key in sorted(groups)
+        ]
+
+    def _raw_serie(self, statement, points):
+        columns = []
+        for expression, alias in statement.fields:
+            if expression[0] == 'wildcard':
+                keys = {k for p in points for k in p.fields}
+                if not statement.group_by_tags and not statement.group_by_all_tags:
+                    keys |= {k for p in points for k in p.tags}
+                columns.extend((('ident', k, None), k) for k in sorted(keys))
+            elif expression[1].lower() != 'time':
+                columns.append((expression, alias or expression[1]))
+
+        values = []
+        for point in points:
+            row = [point.get(e[1], e[2]) for e, _ in columns]
+            if any(value is not None for value in row):
+                values.append([point.time] + row)
+        if statement.descending:
+            values.reverse()
+        values = self._slice(statement, values)
+        if not values:
+            return None
+        return {'columns': ['time'] + [name for _, name in columns], 'values': values}
+
+    def _aggregate_serie(self, statement, points, start, end, now):
+        if not points:
+            return None
+        calls = []
+        for expression, alias in statement.fields:
+            call = expression[1]
+            calls.extend(self._expand_call(call, alias, points))
+
+        interval = statement.group_by_interval
+        if interval:
+            offset = statement.group_by_offset
+            end = end if end is not None else now
+            first = (start - offset) // interval * interval + offset
+            buckets = {}
+            if statement.fill != 'none':
+                if (end - first) // interval > MAX_SELECT_BUCKETS:
+                    raise InfluxQLError('max-select-buckets limit exceeded')
+                buckets = {t: [] for t in range(first, end, interval)}
+            for point in points:
+                bucket = (point.time - offset) // interval * interval + offset
+                buckets.setdefault(bucket, []).append(point)
+        else:
+            buckets = {start or 0: points}
+
+        values = []
+        previous = None
+        for bucket_time in sorted(buckets):
+            bucket_points = buckets[bucket_time]
+            row = [self._call(name, arg, bucket_points) for name, arg, _ in calls]
+            if any(isinstance(v, list) for v in row):
+                # DISTINCT returns one row per value
+                distinct_values = next(v for v in row if isinstance(v, list))
+                values.extend([bucket_time, v] for v in distinct_values)
+                continue
+            if not bucket_points:
+                if statement.fill == 'none':
+                    continue
+                if statement.fill == 'previous' and previous is not None:
+                    row = list(previous)
+                elif _is_number(statement.fill):
+                    row = [statement.fill] * len(calls)
+            previous = row
+            values.append([bucket_time] + row)
+
+        if statement.descending:
+            values.reverse()
+        values = self._slice(statement, values)
+        if not values:
+            return None
+        return {'columns': ['time'] + [alias for _, _, alias in calls], 'values': values}
+
+    def _expand_call(self, call, alias, points):
+        name = call.name
+        if name not in AGGREGATE_FUNCTIONS:
+            raise InfluxQLError('unsupported call: {}'.format(name.lower()))
+        if len(call.args) != 1:
+            raise InfluxQLError('invalid number of arguments for {}'.format(name.lower()))
+        arg = call.args[0]
+        if arg[0] == 'wildcard':
+            keys = sorted({k for p in points for k in p.fields})
+            return [
+                (name, ('ident', k, 'field'), alias or '{}_{}'.format(name.lower(), k))
+                for k in keys
+            ]
+        return [(name, arg, alias or name.lower())]
+
+    def _call(self, name, arg, points):
+        if arg[0] == 'call':
+            inner = arg[1]
+            if inner.name != 'DISTINCT' or name != 'COUNT':
+                raise InfluxQLError('unsupported nested call {}'.format(inner.name.lower()))
+            values = [p.get(inner.args[0][1], inner.args[0][2]) for p in points]
+            return len({v for v in values if v is not None})
+        values = [point.get(arg[1], arg[2]) for point in points]
+        return _aggregate(name, [v for v in values if v is not None])
+
+    @staticmethod
+    def _slice(statement, values):
+        if statement.offset:
+            values = values[statement.offset:]
+        if statement.limit is not None:
+            values = values[:statement.limit]
+        return values
+
+    def _require_database(self, database):
+        if not database:
+            raise InfluxQLError('database name required')
+        if database not in self.storage.get_database_names():
+            raise InfluxQLError('database not found: {}'.format(database))
+
+    def _get_measurements(self, database, sources):
+        if sources:
+            return [name for _, name in sources]
+        return self.storage.get_measurements(database)
+
+    @staticmethod
+    def _show_slice(values, limit=None, offset=None, **kwargs):
+        if offset:
+            values = values[offset:]
+        if limit is not None:
+            values = values[:limit]
+        return values
+
+    def execute_show_databases(self, **kwargs):
+        values = [[name] for name in self.storage.get_database_names()]
+        return [{'name': 'databases', 'columns': ['name'], 'values': values}]
+
+    def execute_show_retention_policies(self, database, **kwargs):
+        self._require_database(database)
+        return [{
+            'columns': ['name', 'duration', 'shardGroupDuration', 'replicaN', 'default'],
+            'values': [['autogen', '0s', '168h0m0s', 1, True]],
+        }]
+
+    def execute_show_measurements(self, database, condition, now, **kwargs):
+        self._require_database(database)
+        matcher = kwargs.get('with_measurement')
+        values = []
+        for name in self.storage.get_measurements(database):
+            if matcher is not None and not matcher(name):
+                continue
+            points = self.storage.get_points(database, name)
+            if condition is not None and \
+                    not any(_evaluate(condition, p, now) for p in points):
+                continue
+            values.append([name])
+        values = self._show_slice(values, **kwargs)
+        if not values:
+            return []
+        return [{'name': 'measurements', 'columns': ['name'], 'values': values}]
+
+    def execute_show_field_keys(self, database, sources, **kwargs):
+        self._require_database(database)
+        series = []
+        for name in self._get_measurements(database, sources):
+            field_types = {}
+            for point in self.storage.get_points(database, name):
+                for key, value in point.fields.items():
+                    field_types.setdefault(key, _get_field_type(value))
+            if field_types:
+                series.append({
+                    'name': name,
+                    'columns': ['fieldKey', 'fieldType'],
+                    'values': [[k, field_types[k]] for k in sorted(field_types)],
+                })
+        return series
+
+    def execute_show_tag_keys(self, database, sources, **kwargs):
+        self._require_database(database)
+        series = []
+        for name in self._get_measurements(database, sources):
+            keys = {k for p in self.storage.get_points(database, name) for k in p.tags}
+            if keys:
+                series.append({
+                    'name': name,
+                    'columns': ['tagKey'],
+                    'values': [[k] for k in sorted(keys)],
+                })
+        return series
+
+    def execute_show_tag_values(self, database, sources, condition, now, **kwargs):
+        self._require_database(database)
+        matcher = kwargs.get('with_key')
+        if matcher is None:
+            raise InfluxQLError('found EOF, expected WITH')
+        series = []
+        for name in self._get_measurements(database, sources):
+            pairs = set()
+            for point in self.storage.get_points(database, name):
+                if condition is not None and not _evaluate(condition, point, now):
+                    continue
+                pairs.update((k, v) for k, v in point.tags.items() if matcher(k))
+            values = self._show_slice([list(p) for p in sorted(pairs)], **kwargs)
+            if values:
+                series.append({'name': name, 'columns': ['key', 'value'], 'values': values})
+        return series
+
+    def execute_show_series(self, database, sources, condition, now, **kwargs):
+        self._require_database(database)
+        keys = set()
+        for name in self._get_measurements(database, sources):
+            for point in self.storage.get_points(database, name):
+                if condition is not None and not _evaluate(condition, point, now):
+                    continue
+                tags = ''.join(
+                    ',{}={}'.format(k, point.tags[k]) for k in sorted(point.tags)
+                )
+                keys.add(name + tags)
+        values = self._show_slice([[k] for k in sorted(keys)], **kwargs)
+        if not values:
+            return []
+        return [{'columns': ['key'], 'values': values}]
+
+    @staticmethod
+    def _cardinality_series(counts, exact, sources, condition):
+        # like InfluxDB, FROM and WHERE clauses make the count exact
+        if exact or sources or condition is not None:
+            return [
+                {'name': name, 'columns': ['count'], 'values': [[count]]}
+                for name, count in counts.items()
+            ]
+        return [{
+            'columns': ['cardinality estimation'],
+            'values': [[sum(counts.values())]],
+        }]
+
+    def execute_show_measurement_cardinality(self, database, exact, **kwargs):
+        self._require_database(database)
+        count = len(self.storage.get_measurements(database))
+        column = 'count' if exact else 'cardinality estimation'
+        return [{'columns': [column], 'values': [[count]]}]
+
+    def execute_show_series_cardinality(self, database, sources, condition, now, exact, **kwargs):
+        self._require_database(database)
+        counts = {}
+        for name in self._get_measurements(database, sources):
+            keys = {
+                tuple(sorted(p.tags.items()))
+                for p in self.storage.get_points(database, name)
+                if condition is None or _evaluate(condition, p, now)
+            }
+            if keys:
+                counts[name] = len(keys)
+        return self._cardinality_series(counts, exact, sources, condition)
+
+    def execute_show_tag_values_cardinality(
+        self, database, sources, condition, now, exact, **kwargs
+    ):
+        self._require_database(database)
+        matcher = kwargs.get('with_key')
+        if matcher is None:
+            raise InfluxQLError('found EOF, expected WITH')
+        counts = {}
+        for name in self._get_measurements(database, sources):
+            pairs = {
+                (k, v)
+                for p in self.storage.get_points(database, name)
+                if condition is None or _evaluate(condition, p, now)
+                for k, v in p.tags.items() if matcher(k)
+            }
+            if pairs:
+                counts[name] = len(pairs)
+        return self._cardinality_series(counts, exact, sources, condition)
+
+    def execute_show_stats(self, **kwargs):
+        if self.get_stats is None:
+            raise InfluxQLError('SHOW STATS is not supported by the fake server')
+        series = [
+            {'name': name, 'tags': {}, 'columns': list(values), 'values': [list(values.values())]}
+            for name, values in self.get_stats().items()
+        ]
+        for shard in self.get_shards():
+            series.append({
+                'name': 'shard',
+                'tags': {
+                    'id': str(shard['id']),
+                    'database': shard['database'],
+                    'retentionPolicy': shard['retention_policy'],
+                    'engine': 'tsm1',
+                },
+                'columns': ['diskBytes', 'writePointsOk'],
+                'values': [[shard['points'] * SHARD_POINT_BYTES, shard['points']]],
+            })
+        return series
+
+    def execute_show_shards(self, **kwargs):
+        shards_by_database = {}
+        for shard in self.get_shards():
+            shards_by_database.setdefault(shard['database'], []).append([
+                shard['id'],
+                shard['database'],
+                shard['retention_policy'],
+                shard['id'],
+                format_time(shard['start']),
+                format_time(shard['end']),
+                format_time(shard['end']),
+                '',
+            ])
+        return [
+            {
+                'name': database,
+                'columns': [
+                    'id', 'database', 'retention_policy', 'shard_group',
+                    'start_time', 'end_time', 'expiry_time', 'owners',
+                ],
+                'values': values,
+            }
+            for database, values in shards_by_database.items()
+        ]
+
+    def execute_show_shard_groups(self, **kwargs):
+        return [{
+            'name': 'shard groups',
+            'columns': [
+                'id', 'database', 'retention_policy',
+                'start_time', 'end_time', 'expiry_time',
+            ],
+            'values': [
+                [
+                    shard['id'],
+                    shard['database'],
+                    shard['retention_policy'],
+                    format_time(shard['start']),
+                    format_time(shard['end']),
+                    format_time(shard['end']),
+                ]
+                for shard in self.get_shards()
+            ],
+        }]
+
+    def execute_show_queries(self, **kwargs):
+        if self.running_queries is None:
+            raise InfluxQLError('SHOW QUERIES is not supported by the fake server')
+        return [{
+            'columns': ['qid', 'query', 'database', 'duration', 'status'],
+            'values': self.running_queries.get_rows(),
+        }]
+
+    def execute_explain(self, select, analyze, database, now, **kwargs):
+        sources = ', '.join(
+            name if isinstance(name, str) else '(subquery)'
+            for _, name in select.sources
+        )
+        plan = [
+            'EXPRESSION: <fields of {}>'.format(sources),
+            'NUMBER OF SHARDS: 1',
+        ]
+        if analyze:
+            start = time.perf_counter()
+            series = self.execute_select(select, database, now)
+            elapsed = time.perf_counter() - start
+            plan += [
+                'execution_time: {:.3f}ms'.format(elapsed * 1000),
+                'total_series: {}'.format(len(series)),
+                'total_rows: {}'.format(sum(len(s['values']) for s in series)),
+            ]
+        return [{'columns': ['QUERY PLAN'], 'values': [[line] for line in plan]}]
+
+    def execute_kill_query(self, qid, **kwargs):
+        if self.running_queries is None or not self.running_queries.kill(qid):
+            raise InfluxQLError('no such query id')
+        return []
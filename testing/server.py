@@ -0,0 +1,426 @@
+import collections
+import csv
+import io
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from .influxql import InfluxQLError, QueryEngine, format_query, format_time
+from .storage import InMemoryStorage, LineProtocolError
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def format_duration(nanoseconds):
+    """Formats a duration like InfluxDB does, `1m2.5s` or `120ms`."""
+    if nanoseconds < 1000:
+        return '{}ns'.format(nanoseconds)
+    if nanoseconds < 1000 ** 2:
+        return '{:g}µs'.format(nanoseconds / 1000)
+    if nanoseconds < 1000 ** 3:
+        return '{:g}ms'.format(nanoseconds / 1000 ** 2)
+    minutes, seconds = divmod(nanoseconds / 1000 ** 3, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    formatted = '{:.9f}'.format(seconds).rstrip('0').rstrip('.') + 's'
+    if hours:
+        return '{}h{}m{}'.format(hours, minutes, formatted)
+    if minutes:
+        return '{}m{}'.format(minutes, formatted)
+    return formatted
+
+
+class RunningQueries:
+    """Queries being answered, listed by ``SHOW QUERIES``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._qids = itertools.count(1)
+
+    def add(self, query, database):
+        try:
+            # listed as InfluxDB formats the statements
+            query = format_query(query)
+        except InfluxQLError:
+            pass
+        killed = threading.Event()
+        with self._lock:
+            qid = next(self._qids)
+            self._queries[qid] = (query, database, time.monotonic_ns(), killed)
+        return qid, killed
+
+    def remove(self, qid):
+        with self._lock:
+            self._queries.pop(qid, None)
+
+    def kill(self, qid):
+        with self._lock:
+            running_query = self._queries.get(qid)
+        if running_query is None:
+            return False
+        running_query[3].set()
+        return True
+
+    def get_rows(self):
+        now = time.monotonic_ns()
+        with self._lock:
+            return [
+                [qid, query, database or '', format_duration(now - started), 'running']
+                for qid, (query, database, started, _) in sorted(self._queries.items())
+            ]
+
+
+class FakeInfluxDBServer:
+    """
+    In-process InfluxDB stand-in for load and integration tests.
+
+    Written line protocol is kept in memory and queried with a subset of
+    InfluxQL (see ``testing.influxql``). ``latency`` delays every request,
+    it's a number of seconds, a ``(min, max)`` range or a callable taking
+    the request path; ``fail_requests`` answers the next requests with an
+    error status to exercise retries and circuit breakers. Its request
+    counters are reported by ``SHOW STATS`` and ``/debug/vars``.
+
+    The server runs in daemon threads::
+
+        with FakeInfluxDBServer(databases=['db']) as server:
+            settings.INFLUXDB_URL = server.url
+            ...
+
+    """
+
+    def __init__(
+        self,
+        host='127.0.0.1',
+        port=0,
+        databases=(),
+        latency=0,
+        auto_create_databases=True,
+        version='1.8.10',
+    ):
+        self.host = host
+        self.version = version
+        self.latency = latency
+        self.auto_create_databases = auto_create_databases
+        self.storage = InMemoryStorage()
+        self.running_queries = RunningQueries()
+        self.engine = QueryEngine(
+            self.storage,
+            running_queries=self.running_queries,
+            get_stats=self.get_stats,
+        )
+        self.request_counts = collections.Counter()
+        # nanoseconds spent answering the requests, by path
+        self.request_durations = collections.Counter()
+        self.written_lines = 0
+        self._lock = threading.Lock()
+        self._failure = None
+        self._databases = list(databases)
+        for database in self._databases:
+            self.storage.create_database(database)
+
+        self._server = ThreadingHTTPServer((host, port), self._get_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name='fake-influxdb-server',
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def reset(self):
+        """Removes every point and database but the initial ones."""
+        self.storage.reset()
+        for database in self._databases:
+            self.storage.create_database(database)
+        with self._lock:
+            self.request_counts.clear()
+            self.request_durations.clear()
+            self.written_lines = 0
+            self._failure = None
+
+    def set_latency(self, latency):
+        self.latency = latency
+
+    def fail_requests(self, status=503, count=None, paths=('/query', '/write')):
+        """
+        Answers the next `count` requests (all of them when `None`) on
+        `paths` with `status`.
+        """
+        with self._lock:
+            self._failure = {'status': status, 'count': count, 'paths': paths}
+
+    def recover(self):
+        with self._lock:
+            self._failure = None
+
+    def write_lines(self, lines, database='db', precision='ns'):
+        if isinstance(lines, str):
+            lines = lines.splitlines()
+        return self.storage.write(database, lines, precision=precision)
+
+    def query(self, query, database='db'):
+        return self.engine.execute(query, database)
+
+    def get_stats(self):
+        """
+        Statistics by module, named like InfluxDB ones. The counters are
+        real, the memory figures are estimated from the stored points.
+        """
+        memory_bytes = self.storage.count_points() * 64
+        with self._lock:
+            return {
+                'httpd': {
+                    'queryReq': self.request_counts['/query'],
+                    'queryReqDurationNs': self.request_durations['/query'],
+                    'writeReq': self.request_counts['/write'],
+                    'writeReqDurationNs': self.request_durations['/write'],
+                    'pointsWrittenOK': self.written_lines,
+                },
+                'write': {
+                    'pointReq': self.written_lines,
+                    'writeOk': self.request_counts['/write'],
+                },
+                'tsm1_cache': {'memBytes': memory_bytes},
+                'runtime': {
+                    'HeapAlloc': memory_bytes,
+                    'NumGoroutine': threading.active_count(),
+                },
+            }
+
+    def get_debug_vars(self):
+        stats = self.get_stats()
+        debug_vars = {
+            'cmdline': ['influxd'],
+            'memstats': {
+                'HeapAlloc': stats['runtime']['HeapAlloc'],
+                'Sys': stats['runtime']['HeapAlloc'],
+                'NumGC': 0,
+            },
+        }
+        for name, values in stats.items():
+            debug_vars[name] = {'name': name, 'tags': {}, 'values': values}
+        return debug_vars
+
+    def _get_latency(self, path):
+        latency = self.latency
+        if callable(latency):
+            latency = latency(path)
+        if isinstance(latency, (tuple, list)):
+            latency = random.uniform(*latency)
+        return latency or 0
+
+    def _get_failure_status(self, path):
+        with self._lock:
+            failure = self._failure
+            if failure is None or path not in failure['paths']:
+                return None
+            if failure['count'] is not None:
+                failure['count'] -= 1
+                if failure['count'] <= 0:
+                    self._failure = None
+            return failure['status']
+
+    def _handle_write(self, params, body):
+        database = params.get('db')
+        if not database:
+            return 400, {'error': 'database is required'}
+        if database not in self.storage.get_database_names():
+            if not self.auto_create_databases:
+                return 404, {'error': 'database not found: "{}"'.format(database)}
+        lines = body.decode('utf-8').splitlines()
+        try:
+            nb_lines = self.storage.write(database, lines, params.get('precision'))
+        except LineProtocolError as err:
+            return 400, {'error': 'unable to parse points: {}'.format(err)}
+        with self._lock:
+            self.written_lines += nb_lines
+        return 204, None
+
+    def _handle_query(self, params, latency):
+        query = params.get('q', '')
+        database = params.get('db')
+        qid, killed = self.running_queries.add(query, database)
+        try:
+            if killed.wait(latency):
+                return 200, [{'results': [{'statement_id': 0, 'error': 'query killed'}]}]
+            results = self.engine.execute(query, database)
+        except InfluxQLError as err:
+            return 400, [{'error': 'error parsing query: {}'.format(err)}]
+        finally:
+            self.running_queries.remove(qid)
+
+        epoch = params.get('epoch')
+        for result in results:
+            for serie in result.get('series', []):
+                if serie['columns'][:1] == ['time']:
+                    for row in serie['values']:
+                        row[0] = format_time(row[0], epoch)
+
+        if params.get('chunked', '').lower() != 'true':
+            return 200, [{'results': results}]
+        chunk_size = int(params.get('chunk_size') or DEFAULT_CHUNK_SIZE)
+        return 200, list(self._get_chunks(results, chunk_size))
+
+    @staticmethod
+    def _format_csv(documents):
+        # `name,tags,<columns>` rows, a header each time the columns change
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        header = None
+        pieces = []
+        for document in documents:
+            for result in document.get('results', []):
+                for serie in result.get('series', []):
+                    columns = ['name', 'tags'] + serie['columns']
+                    if columns != header:
+                        if header is not None:
+                            buffer.write('\n')
+                        writer.writerow(columns)
+                        header = columns
+                    tags = ','.join(
+                        '{}={}'.format(k, v)
+                        for k, v in sorted((serie.get('tags') or {}).items())
+                    )
+                    prefix = [serie.get('name', ''), tags]
+                    writer.writerows(prefix + row for row in serie['values'])
+            pieces.append(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+        return [p for p in pieces if p] or ['']
+
+    @staticmethod
+    def _get_chunks(results, chunk_size):
+        # one JSON document per chunk of values, like InfluxDB
+        for result in results:
+            series = result.get('series')
+            if not series:
+                yield {'results': [result]}
+                continue
+            for serie_index, serie in enumerate(series):
+                values = serie['values']
+                starts = range(0, len(values), chunk_size) or [0]
+                for start in starts:
+                    serie_chunk = dict(serie, values=values[start:start + chunk_size])
+                    is_last_chunk = start + chunk_size >= len(values)
+                    if not is_last_chunk:
+                        serie_chunk['partial'] = True
+                    chunk = {'statement_id': result['statement_id'], 'series': [serie_chunk]}
+                    if not is_last_chunk or serie_index < len(series) - 1:
+                        chunk['partial'] = True
+                    yield {'results': [chunk]}
+
+    def _get_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._handle()
+
+            def do_HEAD(self):
+                self._handle()
+
+            def do_POST(self):
+                self._handle()
+
+            def _handle(self):
+                url = urlparse(self.path)
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/x-www-form-urlencoded'):
+                    params.update(parse_qsl(body.decode('utf-8')))
+
+                path = url.path
+                with server._lock:
+                    server.request_counts[path] += 1
+                start = time.perf_counter_ns()
+                try:
+                    self._dispatch(path, params, body)
+                finally:
+                    with server._lock:
+                        server.request_durations[path] += time.perf_counter_ns() - start
+
+            def _dispatch(self, path, params, body):
+                latency = server._get_latency(path)
+                status = server._get_failure_status(path)
+                if status is not None:
+                    time.sleep(latency)
+                    self._send_json(status, [{'error': 'injected failure'}])
+                elif path == '/query':
+                    status, documents = server._handle_query(params, latency)
+                    accept = self.headers.get('Accept', '')
+                    if status == 200 and accept.startswith('application/csv'):
+                        pieces = server._format_csv(documents)
+                        self._send(status, pieces, 'application/csv')
+                    else:
+                        self._send_json(status, documents)
+                elif path == '/write':
+                    time.sleep(latency)
+                    status, document = server._handle_write(params, body)
+                    self._send_json(status, [document] if document else [])
+                elif path == '/ping':
+                    time.sleep(latency)
+                    self._send_json(204, [])
+                elif path == '/debug/vars':
+                    self._send_json(200, [server.get_debug_vars()])
+                else:
+                    self._send_json(404, [{'error': 'not found'}])
+
+            def _send_json(self, status, documents):
+                pieces = [json.dumps(document) + '\n' for document in documents]
+                if len(pieces) == 1:
+                    pieces[0] = pieces[0].rstrip('\n')
+                self._send(status, pieces, 'application/json')
+
+            def _send(self, status, pieces, content_type):
+                # several pieces are sent with the chunked transfer encoding
+                self.send_response(status)
+                self.send_header('X-Influxdb-Version', server.version)
+                if len(pieces) > 1:
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    for piece in pieces:
+                        data = piece.encode('utf-8')
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    self.wfile.write(b'0\r\n\r\n')
+                    return
+                data = pieces[0].encode('utf-8') if pieces else b''
+                if data:
+                    self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,194 @@
+import threading
+import time
+
+
+PRECISION_TO_NS = {
+    'n': 1,
+    'ns': 1,
+    'u': 1000,
+    'ms': 1000 * 1000,
+    's': 1000 * 1000 * 1000,
+    'm': 60 * 1000 * 1000 * 1000,
+    'h': 60 * 60 * 1000 * 1000 * 1000,
+}
+
+
+class LineProtocolError(ValueError):
+    pass
+
+
+class Point:
+    __slots__ = ('time', 'tags', 'fields')
+
+    def __init__(self, time, tags, fields):
+        self.time = time
+        self.tags = tags
+        self.fields = fields
+
+    def get(self, key, key_type=None):
+        if key == 'time':
+            return self.time
+        if key_type != 'field' and key in self.tags:
+            return self.tags[key]
+        if key_type != 'tag':
+            return self.fields.get(key)
+        return None
+
+
+def _split(string, separator, keep_quotes=True):
+    # splits on unescaped separators outside of double quoted strings
+    parts = []
+    current = []
+    escaped = False
+    in_quotes = False
+    for char in string:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == '\\':
+            current.append(char)
+            escaped = True
+        elif char == '"' and keep_quotes:
+            current.append(char)
+            in_quotes = not in_quotes
+        elif char == separator and not in_quotes:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return parts
+
+
+def _unescape(string):
+    result = []
+    escaped = False
+    for char in string:
+        if escaped or char != '\\':
+            result.append(char)
+            escaped = False
+        else:
+            escaped = True
+    return ''.join(result)
+
+
+def _parse_field_value(value):
+    if value.startswith('"'):
+        if len(value) < 2 or not value.endswith('"'):
+            raise LineProtocolError('unbalanced quotes')
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    if value in ('t', 'T', 'true', 'True', 'TRUE'):
+        return True
+    if value in ('f', 'F', 'false', 'False', 'FALSE'):
+        return False
+    try:
+        if value.endswith('i') or value.endswith('u'):
+            return int(value[:-1])
+        return float(value)
+    except ValueError:
+        raise LineProtocolError('invalid number')
+
+
+def parse_line(line, precision='ns', default_time=None):
+    """Returns ``(measurement, Point)`` for one line of line protocol."""
+    parts = [p for p in _split(line, ' ') if p]
+    if len(parts) not in (2, 3):
+        raise LineProtocolError('invalid line : {}'.format(line))
+
+    key_parts = _split(parts[0], ',', keep_quotes=False)
+    measurement = _unescape(key_parts[0])
+    tags = {}
+    for tag in key_parts[1:]:
+        tag_parts = _split(tag, '=', keep_quotes=False)
+        if len(tag_parts) != 2:
+            raise LineProtocolError('invalid tag : {}'.format(tag))
+        tags[_unescape(tag_parts[0])] = _unescape(tag_parts[1])
+
+    fields = {}
+    for field in _split(parts[1], ','):
+        field_parts = _split(field, '=')
+        if len(field_parts) != 2:
+            raise LineProtocolError('invalid field : {}'.format(field))
+        fields[_unescape(field_parts[0])] = _parse_field_value(field_parts[1])
+
+    if len(parts) == 3:
+        try:
+            timestamp = int(parts[2]) * PRECISION_TO_NS[precision or 'ns']
+        except (KeyError, ValueError):
+            raise LineProtocolError('bad timestamp')
+    else:
+        timestamp = default_time or time.time_ns()
+    return measurement, Point(timestamp, tags, fields)
+
+
+class InMemoryStorage:
+    """Points written to the fake server, by database and measurement."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.databases = {}
+
+    def create_database(self, database):
+        with self._lock:
+            self.databases.setdefault(database, {})
+
+    def drop_database(self, database):
+        with self._lock:
+            self.databases.pop(database, None)
+
+    def drop_measurement(self, database, measurement):
+        with self._lock:
+            self.databases.get(database, {}).pop(measurement, None)
+
+    def delete(self, database, measurement, predicate):
+        with self._lock:
+            measurements = self.databases.get(database, {})
+            names = [measurement] if measurement else list(measurements)
+            for name in names:
+                points = measurements.get(name, {})
+                for key in [k for k, p in points.items() if predicate(p)]:
+                    del points[key]
+
+    def write(self, database, lines, precision='ns'):
+        now = time.time_ns()
+        parsed = [
+            parse_line(line, precision, default_time=now)
+            for line in lines
+            if line.strip() and not line.lstrip().startswith('#')
+        ]
+        with self._lock:
+            measurements = self.databases.setdefault(database, {})
+            for measurement, point in parsed:
+                # a point of the same series and time replaces the fields
+                points = measurements.setdefault(measurement, {})
+                key = (tuple(sorted(point.tags.items())), point.time)
+                if key in points:
+                    points[key].fields.update(point.fields)
+                else:
+                    points[key] = point
+        return len(parsed)
+
+    def get_points(self, database, measurement):
+        with self._lock:
+            points = self.databases.get(database, {}).get(measurement, {})
+            return sorted(points.values(), key=lambda p: p.time)
+
+    def get_measurements(self, database):
+        with self._lock:
+            return sorted(self.databases.get(database, {}))
+
+    def count_points(self):
+        with self._lock:
+            return sum(
+                len(points)
+                for measurements in self.databases.values()
+                for points in measurements.values()
+            )
+
+    def get_database_names(self):
+        with self._lock:
+            return sorted(self.databases)
+
+    def reset(self):
+        with self._lock:
+            self.databases = {}
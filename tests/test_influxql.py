@@ -0,0 +1,198 @@
+import pytest
+
+from django_cloudapp_common.influx.testing.influxql import (
+    InfluxQLError, QueryEngine, SelectStatement, format_query, parse, tokenize,
+)
+from django_cloudapp_common.influx.testing.storage import InMemoryStorage
+
+MINUTE = 60 * 10 ** 9
+NOW = 10 ** 12
+
+
+@pytest.fixture
+def storage():
+    storage = InMemoryStorage()
+    storage.create_database('db')
+    storage.write('db', [
+        'cpu,host=a,region=eu value=1,count=2i 0',
+        'cpu,host=b,region=us value=3 {}'.format(MINUTE),
+        'cpu,host=a,region=eu value=5 {}'.format(2 * MINUTE),
+        'mem,host=a used=10 0',
+    ])
+    return storage
+
+
+@pytest.fixture
+def engine(storage):
+    return QueryEngine(storage)
+
+
+def execute(engine, query):
+    return engine.execute(query, 'db', now=NOW)
+
+
+def get_values(engine, query):
+    result, = execute(engine, query)
+    assert 'error' not in result, result['error']
+    return [serie['values'] for serie in result.get('series', [])]
+
+
+def test_tokenize_quoted_identifiers_and_durations():
+    tokens = [(t.kind, t.value) for t in tokenize('SELECT "a b" FROM x WHERE time > 7d')]
+    assert tokens == [
+        ('ident', 'SELECT'),
+        ('ident', 'a b'),
+        ('ident', 'FROM'),
+        ('ident', 'x'),
+        ('ident', 'WHERE'),
+        ('ident', 'time'),
+        ('op', '>'),
+        ('duration', 7 * 24 * 60 * MINUTE),
+        ('eof', None),
+    ]
+
+
+def test_tokenize_compound_duration():
+    token, _ = tokenize('1h30m')
+    assert (token.kind, token.value) == ('duration', 90 * MINUTE)
+
+
+@pytest.mark.parametrize('query, formatted', [
+    (
+        'select mean("value") from "cpu" where time > now()-7d and "value" > 0.5 '
+        'group by time(24h), "my host" fill(none)',
+        'SELECT mean(value) FROM cpu WHERE time > now() - 1w AND value > 0.500 '
+        'GROUP BY time(1d), "my host" fill(none)',
+    ),
+    (
+        "SELECT * FROM \"db\".\"autogen\".cpu WHERE host =~ /web1.5/ AND x <> '2.5' "
+        "AND time >= now() - 1h30m",
+        "SELECT * FROM db.autogen.cpu WHERE host =~ /web1.5/ AND x != '2.5' "
+        "AND time >= now() - 90m",
+    ),
+])
+def test_format_query(query, formatted):
+    assert format_query(query) == formatted
+
+
+def test_parse_select():
+    statement, = parse(
+        'SELECT mean(value) FROM "cpu" WHERE time > now() - 1h '
+        'GROUP BY time(5m), host fill(none) ORDER BY time DESC LIMIT 3 OFFSET 1'
+    )
+    assert isinstance(statement, SelectStatement)
+    assert statement.sources == [(None, 'cpu')]
+    assert statement.group_by_interval == 5 * MINUTE
+    assert statement.group_by_tags == ['host']
+    assert statement.fill == 'none'
+    assert statement.descending
+    assert (statement.limit, statement.offset) == (3, 1)
+
+
+def test_parse_several_statements():
+    statements = parse('SHOW DATABASES; DROP SHARD 3; KILL QUERY 4')
+    assert [s.kind for s in statements] == ['SHOW DATABASES', 'DROP SHARD', 'KILL QUERY']
+    assert statements[1].options['shard_id'] == 3
+
+
+@pytest.mark.parametrize('query', [
+    '',
+    'SELEC value FROM cpu',
+    'SELECT value cpu',
+    'SELECT value FROM cpu ORDER BY host',
+])
+def test_parse_error(query):
+    with pytest.raises(InfluxQLError):
+        parse(query)
+
+
+def test_select_where_tag(engine):
+    values, = get_values(engine, "SELECT value FROM cpu WHERE host = 'a'")
+    assert values == [[0, 1.0], [2 * MINUTE, 5.0]]
+
+
+def test_select_where_regex(engine):
+    values, = get_values(engine, 'SELECT value FROM cpu WHERE region =~ /^u/')
+    assert values == [[MINUTE, 3.0]]
+
+
+def test_select_time_range_is_half_open(engine):
+    values, = get_values(engine, 'SELECT value FROM cpu WHERE time >= 1m AND time < 2m')
+    assert values == [[MINUTE, 3.0]]
+
+
+def test_select_aggregate_group_by_time_and_tag(engine):
+    series = get_values(
+        engine,
+        'SELECT sum(value) FROM cpu WHERE time >= 0 AND time < 3m '
+        'GROUP BY time(2m), host',
+    )
+    assert series == [
+        [[0, 1.0], [2 * MINUTE, 5.0]],
+        [[0, 3.0], [2 * MINUTE, None]],
+    ]
+
+
+def test_select_group_by_time_requires_time_range(engine):
+    result, = execute(engine, 'SELECT mean(value) FROM cpu GROUP BY time(1m)')
+    assert 'WHERE time' in result['error']
+
+
+def test_select_limit_offset(engine):
+    values, = get_values(engine, 'SELECT value FROM cpu LIMIT 1 OFFSET 1')
+    assert values == [[MINUTE, 3.0]]
+
+
+def test_select_subquery(engine):
+    values, = get_values(engine, 'SELECT max(total) FROM (SELECT value AS total FROM cpu)')
+    assert values == [[0, 5.0]]
+
+
+def test_statements_after_an_error_are_not_executed(engine):
+    results = execute(engine, 'SELECT count(value) FROM cpu; SELECT nope(x) FROM cpu; SHOW DATABASES')
+    assert results[0]['series'][0]['values'] == [[0, 3]]
+    assert results[1]['error'] == 'unsupported call: nope'
+    assert results[2]['error'] == 'not executed'
+
+
+def test_show_measurements_and_keys(engine):
+    assert get_values(engine, 'SHOW MEASUREMENTS') == [[['cpu'], ['mem']]]
+    assert get_values(engine, 'SHOW FIELD KEYS FROM cpu') == [
+        [['count', 'integer'], ['value', 'float']],
+    ]
+    assert get_values(engine, 'SHOW TAG KEYS FROM cpu') == [[['host'], ['region']]]
+    assert get_values(engine, 'SHOW TAG VALUES FROM cpu WITH KEY = host') == [
+        [['host', 'a'], ['host', 'b']],
+    ]
+
+
+def test_show_cardinality(engine):
+    assert get_values(engine, 'SHOW SERIES CARDINALITY') == [[[3]]]
+    assert get_values(engine, 'SHOW MEASUREMENT CARDINALITY') == [[[2]]]
+
+
+def test_delete(engine, storage):
+    execute(engine, "DELETE FROM cpu WHERE host = 'a' AND time < 1m")
+    assert [p.time for p in storage.get_points('db', 'cpu')] == [MINUTE, 2 * MINUTE]
+    assert len(storage.get_points('db', 'mem')) == 1
+
+
+def test_drop_series(engine, storage):
+    execute(engine, "DROP SERIES FROM cpu WHERE host = 'b'")
+    assert {p.tags['host'] for p in storage.get_points('db', 'cpu')} == {'a'}
+
+
+def test_show_shards_and_drop_shard(engine, storage):
+    storage.write('db', ['cpu value=7 {}'.format(8 * 24 * 60 * MINUTE)])
+    shards, = get_values(engine, 'SHOW SHARDS')
+    assert [row[4:6] for row in shards] == [
+        ['1969-12-29T00:00:00Z', '1970-01-05T00:00:00Z'],
+        ['1970-01-05T00:00:00Z', '1970-01-12T00:00:00Z'],
+    ]
+    execute(engine, 'DROP SHARD {}'.format(shards[0][0]))
+    assert storage.count_points() == 1
+
+
+def test_missing_database(engine):
+    result, = engine.execute('SHOW MEASUREMENTS', 'nope', now=NOW)
+    assert result['error'] == 'database not found: nope'
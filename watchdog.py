@@ -0,0 +1,305 @@
+"""
+Watchdog killing the queries of this process running for too long.
+
+``InfluxDBApi`` registers the queries it sends while they run. Every
+``INTERVAL`` seconds, ``SHOW QUERIES`` is polled on the connections having
+queries in flight and its rows are attributed to them: same database, same
+text once normalized (InfluxDB lists the statements as it formats them) and
+not running for longer than the registered query. Those over the budget of
+their measurement, or the global ``BUDGET``, are killed with ``KILL QUERY``,
+then ``query_killed`` is sent and counted in the metrics. On a cluster,
+each node is polled and its queries are killed on that node only, as the
+query ids are local to a node::
+
+    INFLUXDB_QUERY_WATCHDOG = {
+        'ENABLED': True,
+        'INTERVAL': 5,
+        'BUDGET': 60,
+        'MEASUREMENT_BUDGETS': {'cpu': 10},
+    }
+"""
+import datetime
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from . import metrics, settings
+from .helpers.utils import format_duration, parse_duration, parse_go_duration
+from .metrics import MetricName
+from .signals import query_killed
+
+
+logger = logging.getLogger(__name__)
+
+QUERY_WATCHDOG_DEFAULT_OPTIONS = {
+    'ENABLED': False,
+    'INTERVAL': 5,
+    # seconds, `None` for no global budget
+    'BUDGET': 60,
+    'MEASUREMENT_BUDGETS': {},
+}
+
+FROM_REGEX = re.compile(
+    r'\bFROM\s+(?:"[^"]+"\.|\w+\.)?(?:"([^"]+)"|(\w+))',
+    re.IGNORECASE,
+)
+
+# literals InfluxDB formats again when it lists a query, the strings,
+# quoted identifiers and regexes are matched to be kept as they are
+LITERAL_REGEX = re.compile(r'''
+    '(?:[^'\\]|\\.)*' | "(?:[^"\\]|\\.)*" | (?:=~|!~)\s*/(?:[^/\\]|\\.)*/
+  | (?<![\w.])(?P<duration>(?:\d+(?:ns|ms|u|µ|s|m|h|d|w))+)(?![\w.])
+  | (?<![\w.])(?P<number>(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?|\d+[eE][+-]?\d+)(?![\w.])
+''', re.VERBOSE)
+
+_local = threading.local()
+
+
+def _format_literal(match):
+    if match.group('duration'):
+        duration = parse_duration(match.group('duration'))
+        return format_duration(duration) if duration else match.group('duration')
+    if match.group('number'):
+        return '{:.3f}'.format(float(match.group('number')))
+    return match.group(0)
+
+
+def normalize_query(query):
+    """
+    Ignores the quotes, spaces and case InfluxDB may change, and formats
+    the literals as InfluxDB does: floats with 3 decimals, `0.5` as
+    `0.500`, and durations in their largest exact unit, `24h` as `1d`.
+    """
+    query = LITERAL_REGEX.sub(_format_literal, query)
+    return re.sub(r'[\s"]+', '', query).rstrip(';').lower()
+
+
+def get_query_measurement(query):
+    match = FROM_REGEX.search(query)
+    if match is None:
+        return None
+    return match.group(1) or match.group(2)
+
+
+class RunningQuery:
+    def __init__(self, qid, query, database, duration, base_url=None):
+        self.qid = qid
+        self.query = query
+        self.database = database
+        self.duration = duration
+        # server running the query, the query ids are local to it
+        self.base_url = base_url
+
+    def __repr__(self):
+        return '<RunningQuery {} {}>'.format(self.qid, self.duration)
+
+    @property
+    def measurement(self):
+        return get_query_measurement(self.query)
+
+
+class QueryWatchdog:
+    def __init__(self, options=None):
+        self._options = options
+        self.is_enabled = False
+        # token: `(request, database, normalized query, start)` of the
+        # queries in flight
+        self._queries = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def options(self):
+        if self._options is None:
+            self._options = {
+                **QUERY_WATCHDOG_DEFAULT_OPTIONS,
+                **settings.INFLUXDB_QUERY_WATCHDOG,
+            }
+        return self._options
+
+    def enable(self):
+        self.is_enabled = True
+
+    def disable(self):
+        self.is_enabled = False
+        self.stop()
+
+    def register(self, request, query):
+        token = object()
+        with self._lock:
+            self._queries[token] = (
+                request,
+                request.database_name,
+                normalize_query(query),
+                time.monotonic(),
+            )
+        self.start()
+        return token
+
+    def unregister(self, token):
+        with self._lock:
+            self._queries.pop(token, None)
+
+    def get_budget(self, measurement):
+        budget = self.options['MEASUREMENT_BUDGETS'].get(
+            measurement,
+            self.options['BUDGET'],
+        )
+        if budget is None:
+            return None
+        return datetime.timedelta(seconds=budget)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._watch,
+                name='influxdb-query-watchdog',
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _watch(self):
+        while not self._stopped.wait(self.options['INTERVAL']):
+            try:
+                self.check()
+            except Exception:
+                logger.exception('Error while watching the running queries')
+
+    def check(self):
+        """Kills the queries over their budget, returns them."""
+        with self._lock:
+            queries = list(self._queries.values())
+        now = time.monotonic()
+        killed = []
+        requests = {id(q[0]): q[0] for q in queries}
+        for request in requests.values():
+            in_flight = [q for q in queries if q[0] is request]
+            for node_request in self.get_node_requests(request):
+                killed.extend(self._check_node(node_request, in_flight, now))
+        return killed
+
+    @staticmethod
+    def get_node_requests(request):
+        """Requests of the servers behind `request`, each node of a cluster."""
+        if not getattr(request, 'is_cluster', False):
+            return [request]
+        nodes = [node for node in request.nodes if node.is_available] or request.nodes
+        return [node.request for node in nodes]
+
+    def _check_node(self, request, in_flight, now):
+        killed = []
+        try:
+            running_queries = self.get_running_queries(request, in_flight, now)
+        except Exception as err:
+            logger.warning('Error while listing the queries of %s: %r', request.base_url, err)
+            return killed
+        for running_query in running_queries:
+            budget = self.get_budget(running_query.measurement)
+            if budget is None or running_query.duration <= budget:
+                continue
+            if self.kill(request, running_query, budget):
+                killed.append(running_query)
+        return killed
+
+    def get_running_queries(self, request, in_flight, now):
+        """Rows of ``SHOW QUERIES`` attributed to the `in_flight` queries."""
+        from .serializers import FlatFormattedSerieSerializer
+        response = self._execute_query(request, 'SHOW QUERIES')
+        rows = FlatFormattedSerieSerializer(response).convert()
+        # a registered query has been running for at least as long as the
+        # server reports, give or take the polling interval
+        tolerance = self.options['INTERVAL']
+        running_queries = []
+        for row in rows:
+            try:
+                duration = parse_go_duration(row['duration'])
+            except ValueError:
+                logger.warning('Unknown duration of query %s: %s', row['qid'], row['duration'])
+                continue
+            query = normalize_query(row['query'])
+            is_attributed = any(
+                database == row['database'] and
+                normalized_query == query and
+                duration.total_seconds() <= now - start + tolerance
+                for _, database, normalized_query, start in in_flight
+            )
+            if is_attributed:
+                running_queries.append(RunningQuery(
+                    row['qid'],
+                    row['query'],
+                    row['database'],
+                    duration,
+                    base_url=request.base_url,
+                ))
+        return running_queries
+
+    def kill(self, request, running_query, budget):
+        try:
+            query = 'KILL QUERY {}'.format(running_query.qid)
+            self._execute_query(request, query)
+        except Exception as err:
+            # the query may have completed since it was listed
+            logger.warning('Error while killing query %s: %r', running_query.qid, err)
+            return False
+        logger.warning(
+            'Killed query %s on %s running for %s (budget %s): %s',
+            running_query.qid,
+            running_query.base_url,
+            running_query.duration,
+            budget,
+            running_query.query,
+        )
+        metrics.increment(
+            MetricName.QUERIES_KILLED,
+            measurement=running_query.measurement or '',
+        )
+        query_killed.send(
+            sender=QueryWatchdog,
+            database=running_query.database,
+            qid=running_query.qid,
+            query=running_query.query,
+            duration=running_query.duration,
+            budget=budget,
+        )
+        return True
+
+    @staticmethod
+    def _execute_query(request, query):
+        from .api import InfluxDBApi
+        from .response import InfluxDBResponse
+        _local.is_polling = True
+        try:
+            response = InfluxDBApi.execute_query(request, query, method='post')
+        finally:
+            _local.is_polling = False
+        influx_response = InfluxDBResponse(response)
+        influx_response.raise_if_error()
+        return influx_response
+
+
+query_watchdog = QueryWatchdog()
+
+if query_watchdog.options['ENABLED']:
+    query_watchdog.enable()
+
+
+@contextmanager
+def track_query(request, query):
+    """Registers `query` to the watchdog while it runs, when enabled."""
+    if not query_watchdog.is_enabled or getattr(_local, 'is_polling', False):
+        yield
+        return
+    token = query_watchdog.register(request, query)
+    try:
+        yield
+    finally:
+        query_watchdog.unregister(token)